@@ -1,14 +1,15 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, request, jsonify, send_file, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import os
 import sys
 import uuid
+from urllib.parse import quote
 from datetime import datetime, timedelta
-import threading
-import json
-import subprocess
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,9 +18,13 @@ load_dotenv()
 # Add parent directory to path to import main
 PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(PARENT_DIR)
-from main import main as analyze_video
-from backend.models import db, User, Analysis
+from backend.models import db, User, Analysis, UploadSession
 from backend.auth import auth_bp
+from backend.worker_pool import get_worker_pool
+from backend.job_queue import create_job_queue, QueueFullError, JobInterruptedError
+from backend.progress import ProgressHub
+from backend.uploads import create_upload_store, UploadError
+from utils import get_track_file_path, TrackFile, to_json_values
 
 app = Flask(__name__)
 
@@ -75,158 +80,183 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 OUTPUT_FOLDER = os.path.join(BASE_DIR, 'outputs')
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
-MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+# Analyzed videos are always encoded as MP4
+OUTPUT_VIDEO_EXTENSIONS = {'.mp4'}
+MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB, for single-request uploads and for every upload chunk
+# Largest frame range returned by one /tracks request; clients page through longer videos
+MAX_TRACK_FRAMES_PER_REQUEST = 10000
+# Output names contain the upload time and analysis id and are never rewritten, so
+# browsers and proxies may cache them for a year without revalidating
+OUTPUT_CACHE_MAX_AGE = 365 * 24 * 3600
+# Let a reverse proxy send output files instead of a gunicorn worker:
+# 'x-accel-redirect' (nginx, internal location OUTPUT_ACCEL_REDIRECT_PREFIX mapped to
+# the outputs folder), 'x-sendfile' (Apache mod_xsendfile, lighttpd), or empty
+OUTPUT_FILE_OFFLOAD = os.getenv('OUTPUT_FILE_OFFLOAD', '').lower()
+OUTPUT_ACCEL_REDIRECT_PREFIX = os.getenv('OUTPUT_ACCEL_REDIRECT_PREFIX', '/protected-outputs/')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.config['USE_X_SENDFILE'] = OUTPUT_FILE_OFFLOAD == 'x-sendfile'
 
 # Create necessary folders
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# Dictionary to track processing status
-processing_status = {}
-status_file = os.path.join(BASE_DIR, 'status.json')
-
-# Load existing status from file
-def load_status():
-    global processing_status
-    if os.path.exists(status_file):
-        try:
-            with open(status_file, 'r') as f:
-                processing_status = json.load(f)
-        except Exception as e:
-            print(f"Error loading status: {e}")
-            processing_status = {}
-
-# Save status to file
-def save_status():
-    try:
-        with open(status_file, 'w') as f:
-            json.dump(processing_status, f, indent=2)
-    except Exception as e:
-        print(f"Error saving status: {e}")
+def send_output_file(filename, as_attachment=False, download_name=None):
+    """
+    Send a file of the outputs folder with byte-range (206) support, a strong ETag
+    answered with 304 on If-None-Match (and honoured by If-Range), and immutable
+    Cache-Control. With OUTPUT_FILE_OFFLOAD the proxy sends the bytes instead.
+    """
+    path = safe_join(app.config['OUTPUT_FOLDER'], filename)
+    # Only videos: track files live in the same folder and are read through /tracks
+    is_video = os.path.splitext(filename)[1].lower() in OUTPUT_VIDEO_EXTENSIONS
+    if path is None or not is_video or not os.path.isfile(path):
+        print(f"Output file not found: {filename}")
+        return jsonify({'error': 'Video file not found'}), 404
 
-load_status()
+    if OUTPUT_FILE_OFFLOAD == 'x-accel-redirect':
+        # nginx serves ranges, ETag and conditional requests from its internal location
+        response = Response(mimetype='video/mp4')
+        response.headers['X-Accel-Redirect'] = OUTPUT_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(filename)
+        response.headers['Content-Disposition'] = f"{'attachment' if as_attachment else 'inline'}; filename={download_name or filename}"
+    else:
+        # conditional=True makes werkzeug answer Range, If-Range and If-None-Match itself;
+        # with USE_X_SENDFILE it only sets the X-Sendfile header
+        response = send_file(path, mimetype='video/mp4', as_attachment=as_attachment,
+                             download_name=download_name or filename, conditional=True, etag=True,
+                             max_age=OUTPUT_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.max_age = OUTPUT_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_video_async(analysis_id, input_path, output_path, user_id=None):
+def process_video_async(analysis_id, input_path, output_path, user_id=None, input_sha256=None):
     """Process video in background thread"""
     try:
         print(f"[{analysis_id}] Starting video processing...")
-        print(f"[{analysis_id}] Current working directory: {os.getcwd()}")
-        print(f"[{analysis_id}] Parent directory: {PARENT_DIR}")
         
         # Update database status (works for both authenticated and guest uploads)
         with app.app_context():
-            analysis = Analysis.query.get(analysis_id)
+            analysis = db.session.get(Analysis, analysis_id)
             if analysis:
-                analysis.update_status('processing', progress=10)
-        
-        # Change to parent directory to access models
-        original_cwd = os.getcwd()
-        os.chdir(PARENT_DIR)
-        print(f"[{analysis_id}] Changed working directory to: {os.getcwd()}")
-        
-        processing_status[analysis_id]['status'] = 'processing'
-        processing_status[analysis_id]['progress'] = 10
-        save_status()
-        
-        # Run the analysis
-        result_path = analyze_video(input_path, output_path)
-        
-        # Convert to browser-compatible format using ffmpeg
-        print(f"[{analysis_id}] Converting video to browser-compatible format...")
-        temp_output = output_path.replace('.mp4', '_temp.avi')
-        if os.path.exists(result_path):
-            # Rename original output
-            os.rename(result_path, temp_output)
-            
-            # Convert with ffmpeg to H.264 MP4
-            try:
-                subprocess.run([
-                    'ffmpeg', '-i', temp_output,
-                    '-c:v', 'libx264',  # H.264 codec
-                    '-preset', 'fast',
-                    '-crf', '23',
-                    '-c:a', 'aac',  # AAC audio
-                    '-b:a', '128k',
-                    '-movflags', '+faststart',  # Enable streaming
-                    '-y',  # Overwrite output
-                    result_path
-                ], check=True, capture_output=True)
-                
-                # Remove temporary file
-                os.remove(temp_output)
-                print(f"[{analysis_id}] Video converted successfully!")
-            except subprocess.CalledProcessError as e:
-                print(f"[{analysis_id}] FFmpeg conversion failed: {e.stderr.decode()}")
-                # If conversion fails, keep the original
-                if os.path.exists(temp_output):
-                    os.rename(temp_output, result_path)
-            except FileNotFoundError:
-                print(f"[{analysis_id}] FFmpeg not found, using original format")
-                if os.path.exists(temp_output):
-                    os.rename(temp_output, result_path)
-        
-        # Change back to original directory
-        os.chdir(original_cwd)
-        
-        # Get file size
-        file_size = os.path.getsize(result_path) if os.path.exists(result_path) else 0
+                analysis.update_status('processing', progress=0)
+        progress_hub.update(analysis_id, status='processing', progress=0, stage=None, error=None)
         
-        processing_status[analysis_id]['status'] = 'completed'
-        processing_status[analysis_id]['progress'] = 100
-        processing_status[analysis_id]['outputFile'] = os.path.basename(output_path)
-        processing_status[analysis_id]['fileSize'] = file_size
-        processing_status[analysis_id]['completedTime'] = datetime.now().isoformat()
-        save_status()
+        # Run the analysis in a warm worker process that already has the models loaded.
+        # Progress is pushed to SSE subscribers live and saved to the database throttled.
+        def report_progress(stage, current, total):
+            progress_hub.report_progress(analysis_id, stage, current, total)
+        # The worker encodes browser-ready H.264 MP4 in a single pass while drawing
+        get_worker_pool().submit(input_path, output_path, progress_callback=report_progress,
+                                 video_hash=input_sha256).result()
         
         # Update database (works for both authenticated and guest uploads)
         with app.app_context():
-            analysis = Analysis.query.get(analysis_id)
+            analysis = db.session.get(Analysis, analysis_id)
             if analysis:
                 analysis.output_filename = os.path.basename(output_path)
+                # Summary stats come from the footer of the track file, the rest of it stays on disk
+                track_path = get_track_file_path(output_path)
+                if os.path.exists(track_path):
+                    with TrackFile(track_path) as track_file:
+                        player_stats = track_file.metadata.get('player_stats', {})
+                    analysis.player_1_stats = player_stats.get('1')
+                    analysis.player_2_stats = player_stats.get('2')
                 analysis.update_status('completed', progress=100)
+        progress_hub.update(analysis_id, status='completed', progress=100, stage=None,
+                            outputFile=os.path.basename(output_path))
         
         print(f"[{analysis_id}] Video processing completed successfully!")
         
+    except BrokenProcessPool as e:
+        # The worker process died (e.g. killed for memory), not the analysis itself: the
+        # pool starts new workers and the job goes back to the queue
+        print(f"[{analysis_id}] Analysis worker died: {e}")
+        progress_hub.forget(analysis_id)
+        raise JobInterruptedError(f"its analysis worker died ({e})") from e
     except Exception as e:
         print(f"[{analysis_id}] Error processing video: {str(e)}")
         import traceback
         print(f"[{analysis_id}] Full traceback:")
         traceback.print_exc()
         
-        # Change back to original directory on error
-        try:
-            os.chdir(original_cwd)
-        except:
-            pass
-            
-        processing_status[analysis_id]['status'] = 'failed'
-        processing_status[analysis_id]['error'] = str(e)
-        processing_status[analysis_id]['progress'] = 0
-        save_status()
-        
         # Update database on error
         try:
             with app.app_context():
-                analysis = Analysis.query.get(analysis_id)
+                analysis = db.session.get(Analysis, analysis_id)
                 if analysis:
                     analysis.error_message = str(e)
                     analysis.update_status('failed', progress=0)
         except Exception as db_error:
             print(f"[{analysis_id}] Failed to update database on error: {db_error}")
-        
-        # Update database
-        if user_id:
-            with app.app_context():
-                analysis = Analysis.query.get(analysis_id)
-                if analysis:
-                    analysis.update_status('failed', error=str(e))
+        progress_hub.update(analysis_id, status='failed', progress=0, stage=None, error=str(e))
+
+# Live progress for SSE subscribers; Analysis.progress is written at most every
+# ANALYSIS_PROGRESS_PERSIST_SECONDS per running job
+progress_hub = ProgressHub(app, persist_interval_seconds=float(os.getenv('ANALYSIS_PROGRESS_PERSIST_SECONDS', 5)))
+
+# Persistent job queue: at most ANALYSIS_CONCURRENCY jobs run at once, in the one web
+# process per machine that holds the runner lock; only that process starts the worker
+# pool, so ANALYSIS_WORKERS model copies are loaded whatever the number of gunicorn workers.
+# Worker-pool children also import this module, and must not dispatch jobs themselves.
+job_queue = create_job_queue(app, process_video_async)
+if multiprocessing.parent_process() is None:
+    job_queue.start()
+
+# Chunked uploads write into UPLOAD_FOLDER; their total size is bounded by MAX_UPLOAD_SIZE_MB
+upload_store = create_upload_store(UPLOAD_FOLDER)
+
+def get_optional_user_id():
+    """Id of the logged-in user, or None for guests"""
+    try:
+        return get_jwt_identity()
+    except:
+        return None
+
+def queue_full_response(e):
+    print(f"Queue full, rejecting upload (retry after {e.retry_after_seconds}s)")
+    response = jsonify({'error': 'Server is busy, please try again later',
+                        'retryAfter': e.retry_after_seconds})
+    response.headers['Retry-After'] = str(e.retry_after_seconds)
+    return response, 429
+
+def upload_error_response(e):
+    body = {'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status_code
+
+def queue_analysis(analysis_id, user_id, input_filename, input_sha256=None):
+    """Add the analysis and its job in the current transaction, commit and wake a dispatcher"""
+    input_path = os.path.join(app.config['UPLOAD_FOLDER'], input_filename)
+    # Prepare output path
+    output_filename = f"{os.path.splitext(input_filename)[0]}_analyzed.mp4"
+    output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
+    
+    print(f"Output will be saved to: {output_path}")
+    
+    # Save to database (for both authenticated and guest users)
+    analysis = Analysis(
+        id=analysis_id,
+        user_id=user_id,  # Will be None for guest uploads
+        input_filename=input_filename,
+        status='queued',
+        progress=0
+    )
+    db.session.add(analysis)
+    job_queue.enqueue(analysis_id, user_id, input_path, output_path, input_sha256)
+    db.session.commit()
+    print(f"Analysis saved to database (user_id: {user_id or 'guest'})")
+    
+    # Wake a dispatcher; the job row was committed with the analysis
+    job_queue.notify()
+    
+    print(f"Analysis {analysis_id} queued")
 
 @app.route('/', methods=['GET'])
 def root():
@@ -237,6 +267,8 @@ def root():
         'endpoints': {
             'health': '/api/health',
             'upload': '/api/upload',
+            'chunked_upload': '/api/uploads',
+            'analysis_events': '/api/analysis/<id>/events',
             'auth': '/api/auth/*'
         }
     })
@@ -257,11 +289,7 @@ def upload_video():
     print("Received upload request")
     
     # Get current user if authenticated
-    current_user_id = None
-    try:
-        current_user_id = get_jwt_identity()
-    except:
-        pass  # Guest upload
+    current_user_id = get_optional_user_id()
     
     # Check if file is present
     if 'video' not in request.files:
@@ -278,6 +306,12 @@ def upload_video():
         print(f"Invalid file type: {file.filename}")
         return jsonify({'error': 'Invalid file format. Allowed: MP4, AVI, MOV, MKV'}), 400
     
+    # Reject early instead of queueing work that would wait too long
+    try:
+        job_queue.check_admission()
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
     try:
         # Generate unique ID for this analysis
         analysis_id = str(uuid.uuid4())
@@ -294,46 +328,12 @@ def upload_video():
         print(f"Saving file to: {input_path}")
         file.save(input_path)
         
-        # Prepare output path
-        output_filename = f"{timestamp}_{analysis_id}_analyzed.mp4"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        
-        print(f"Output will be saved to: {output_path}")
-        
-        # Save to database (for both authenticated and guest users)
-        analysis = Analysis(
-            id=analysis_id,
-            user_id=current_user_id,  # Will be None for guest uploads
-            input_filename=input_filename,
-            status='queued',
-            progress=0
-        )
-        db.session.add(analysis)
-        db.session.commit()
-        print(f"Analysis saved to database (user_id: {current_user_id or 'guest'})")
-        
-        # Initialize processing status (for backward compatibility)
-        processing_status[analysis_id] = {
-            'status': 'queued',
-            'progress': 0,
-            'inputFile': input_filename,
-            'outputFile': None,
-            'error': None,
-            'uploadedTime': datetime.now().isoformat()
-        }
-        save_status()
-        
-        # Start processing in background thread
-        thread = threading.Thread(target=process_video_async, args=(analysis_id, input_path, output_path, current_user_id))
-        thread.daemon = True
-        thread.start()
-        
-        print(f"Processing thread started for {analysis_id}")
+        queue_analysis(analysis_id, current_user_id, input_filename)
         
         return jsonify({
             'success': True,
             'analysisId': analysis_id,
-            'message': 'Video uploaded successfully and processing started'
+            'message': 'Video uploaded successfully and queued for processing'
         }), 200
         
     except Exception as e:
@@ -342,63 +342,198 @@ def upload_video():
         traceback.print_exc()
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+def get_upload_session(upload_id):
+    """Upload session of the current user (guest sessions are reachable by their id alone)"""
+    upload_session = db.session.get(UploadSession, upload_id)
+    if upload_session is None:
+        return None
+    if upload_session.user_id is not None and str(upload_session.user_id) != str(get_optional_user_id()):
+        return None
+    return upload_session
+
+@app.route('/api/uploads', methods=['POST'])
+@jwt_required(optional=True)  # Optional JWT - allow guest uploads
+def create_upload():
+    """
+    Start a chunked upload: JSON {filename, size, sha256 (optional)}. The chunks are then
+    PUT to /api/uploads/<uploadId>?offset=<bytes received> and the upload finalized.
+    """
+    current_user_id = get_optional_user_id()
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename', '')))
+    
+    if not allowed_file(filename):
+        print(f"Invalid file type: {filename}")
+        return jsonify({'error': 'Invalid file format. Allowed: MP4, AVI, MOV, MKV'}), 400
+    
+    # Reject before the client spends minutes uploading a video that would wait too long
+    try:
+        job_queue.check_admission()
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
+    # The upload id is the analysis id once the upload is finalized
+    upload_id = str(uuid.uuid4())
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    input_filename = f"{timestamp}_{upload_id}.{filename.rsplit('.', 1)[1].lower()}"
+    try:
+        upload_session = upload_store.create(upload_id, current_user_id, input_filename,
+                                             data.get('size'), data.get('sha256'))
+        db.session.commit()
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    print(f"Started upload {upload_id} of {upload_session.total_size} bytes")
+    response = upload_session.to_dict()
+    response['chunkSize'] = upload_store.chunk_size
+    return jsonify(response), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@jwt_required(optional=True)
+def get_upload(upload_id):
+    """Offset to resume an interrupted upload from"""
+    upload_session = get_upload_session(upload_id)
+    if upload_session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    upload_store.get_offset(upload_session)
+    return jsonify(upload_session.to_dict()), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+@jwt_required(optional=True)
+def upload_chunk(upload_id):
+    """
+    Append the raw request body at ?offset=, which must equal the bytes received so far.
+    The body is streamed to disk as it arrives; on 409 or an interrupted chunk the
+    response (or GET /api/uploads/<id>) gives the offset to continue from.
+    """
+    upload_session = get_upload_session(upload_id)
+    if upload_session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset is required'}), 400
+    
+    try:
+        upload_store.append(upload_session, offset, request.stream, request.content_length)
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify(upload_session.to_dict()), 200
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@jwt_required(optional=True)
+def finalize_upload(upload_id):
+    """Verify the received file and queue it for analysis"""
+    upload_session = get_upload_session(upload_id)
+    if upload_session is None:
+        # A retried finalize whose first response was lost
+        analysis = db.session.get(Analysis, upload_id)
+        if analysis is not None and str(analysis.user_id) == str(get_optional_user_id()):
+            return jsonify({'success': True, 'analysisId': upload_id,
+                            'message': 'Video uploaded successfully and queued for processing'}), 200
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    try:
+        input_path, sha256 = upload_store.finalize(upload_session)
+        # The session row is deleted in the same transaction that queues the analysis
+        queue_analysis(upload_id, upload_session.user_id, os.path.basename(input_path), sha256)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return jsonify({
+        'success': True,
+        'analysisId': upload_id,
+        'sha256': sha256,
+        'message': 'Video uploaded successfully and queued for processing'
+    }), 200
+
 @app.route('/api/analysis/<analysis_id>', methods=['GET'])
 def get_analysis_status(analysis_id):
     """Get analysis status endpoint"""
     print(f"Status check for: {analysis_id}")
     
-    # Try to get from database first
-    analysis = Analysis.query.filter_by(id=analysis_id).first()
-    if analysis:
-        print(f"Found in database. Status: {analysis.status}")
-        return jsonify({
-            'status': analysis.status,
-            'progress': analysis.progress,
-            'inputFile': analysis.input_filename,
-            'outputFile': analysis.output_filename,
-            'error': analysis.error_message,
-            'uploadedTime': analysis.created_at.isoformat() if analysis.created_at else None
-        }), 200
-    
-    # Fallback to in-memory status for guest uploads
-    if analysis_id in processing_status:
-        status_info = processing_status[analysis_id]
-        print(f"Found in memory. Status: {status_info['status']}")
-        return jsonify(status_info), 200
+    # The Analysis table is the only job-state store; this is a primary key lookup
+    analysis = db.session.get(Analysis, analysis_id)
+    if analysis is None:
+        print(f"Analysis ID not found: {analysis_id}")
+        return jsonify({'error': 'Analysis ID not found'}), 404
     
-    print(f"Analysis ID not found: {analysis_id}")
-    return jsonify({'error': 'Analysis ID not found'}), 404
+    output_path = os.path.join(app.config['OUTPUT_FOLDER'], analysis.output_filename) if analysis.output_filename else None
+    return jsonify({
+        'status': analysis.status,
+        'progress': analysis.progress,
+        'inputFile': analysis.input_filename,
+        'outputFile': analysis.output_filename,
+        'error': analysis.error_message,
+        'fileSize': os.path.getsize(output_path) if output_path and os.path.exists(output_path) else None,
+        'uploadedTime': analysis.created_at.isoformat() if analysis.created_at else None,
+        'completedTime': analysis.completed_at.isoformat() if analysis.completed_at else None
+    }), 200
+
+@app.route('/api/analysis/<analysis_id>/events', methods=['GET'])
+def stream_analysis_events(analysis_id):
+    """Server-Sent Events with the analysis status and progress, instead of polling"""
+    response = Response(stream_with_context(progress_hub.stream_events(analysis_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/analysis/<analysis_id>/tracks', methods=['GET'])
+def get_analysis_tracks(analysis_id):
+    """
+    Per-frame boxes, mini court positions, shots and stats of a completed analysis.
+    ?start=&end= select frames [start, end), ?columns=a,b selects columns; only the
+    row groups and columns asked for are read from the memory-mapped track file.
+    """
+    analysis = db.session.get(Analysis, analysis_id)
+    if analysis is None:
+        return jsonify({'error': 'Analysis ID not found'}), 404
+    if analysis.status != 'completed' or not analysis.output_filename:
+        return jsonify({'error': 'Analysis is not completed'}), 409
+
+    track_path = get_track_file_path(os.path.join(app.config['OUTPUT_FOLDER'], analysis.output_filename))
+    if not os.path.exists(track_path):
+        return jsonify({'error': 'Track file not found'}), 404
+
+    try:
+        start = max(int(request.args.get('start', 0)), 0)
+        end = int(request.args['end']) if 'end' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be frame numbers'}), 400
+    columns = request.args.get('columns')
+    columns = [column.strip() for column in columns.split(',') if column.strip()] if columns else None
+
+    with TrackFile(track_path) as track_file:
+        end = min(track_file.number_of_frames if end is None else end, track_file.number_of_frames,
+                  start + MAX_TRACK_FRAMES_PER_REQUEST)
+        try:
+            track_columns = track_file.read(start, end, columns)
+        except KeyError as e:
+            return jsonify({'error': str(e.args[0])}), 400
+        # to_numpy() may point into the mapping, so convert before closing
+        track_columns = {column: to_json_values(values) for column, values in track_columns.items()}
+
+    return jsonify({
+        'numberOfFrames': track_file.number_of_frames,
+        'fps': track_file.metadata.get('fps'),
+        'shotFrames': track_file.metadata.get('shot_frames', []),
+        'start': start,
+        'end': max(end, start),
+        'columns': track_columns,
+    }), 200
 
 @app.route('/api/video/<filename>', methods=['GET'])
 def stream_video(filename):
-    """Stream video endpoint"""
+    """Stream video endpoint; the player seeks with Range requests"""
     print(f"Video stream request for: {filename}")
-    
-    video_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    
-    if not os.path.exists(video_path):
-        print(f"Video file not found: {video_path}")
-        return jsonify({'error': 'Video file not found'}), 404
-    
-    return send_file(
-        video_path, 
-        mimetype='video/mp4',
-        as_attachment=False,
-        download_name=filename
-    )
+    return send_output_file(filename)
 
 @app.route('/outputs/<filename>', methods=['GET'])
 def download_video(filename):
     """Download video endpoint"""
     print(f"Download request for: {filename}")
-    
-    video_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    
-    if not os.path.exists(video_path):
-        print(f"Video file not found: {video_path}")
-        return jsonify({'error': 'Video file not found'}), 404
-    
-    return send_file(video_path, as_attachment=True, download_name='tennis_analysis.mp4')
+    return send_output_file(filename, as_attachment=True, download_name='tennis_analysis.mp4')
 
 @app.route('/api/analyses', methods=['GET'])
 @jwt_required()
@@ -0,0 +1,305 @@
+"""
+Persistent, bounded analysis job queue backed by the analysis_jobs table.
+Dispatcher threads claim queued jobs with fair-share ordering between users (all
+guests share one slot), running jobs keep a heartbeat, and jobs whose process died
+are put back in the queue once their heartbeat is older than the lease; a job whose
+model worker died (run_job raises JobInterruptedError) is put back right away. The
+maintenance thread also deletes finished guest analyses, and their files, after a
+retention period.
+Of the web processes on one machine (gunicorn workers), only the one holding the
+runner lock dispatches jobs, so only one of them starts the model worker pool.
+"""
+import math
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from backend.models import db, Analysis, AnalysisJob
+from utils import get_track_file_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: run the backend as a single process (python app.py)
+    fcntl = None
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after_seconds):
+        super().__init__('Analysis queue is full')
+        self.retry_after_seconds = retry_after_seconds
+
+
+class JobInterruptedError(Exception):
+    """Raised by run_job when the job did not fail itself but lost its worker; the job is requeued"""
+
+
+def get_job_owner(user_id):
+    return f"user:{user_id}" if user_id else 'guest'
+
+
+class JobQueue:
+    def __init__(self, app, run_job, concurrency=1, max_queue_depth=20, lease_seconds=120,
+                 max_attempts=3, poll_interval_seconds=2.0, average_job_seconds=120,
+                 guest_retention_seconds=7 * 24 * 3600, compaction_batch_size=500, runner_lock_path=None):
+        self.app = app
+        self.run_job = run_job
+        self.concurrency = concurrency
+        self.max_queue_depth = max_queue_depth
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval_seconds = poll_interval_seconds
+        self.average_job_seconds = average_job_seconds
+        self.guest_retention_seconds = guest_retention_seconds
+        self.compaction_batch_size = compaction_batch_size
+        self.runner_lock_path = runner_lock_path
+        self.runner_lock_file = None
+
+        self.job_available = threading.Event()
+        self.stopped = threading.Event()
+        # Analysis id -> lease token of the jobs this process is running
+        self.running_jobs = {}
+        self.running_jobs_lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        """Dispatch jobs from this process once it holds the runner lock"""
+        threading.Thread(target=self._start_when_runner, name='job-runner-lock', daemon=True).start()
+
+    def _start_when_runner(self):
+        if self.runner_lock_path is not None and fcntl is not None:
+            # Blocks while another web process runs the jobs. The OS releases the lock
+            # when that process exits, and a waiting process takes over.
+            self.runner_lock_file = open(self.runner_lock_path, 'a')
+            fcntl.flock(self.runner_lock_file, fcntl.LOCK_EX)
+        if self.stopped.is_set():
+            return
+        print(f"Process {os.getpid()} is running analysis jobs")
+        for i in range(self.concurrency):
+            self.threads.append(threading.Thread(target=self._dispatch_loop, name=f"job-dispatcher-{i}", daemon=True))
+        self.threads.append(threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True))
+        self.threads.append(threading.Thread(target=self._maintenance_loop, name='job-maintenance', daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.job_available.set()
+
+    def queue_depth(self):
+        return AnalysisJob.query.filter_by(state='queued').count()
+
+    def retry_after_seconds(self, queue_depth=None):
+        if queue_depth is None:
+            queue_depth = self.queue_depth()
+        return int(math.ceil((queue_depth + 1) / self.concurrency) * self.average_job_seconds)
+
+    def check_admission(self):
+        """Raise QueueFullError when the queue is too deep to accept another job"""
+        queue_depth = self.queue_depth()
+        if queue_depth >= self.max_queue_depth:
+            raise QueueFullError(self.retry_after_seconds(queue_depth))
+
+    def enqueue(self, analysis_id, user_id, input_path, output_path, input_sha256=None):
+        """Add a job in the current session; the caller commits it together with its Analysis row"""
+        db.session.add(AnalysisJob(
+            id=analysis_id,
+            owner=get_job_owner(user_id),
+            user_id=user_id,
+            input_path=input_path,
+            output_path=output_path,
+            input_sha256=input_sha256,
+            state='queued'
+        ))
+
+    def notify(self):
+        self.job_available.set()
+
+    def _claim_next_job(self):
+        """Claim the oldest queued job of the owner with the fewest running jobs"""
+        running_counts = dict(db.session.query(AnalysisJob.owner, func.count(AnalysisJob.id))
+                              .filter_by(state='running')
+                              .group_by(AnalysisJob.owner)
+                              .all())
+        # The queue is bounded by max_queue_depth, so reading all queued rows stays cheap
+        queued_jobs = AnalysisJob.query.filter_by(state='queued').order_by(AnalysisJob.created_at).all()
+        queued_jobs.sort(key=lambda job: running_counts.get(job.owner, 0))
+
+        for job in queued_jobs:
+            lease_token = str(uuid.uuid4())
+            claimed_job = (job.id, job.user_id, job.input_path, job.output_path, job.input_sha256, lease_token)
+            now = datetime.utcnow()
+            # Conditional update: only one dispatcher, in any process, wins the job
+            claimed = (AnalysisJob.query
+                       .filter_by(id=job.id, state='queued')
+                       .update({'state': 'running',
+                                'lease_token': lease_token,
+                                'started_at': now,
+                                'heartbeat_at': now,
+                                'attempts': AnalysisJob.attempts + 1},
+                               synchronize_session=False))
+            db.session.commit()
+            if claimed == 1:
+                return claimed_job
+        return None
+
+    def _dispatch_loop(self):
+        while not self.stopped.is_set():
+            try:
+                with self.app.app_context():
+                    claimed_job = self._claim_next_job()
+            except Exception as e:
+                print(f"Job queue claim error: {e}")
+                claimed_job = None
+
+            if claimed_job is None:
+                self.job_available.wait(self.poll_interval_seconds)
+                self.job_available.clear()
+                continue
+
+            analysis_id, user_id, input_path, output_path, input_sha256, lease_token = claimed_job
+            with self.running_jobs_lock:
+                self.running_jobs[analysis_id] = lease_token
+            try:
+                self.run_job(analysis_id, input_path, output_path, user_id, input_sha256=input_sha256)
+            except JobInterruptedError as e:
+                # Requeueing clears the lease token, so the delete below leaves the row alone
+                try:
+                    with self.app.app_context():
+                        self._requeue_interrupted_job(analysis_id, lease_token, str(e))
+                except Exception as requeue_error:
+                    print(f"[{analysis_id}] Failed to requeue interrupted job: {requeue_error}")
+            finally:
+                with self.running_jobs_lock:
+                    self.running_jobs.pop(analysis_id, None)
+                with self.app.app_context():
+                    # If the lease expired and the job was requeued or claimed again,
+                    # the row belongs to that claim and stays
+                    AnalysisJob.query.filter_by(id=analysis_id, lease_token=lease_token).delete()
+                    db.session.commit()
+
+    def _heartbeat_loop(self):
+        # Its own thread, so a slow maintenance pass cannot let the lease of a running job expire
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                with self.app.app_context():
+                    self._refresh_heartbeats()
+            except Exception as e:
+                print(f"Job queue heartbeat error: {e}")
+
+    def _maintenance_loop(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                with self.app.app_context():
+                    self._requeue_stale_jobs()
+                    self._compact_guest_analyses()
+            except Exception as e:
+                print(f"Job queue maintenance error: {e}")
+
+    def _refresh_heartbeats(self):
+        with self.running_jobs_lock:
+            running_jobs = list(self.running_jobs.items())
+        if running_jobs:
+            now = datetime.utcnow()
+            for analysis_id, lease_token in running_jobs:
+                (AnalysisJob.query
+                 .filter_by(id=analysis_id, lease_token=lease_token)
+                 .update({'heartbeat_at': now}, synchronize_session=False))
+            db.session.commit()
+
+    def _requeue_stale_jobs(self):
+        """Put jobs of crashed processes back in the queue, or fail them after max_attempts"""
+        lease_expired = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        stale_jobs = AnalysisJob.query.filter(AnalysisJob.state == 'running',
+                                              AnalysisJob.heartbeat_at < lease_expired).all()
+        for job in stale_jobs:
+            # Conditional on the stale claim, so a heartbeat that arrived after the query wins
+            still_stale = (AnalysisJob.query
+                           .filter(AnalysisJob.id == job.id,
+                                   AnalysisJob.lease_token == job.lease_token,
+                                   AnalysisJob.heartbeat_at < lease_expired))
+            self._requeue_or_fail(job, still_stale, 'its worker stopped responding')
+        if stale_jobs:
+            db.session.commit()
+            self.notify()
+
+    def _requeue_interrupted_job(self, analysis_id, lease_token, reason):
+        """Put a job whose worker died back in the queue, or fail it after max_attempts"""
+        claim = AnalysisJob.query.filter_by(id=analysis_id, lease_token=lease_token)
+        job = claim.first()
+        if job is None:
+            return
+        self._requeue_or_fail(job, claim, reason)
+        db.session.commit()
+        self.notify()
+
+    def _requeue_or_fail(self, job, claim, reason):
+        """
+        Requeue an interrupted job, or delete it and fail its analysis once it used up
+        max_attempts. claim selects the row only while the interrupted claim holds it;
+        if another claim owns the row by now, nothing changes. The caller commits.
+        """
+        if job.attempts >= self.max_attempts:
+            if claim.delete(synchronize_session=False) != 1:
+                return
+            analysis = db.session.get(Analysis, job.id)
+            if analysis:
+                analysis.error_message = 'Processing was interrupted too many times'
+                analysis.status = 'failed'
+                analysis.completed_at = datetime.utcnow()
+            print(f"[{job.id}] Giving up after {job.attempts} interrupted attempts")
+        else:
+            # Clearing the token ends the old claim: its heartbeats and final delete no longer match
+            if claim.update({'state': 'queued', 'lease_token': None}, synchronize_session=False) != 1:
+                return
+            analysis = db.session.get(Analysis, job.id)
+            if analysis:
+                analysis.status = 'queued'
+                analysis.progress = 0
+            print(f"[{job.id}] Requeued after {reason}")
+
+    def _compact_guest_analyses(self):
+        """
+        Delete finished guest analyses past the retention period, a bounded batch per pass,
+        together with their upload, output video and track file
+        """
+        retention_expired = datetime.utcnow() - timedelta(seconds=self.guest_retention_seconds)
+        expired_analyses = (db.session.query(Analysis.id, Analysis.input_filename, Analysis.output_filename)
+                            .filter(Analysis.user_id.is_(None),
+                                    Analysis.status.in_(['completed', 'failed']),
+                                    Analysis.completed_at < retention_expired)
+                            .limit(self.compaction_batch_size)
+                            .all())
+        if not expired_analyses:
+            return
+
+        for _, input_filename, output_filename in expired_analyses:
+            for path in self._get_analysis_files(input_filename, output_filename):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        expired_ids = [analysis_id for analysis_id, _, _ in expired_analyses]
+        Analysis.query.filter(Analysis.id.in_(expired_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        print(f"Compacted {len(expired_ids)} finished guest analyses")
+
+    def _get_analysis_files(self, input_filename, output_filename):
+        """Files an analysis may have left on disk; a failed one can still have a partial output"""
+        if not output_filename:
+            output_filename = f"{os.path.splitext(input_filename)[0]}_analyzed.mp4"
+        output_path = os.path.join(self.app.config['OUTPUT_FOLDER'], output_filename)
+        return [os.path.join(self.app.config['UPLOAD_FOLDER'], input_filename),
+                output_path,
+                get_track_file_path(output_path)]
+
+
+def create_job_queue(app, run_job):
+    concurrency = int(os.getenv('ANALYSIS_CONCURRENCY', os.getenv('ANALYSIS_WORKERS', 1)))
+    return JobQueue(app, run_job,
+                    concurrency=concurrency,
+                    max_queue_depth=int(os.getenv('ANALYSIS_MAX_QUEUE_DEPTH', 20)),
+                    lease_seconds=int(os.getenv('ANALYSIS_LEASE_SECONDS', 120)),
+                    guest_retention_seconds=float(os.getenv('ANALYSIS_GUEST_RETENTION_HOURS', 7 * 24)) * 3600,
+                    runner_lock_path=(os.getenv('ANALYSIS_RUNNER_LOCK_PATH') or
+                                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_runner.lock')))
@@ -92,3 +92,51 @@ class Analysis(db.Model):
             self.completed_at = datetime.utcnow()
         
         db.session.commit()
+
+class AnalysisJob(db.Model):
+    """Persistent queue entry for an analysis, so queued jobs survive process restarts"""
+    __tablename__ = 'analysis_jobs'
+    
+    id = db.Column(db.String(36), db.ForeignKey('analyses.id'), primary_key=True)
+    owner = db.Column(db.String(64), nullable=False, index=True)  # 'user:<id>' or 'guest'
+    user_id = db.Column(db.Integer, nullable=True)
+    input_path = db.Column(db.String(512), nullable=False)
+    output_path = db.Column(db.String(512), nullable=False)
+    # SHA-256 hex digest of the input, when the upload already computed it
+    input_sha256 = db.Column(db.String(64))
+    
+    # queued -> running; the row is deleted when the job finishes
+    state = db.Column(db.String(20), default='queued', nullable=False, index=True)
+    # New for every claim: heartbeats and the final delete only touch the row while
+    # it still belongs to the claim that runs the job
+    lease_token = db.Column(db.String(36))
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+class UploadSession(db.Model):
+    """Chunked upload in progress; its id becomes the analysis id when it is finalized"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(36), primary_key=True)  # UUID
+    user_id = db.Column(db.Integer, nullable=True)
+    # File the chunks are written to, in the uploads folder
+    input_filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    # Bytes written so far; the next chunk must start here
+    received_size = db.Column(db.BigInteger, default=0, nullable=False)
+    # Optional SHA-256 hex digest from the client, checked on finalize
+    sha256 = db.Column(db.String(64))
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON response"""
+        return {
+            'uploadId': self.id,
+            'offset': self.received_size,
+            'size': self.total_size
+        }
@@ -0,0 +1,155 @@
+"""
+Live analysis progress.
+Workers report progress once per chunk of frames. The hub keeps the latest state of
+each analysis in memory, wakes Server-Sent Events subscribers, and writes
+Analysis.progress to the database at most every persist_interval_seconds.
+"""
+import json
+import threading
+import time
+from backend.models import db, Analysis
+
+# Part of the overall progress covered by each stage reported by main.main; 100 is
+# only reached once the analysis is saved as completed
+STAGE_PROGRESS_RANGES = {
+    'detection': (0, 75),
+    'statistics': (75, 80),
+    'rendering': (80, 99),
+}
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def get_stage_progress(stage, current, total):
+    start, end = STAGE_PROGRESS_RANGES.get(stage, (0, 0))
+    if not total:
+        return start
+    return int(start + (end - start) * min(current / total, 1.0))
+
+
+def get_analysis_state(analysis):
+    return {
+        'status': analysis.status,
+        'progress': analysis.progress,
+        'stage': None,
+        'outputFile': analysis.output_filename,
+        'error': analysis.error_message,
+    }
+
+
+class ProgressHub:
+    def __init__(self, app, persist_interval_seconds=5.0, finished_state_seconds=60.0):
+        self.app = app
+        self.persist_interval_seconds = persist_interval_seconds
+        self.finished_state_seconds = finished_state_seconds
+
+        # analysis_id -> latest state; only analyses run by this process are here
+        self.states = {}
+        self.last_persisted_at = {}
+        self.finished_at = {}
+        # Bumped on every change; subscribers wait for it to move
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def update(self, analysis_id, **fields):
+        """Update the live state (status, progress, stage, outputFile, error) and wake subscribers"""
+        with self.condition:
+            state = self.states.setdefault(analysis_id, {'status': 'queued', 'progress': 0, 'stage': None,
+                                                         'outputFile': None, 'error': None})
+            state.update(fields)
+            if state['status'] in FINISHED_STATUSES:
+                self.finished_at[analysis_id] = time.monotonic()
+                self.last_persisted_at.pop(analysis_id, None)
+            self._forget_finished()
+            self.version += 1
+            self.condition.notify_all()
+
+    def forget(self, analysis_id):
+        """Drop the live state of an analysis this process stopped running; readers fall back to the database"""
+        with self.condition:
+            self.states.pop(analysis_id, None)
+            self.finished_at.pop(analysis_id, None)
+            self.last_persisted_at.pop(analysis_id, None)
+            self.version += 1
+            self.condition.notify_all()
+
+    def report_progress(self, analysis_id, stage, current, total):
+        """Progress callback of a running job; the database only sees throttled writes"""
+        progress = get_stage_progress(stage, current, total)
+        with self.condition:
+            state = self.states.get(analysis_id)
+            if state is None or state['status'] in FINISHED_STATUSES:
+                return
+            # Never move backwards when a stage reports fewer frames than the header promised
+            progress = max(progress, state['progress'])
+        self.update(analysis_id, status='processing', progress=progress, stage=stage)
+
+        now = time.monotonic()
+        if now - self.last_persisted_at.get(analysis_id, 0) >= self.persist_interval_seconds:
+            self.last_persisted_at[analysis_id] = now
+            self._persist_progress(analysis_id, progress)
+
+    def _persist_progress(self, analysis_id, progress):
+        try:
+            with self.app.app_context():
+                (Analysis.query
+                 .filter_by(id=analysis_id, status='processing')
+                 .update({'progress': progress}, synchronize_session=False))
+                db.session.commit()
+        except Exception as e:
+            print(f"[{analysis_id}] Failed to save progress: {e}")
+
+    def _forget_finished(self):
+        expired = time.monotonic() - self.finished_state_seconds
+        for analysis_id, finished_at in list(self.finished_at.items()):
+            if finished_at < expired:
+                del self.finished_at[analysis_id]
+                self.states.pop(analysis_id, None)
+
+    def get_state(self, analysis_id):
+        """Live state if this process runs the analysis, else the last state saved in the database"""
+        with self.condition:
+            state = self.states.get(analysis_id)
+            if state is not None:
+                return dict(state), True
+        # Expire cached rows so a long-lived stream sees other processes' writes
+        db.session.expire_all()
+        analysis = db.session.get(Analysis, analysis_id)
+        state = get_analysis_state(analysis) if analysis else None
+        db.session.close()
+        return state, False
+
+    def stream_events(self, analysis_id, keepalive_seconds=15.0, max_stream_seconds=300.0):
+        """
+        Server-Sent Events for one analysis: a data event on every change, a comment as
+        keepalive, and the stream ends once the analysis finished or after
+        max_stream_seconds (EventSource reconnects by itself).
+        Runs inside the request's app context.
+        """
+        deadline = time.monotonic() + max_stream_seconds
+        last_sent_state = None
+        last_sent_at = time.monotonic()
+        yield 'retry: 2000\n\n'
+        while time.monotonic() < deadline:
+            with self.condition:
+                seen_version = self.version
+            state, is_live = self.get_state(analysis_id)
+            if state is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Analysis ID not found'})}\n\n"
+                return
+            if state != last_sent_state:
+                yield f"data: {json.dumps(state)}\n\n"
+                last_sent_state = state
+                last_sent_at = time.monotonic()
+            elif time.monotonic() - last_sent_at >= keepalive_seconds:
+                yield ': keepalive\n\n'
+                last_sent_at = time.monotonic()
+            if state['status'] in FINISHED_STATUSES:
+                return
+
+            if is_live:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.version != seen_version, timeout=keepalive_seconds)
+            else:
+                # Analyses run by another process are only visible through the database,
+                # where progress changes every persist_interval_seconds at most
+                time.sleep(min(keepalive_seconds, self.persist_interval_seconds))
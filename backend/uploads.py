@@ -0,0 +1,231 @@
+"""
+Chunked, resumable uploads. A client creates an upload session with the file size,
+then PUTs the file in chunks at increasing offsets and finalizes it. Every chunk is
+read from the request stream and written straight into the input file at its offset,
+so no request holds more than one chunk and an interrupted chunk keeps the bytes that
+arrived: the session offset tells the client where to resume.
+The SHA-256 of the file is updated as chunks are written. The hash object lives in the
+web process; when a chunk lands on another process, or after a restart, the missing
+part is hashed from the file on disk first.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from backend.models import db, UploadSession
+
+try:
+    import fcntl
+except ImportError:  # Windows: chunks of one upload are only serialized within a process
+    fcntl = None
+
+# Bytes read from the request stream per write
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Rejected chunk or finalize; offset is where the client should continue, if it can"""
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadStore:
+    def __init__(self, upload_folder, max_upload_size=4 * 1024 ** 3, chunk_size=8 * 1024 * 1024,
+                 max_chunk_size=64 * 1024 * 1024, session_expiry_seconds=24 * 3600, cleanup_batch_size=100):
+        self.upload_folder = upload_folder
+        self.max_upload_size = max_upload_size
+        # Chunk size suggested to clients, and the largest chunk accepted
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.session_expiry_seconds = session_expiry_seconds
+        self.cleanup_batch_size = cleanup_batch_size
+
+        self.lock = threading.Lock()
+        # Uploads with a chunk being written or a finalize running in this process
+        self.busy_uploads = set()
+        # Upload id -> (bytes hashed, sha256 object)
+        self.hashers = {}
+
+    def get_path(self, upload_session):
+        return os.path.join(self.upload_folder, upload_session.input_filename)
+
+    def create(self, upload_id, user_id, input_filename, size, sha256=None):
+        """New session with an empty input file; the caller commits it"""
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('File size must be a positive number of bytes')
+        if size > self.max_upload_size:
+            raise UploadError(f'File is larger than the {self.max_upload_size // (1024 * 1024)} MB limit', 413)
+        if sha256 is not None:
+            sha256 = str(sha256).lower()
+            if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+                raise UploadError('sha256 must be a hex SHA-256 digest')
+
+        self.delete_expired()
+        upload_session = UploadSession(id=upload_id, user_id=user_id, input_filename=input_filename,
+                                       total_size=size, received_size=0, sha256=sha256)
+        open(self.get_path(upload_session), 'wb').close()
+        db.session.add(upload_session)
+        return upload_session
+
+    def get_offset(self, upload_session):
+        """Offset of the next chunk, after checking that the file really holds that many bytes"""
+        self._check_file(upload_session)
+        return upload_session.received_size
+
+    def append(self, upload_session, offset, stream, content_length):
+        """
+        Write the chunk of content_length bytes from stream at offset, which must be the
+        current end of the upload. Returns the new offset. If the stream ends early the
+        bytes that arrived are kept and UploadError tells the client the offset to resume from.
+        """
+        if content_length is None:
+            raise UploadError('Content-Length is required', 411, upload_session.received_size)
+        if content_length > self.max_chunk_size:
+            raise UploadError(f'Chunks can be at most {self.max_chunk_size} bytes', 413, upload_session.received_size)
+
+        with self._lock_upload(upload_session) as f:
+            self._check_file(upload_session)
+            received_size = upload_session.received_size
+            if offset != received_size:
+                raise UploadError('Chunk does not start at the upload offset', 409, received_size)
+            if offset + content_length > upload_session.total_size:
+                raise UploadError('Chunk goes past the end of the file', 400, received_size)
+
+            hasher = self._get_hasher(upload_session, f)
+            written = 0
+            f.seek(offset)
+            try:
+                while written < content_length:
+                    block = stream.read(min(STREAM_BLOCK_SIZE, content_length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    hasher.update(block)
+                    written += len(block)
+            finally:
+                # Keep exactly the bytes that were hashed, also when the client disconnected
+                f.truncate(offset + written)
+                f.flush()
+                self.hashers[upload_session.id] = (offset + written, hasher)
+                upload_session.received_size = offset + written
+                db.session.commit()
+
+        if written < content_length:
+            raise UploadError('Chunk ended early', 400, upload_session.received_size)
+        return upload_session.received_size
+
+    def finalize(self, upload_session):
+        """
+        Check that the whole file arrived and matches the client's sha256, and delete the
+        session (the caller commits). Returns (input path, sha256 hex digest).
+        """
+        with self._lock_upload(upload_session) as f:
+            self._check_file(upload_session)
+            if upload_session.received_size != upload_session.total_size:
+                raise UploadError('Upload is not complete', 409, upload_session.received_size)
+
+            sha256 = self._get_hasher(upload_session, f).hexdigest()
+            if upload_session.sha256 and sha256 != upload_session.sha256:
+                # The file cannot be repaired chunk by chunk, the client has to start over
+                self.delete(upload_session)
+                db.session.commit()
+                raise UploadError('File content does not match sha256, please upload it again')
+
+            self.hashers.pop(upload_session.id, None)
+            db.session.delete(upload_session)
+        return self.get_path(upload_session), sha256
+
+    def delete(self, upload_session):
+        """Remove the session and its partial file; the caller commits"""
+        self.hashers.pop(upload_session.id, None)
+        path = self.get_path(upload_session)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(upload_session)
+
+    def delete_expired(self):
+        """Delete sessions without a chunk for session_expiry_seconds, a bounded batch per call"""
+        expired = datetime.utcnow() - timedelta(seconds=self.session_expiry_seconds)
+        expired_sessions = (UploadSession.query
+                            .filter(UploadSession.updated_at < expired)
+                            .limit(self.cleanup_batch_size)
+                            .all())
+        for upload_session in expired_sessions:
+            self.delete(upload_session)
+        if expired_sessions:
+            db.session.commit()
+            print(f"Deleted {len(expired_sessions)} expired upload sessions")
+
+    def _check_file(self, upload_session):
+        # The row can be ahead of the file if the process died before the data reached the disk
+        db.session.refresh(upload_session)
+        file_size = os.path.getsize(self.get_path(upload_session))
+        if file_size < upload_session.received_size:
+            upload_session.received_size = file_size
+            db.session.commit()
+
+    def _get_hasher(self, upload_session, f):
+        """Hash object covering the received bytes, catching up from the file when needed"""
+        hashed_size, hasher = self.hashers.get(upload_session.id, (0, None))
+        if hasher is None or hashed_size > upload_session.received_size:
+            hashed_size, hasher = 0, hashlib.sha256()
+        f.seek(hashed_size)
+        while hashed_size < upload_session.received_size:
+            block = f.read(min(STREAM_BLOCK_SIZE, upload_session.received_size - hashed_size))
+            hasher.update(block)
+            hashed_size += len(block)
+        self.hashers[upload_session.id] = (hashed_size, hasher)
+        return hasher
+
+    def _lock_upload(self, upload_session):
+        return _UploadLock(self, upload_session.id, self.get_path(upload_session))
+
+
+class _UploadLock:
+    """
+    Opens the input file for writing while no other request works on the same upload:
+    a set of busy uploads within the process and an exclusive flock across web processes.
+    A busy upload is a 409, since the client is retrying a chunk that is still being written.
+    """
+    def __init__(self, store, upload_id, path):
+        self.store = store
+        self.upload_id = upload_id
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        with self.store.lock:
+            if self.upload_id in self.store.busy_uploads:
+                raise UploadError('Another chunk of this upload is being written', 409)
+            self.store.busy_uploads.add(self.upload_id)
+        try:
+            self.file = open(self.path, 'r+b')
+        except FileNotFoundError:
+            self._release()
+            raise UploadError('Upload file is missing, please upload it again', 410)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.file.close()
+                self._release()
+                raise UploadError('Another chunk of this upload is being written', 409)
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()  # also releases the flock
+        self._release()
+        return False
+
+    def _release(self):
+        with self.store.lock:
+            self.store.busy_uploads.discard(self.upload_id)
+
+
+def create_upload_store(upload_folder):
+    return UploadStore(upload_folder,
+                       max_upload_size=int(os.getenv('MAX_UPLOAD_SIZE_MB', 4096)) * 1024 * 1024,
+                       chunk_size=int(os.getenv('UPLOAD_CHUNK_SIZE_MB', 8)) * 1024 * 1024,
+                       session_expiry_seconds=float(os.getenv('UPLOAD_SESSION_EXPIRY_HOURS', 24)) * 3600)
@@ -0,0 +1,168 @@
+"""
+Long-lived analysis worker processes.
+Each worker loads the player, ball and court models once and then runs the jobs sent
+to it over the pool's queue. Workers are replaced after a number of jobs to bound
+memory growth. When a worker dies (for example killed for running out of memory) the
+executor breaks; the next submit replaces it with fresh workers.
+"""
+import multiprocessing
+import os
+import sys
+import itertools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Models of the current worker process, loaded once by _init_worker
+_worker_models = None
+
+
+# Config the worker models were built from, passed by the parent process
+_worker_config = None
+# Queue back to the parent process for (job_id, stage, current, total) progress messages
+_progress_queue = None
+
+
+def _init_worker(config, progress_queue):
+    global _worker_models, _worker_config, _progress_queue
+    # Every path in config is already absolute, so the worker never changes its
+    # working directory
+    if PARENT_DIR not in sys.path:
+        sys.path.append(PARENT_DIR)
+
+    from trackers import PlayerTracker, BallTracker
+    from court_line_detector import CourtLineDetector
+
+    _worker_config = config
+    _progress_queue = progress_queue
+    _worker_models = {
+        'player_tracker': PlayerTracker.from_config(config),
+        'ball_tracker': BallTracker.from_config(config),
+        'court_line_detector': CourtLineDetector.from_config(config),
+    }
+    print(f"[worker {os.getpid()}] Models loaded")
+
+
+def _run_analysis(job_id, input_path, output_path, video_hash=None):
+    from main import main as analyze_video
+
+    def report_progress(stage, current, total):
+        _progress_queue.put((job_id, stage, current, total))
+
+    # main resets the trackers, so ByteTrack IDs never leak from the previous job
+    return analyze_video(input_path, output_path, config=_worker_config,
+                         progress_callback=report_progress, video_hash=video_hash, **_worker_models)
+
+
+class AnalysisWorkerPool:
+    def __init__(self, num_workers=1, max_jobs_per_worker=10, config=None):
+        if PARENT_DIR not in sys.path:
+            sys.path.append(PARENT_DIR)
+        from config import AnalysisConfig
+        self.config = (config or AnalysisConfig()).resolved()
+
+        # spawn: forking a process that already holds torch threads and DB connections is unsafe
+        mp_context = multiprocessing.get_context('spawn')
+
+        # Workers send progress over one queue; a listener thread hands it to the
+        # callback registered for the job
+        self.progress_queue = mp_context.Queue()
+        self.progress_callbacks = {}
+        self.progress_callbacks_lock = threading.Lock()
+        self.job_ids = itertools.count()
+        self.progress_thread = threading.Thread(target=self._progress_loop, name='worker-progress', daemon=True)
+        self.progress_thread.start()
+
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.executor_kwargs = {
+            'max_workers': num_workers,
+            'mp_context': mp_context,
+            'initializer': _init_worker,
+            'initargs': (self.config, self.progress_queue),
+        }
+        self.executor_lock = threading.Lock()
+        self.executor = self._create_executor()
+
+    def _create_executor(self):
+        try:
+            return ProcessPoolExecutor(max_tasks_per_child=self.max_jobs_per_worker, **self.executor_kwargs)
+        except TypeError:
+            # Python < 3.11 cannot recycle workers; they live as long as the pool
+            return ProcessPoolExecutor(**self.executor_kwargs)
+
+    def _replace_broken_executor(self, broken_executor):
+        """Shut down an executor that lost a worker and start a new one, once per broken executor"""
+        with self.executor_lock:
+            if self.executor is broken_executor:
+                print("An analysis worker died, restarting the worker pool")
+                broken_executor.shutdown(wait=False)
+                self.executor = self._create_executor()
+            return self.executor
+
+    def submit(self, input_path, output_path, progress_callback=None, video_hash=None):
+        """
+        Queue a job and return a Future with the output video path.
+        progress_callback(stage, current, total) is called from the listener thread.
+        video_hash is the SHA-256 of the input if known, so the worker does not read it again.
+        If the worker running the job dies, the Future raises BrokenProcessPool.
+        """
+        job_id = next(self.job_ids)
+        if progress_callback is not None:
+            with self.progress_callbacks_lock:
+                self.progress_callbacks[job_id] = progress_callback
+        job_args = (job_id, os.path.abspath(input_path), os.path.abspath(output_path), video_hash)
+        with self.executor_lock:
+            executor = self.executor
+        try:
+            future = executor.submit(_run_analysis, *job_args)
+        except BrokenProcessPool:
+            # Jobs that were running on the broken executor fail with BrokenProcessPool
+            # themselves; the caller puts them back in the queue
+            future = self._replace_broken_executor(executor).submit(_run_analysis, *job_args)
+        future.add_done_callback(lambda _: self._remove_progress_callback(job_id))
+        return future
+
+    def _remove_progress_callback(self, job_id):
+        with self.progress_callbacks_lock:
+            self.progress_callbacks.pop(job_id, None)
+
+    def _progress_loop(self):
+        while True:
+            message = self.progress_queue.get()
+            if message is None:
+                return
+            job_id, stage, current, total = message
+            with self.progress_callbacks_lock:
+                progress_callback = self.progress_callbacks.get(job_id)
+            if progress_callback is None:
+                continue
+            try:
+                progress_callback(stage, current, total)
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+
+    def shutdown(self, wait=True):
+        with self.executor_lock:
+            executor = self.executor
+        executor.shutdown(wait=wait)
+        self.progress_queue.put(None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Pool shared by the whole web process, created on first use. Only the process
+    running the job queue (see JobQueue.start) submits jobs, so it is the only one
+    with a pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AnalysisWorkerPool(num_workers=int(os.getenv('ANALYSIS_WORKERS', 1)),
+                                       max_jobs_per_worker=int(os.getenv('ANALYSIS_JOBS_PER_WORKER', 10)))
+        return _pool
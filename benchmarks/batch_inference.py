@@ -0,0 +1,64 @@
+"""
+Benchmark PlayerTracker and BallTracker detection speed against batch size on CPU
+
+Usage:
+    python benchmarks/batch_inference.py input_videos/input_video.mp4 --frames 96 --batch-sizes 1 4 8 16
+"""
+import os
+# Hide GPUs before torch is imported so the numbers are CPU numbers
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+import argparse
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import read_video_chunks
+from trackers import PlayerTracker, BallTracker
+
+
+def benchmark_tracker(tracker_class, model_path, frames, batch_size):
+    tracker = tracker_class(model_path=model_path)
+    # Warm up so model fusing and the first allocation are not timed
+    tracker.detect_frames(frames[:1])
+
+    tracker = tracker_class(model_path=model_path)
+    start = time.perf_counter()
+    detections = tracker.detect_frames(frames, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, detections
+
+
+def relabel_track_ids(player_detections):
+    """Number track IDs by first appearance, since ByteTrack's ID counter is process-global"""
+    relabeled_ids = {}
+    return [[relabeled_ids.setdefault(track_id, len(relabeled_ids)) for track_id in player_dict]
+            for player_dict in player_detections]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video_path')
+    parser.add_argument('--frames', type=int, default=96)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--player-model', default='yolov8x')
+    parser.add_argument('--ball-model', default='models/yolo5_last.pt')
+    args = parser.parse_args()
+
+    frames = next(read_video_chunks(args.video_path, args.frames))
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    baseline_player_detections = None
+    print(f"{'batch':>6} {'player fps':>11} {'ball fps':>9} {'same ids':>9}")
+    for batch_size in args.batch_sizes:
+        player_fps, player_detections = benchmark_tracker(PlayerTracker, args.player_model, frames, batch_size)
+        ball_fps, _ = benchmark_tracker(BallTracker, args.ball_model, frames, batch_size)
+
+        if baseline_player_detections is None:
+            baseline_player_detections = player_detections
+        same_ids = relabel_track_ids(player_detections) == relabel_track_ids(baseline_player_detections)
+        print(f"{batch_size:>6} {player_fps:>11.2f} {ball_fps:>9.2f} {str(same_ids):>9}")
+
+
+if __name__ == "__main__":
+    main()
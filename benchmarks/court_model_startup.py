@@ -0,0 +1,74 @@
+"""
+Benchmark CourtLineDetector cold start: loading the checkpoint eagerly, exporting
+TorchScript, and reusing the TorchScript export. Every mode runs in a fresh
+interpreter so import and load costs are really cold.
+
+Usage:
+    python benchmarks/court_model_startup.py --model-path models/keypoints_model.pth
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(model_path, use_torchscript, torchscript_dir):
+    """Runs inside the child interpreter and prints the timings as JSON"""
+    start = time.perf_counter()
+    sys.path.append(ROOT_DIR)
+    import numpy as np
+    from court_line_detector import CourtLineDetector
+    imported = time.perf_counter()
+
+    court_line_detector = CourtLineDetector(model_path, use_torchscript=use_torchscript, torchscript_dir=torchscript_dir)
+    loaded = time.perf_counter()
+
+    court_line_detector.predict(np.zeros((720, 1280, 3), dtype=np.uint8))
+    predicted = time.perf_counter()
+
+    print(json.dumps({
+        'import_s': imported - start,
+        'load_s': loaded - imported,
+        'first_predict_s': predicted - loaded,
+        'total_s': predicted - start,
+    }))
+
+
+def run_mode(model_path, use_torchscript, torchscript_dir):
+    command = [sys.executable, os.path.abspath(__file__), '--model-path', model_path,
+               '--torchscript-dir', torchscript_dir, '--child']
+    if use_torchscript:
+        command.append('--torchscript')
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=ROOT_DIR).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-path', default='models/keypoints_model.pth')
+    parser.add_argument('--torchscript', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--torchscript-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.model_path, args.torchscript, args.torchscript_dir)
+        return
+
+    # An empty export folder, so the first TorchScript run really exports
+    torchscript_dir = tempfile.mkdtemp(prefix='court_torchscript_')
+
+    print(f"{'mode':<22} {'import':>8} {'load':>8} {'predict':>8} {'total':>8}")
+    for name, use_torchscript in [('eager', False), ('torchscript export', True), ('torchscript reuse', True)]:
+        timings = run_mode(args.model_path, use_torchscript, torchscript_dir)
+        print(f"{name:<22} {timings['import_s']:>7.2f}s {timings['load_s']:>7.2f}s "
+              f"{timings['first_predict_s']:>7.2f}s {timings['total_s']:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
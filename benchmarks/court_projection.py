@@ -0,0 +1,91 @@
+"""
+Benchmark CourtProjector.project_points with per-frame court keypoints (every frame a
+different set, the worst case) against the per-group loop it replaced, check that both
+give the same positions, and fail if the time grows faster than linearly with the video.
+
+Usage:
+    python benchmarks/court_projection.py --frames 20000 --loop-frames 2000
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mini_court import CourtProjector
+
+
+def loop_project_points(court_projector, points, court_key_points):
+    """project_points before the per-frame homographies went through one einsum"""
+    points = np.asarray(points, dtype=np.float64)
+    court_key_points = np.asarray(court_key_points, dtype=np.float32)
+    projected = np.full(points.shape, np.nan)
+
+    unique_key_points, frame_groups = np.unique(court_key_points, axis=0, return_inverse=True)
+    frame_groups = frame_groups.reshape(-1)
+    for group_index, key_points in enumerate(unique_key_points):
+        in_group = (frame_groups == group_index).reshape((-1,) + (1,)*(points.ndim - 2))
+        in_group = np.broadcast_to(in_group, points.shape[:-1])
+        selected = in_group & np.isfinite(points).all(axis=-1)
+        if not selected.any():
+            continue
+        homography = court_projector.get_homography(key_points)
+        source_points = points[selected].reshape(-1, 1, 2)
+        projected[selected] = cv2.perspectiveTransform(source_points, homography).reshape(-1, 2)
+    return projected
+
+
+def make_inputs(number_of_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    drawing_key_points = rng.uniform(0, 300, (14, 2))
+    # Keypoints jittered a little in every frame, two players and the ball per frame
+    court_key_points = (drawing_key_points * 3 + [200, 100])[None] + rng.normal(0, 0.3, (number_of_frames, 14, 2))
+    points = rng.uniform(0, 1200, (number_of_frames, 3, 2))
+    points[rng.random((number_of_frames, 3)) < 0.1] = np.nan
+    return drawing_key_points, court_key_points.reshape(number_of_frames, 28).astype(np.float32), points
+
+
+def time_projection(number_of_frames):
+    drawing_key_points, court_key_points, points = make_inputs(number_of_frames)
+    start = time.perf_counter()
+    CourtProjector(drawing_key_points).project_points(points, court_key_points)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--loop-frames', type=int, default=2000,
+                        help="frames for the comparison with the quadratic loop")
+    parser.add_argument('--max-growth', type=float, default=6.0,
+                        help="largest allowed time ratio between --frames and a quarter of it (4 is linear)")
+    args = parser.parse_args()
+
+    drawing_key_points, court_key_points, points = make_inputs(args.loop_frames)
+    start = time.perf_counter()
+    loop_projected = loop_project_points(CourtProjector(drawing_key_points), points, court_key_points)
+    loop_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    projected = CourtProjector(drawing_key_points).project_points(points, court_key_points)
+    projector_seconds = time.perf_counter() - start
+    same = np.allclose(loop_projected, projected, equal_nan=True, atol=1e-6)
+    print(f"{args.loop_frames} frames, loop:           {loop_seconds:8.3f}s")
+    print(f"{args.loop_frames} frames, CourtProjector: {projector_seconds:8.3f}s "
+          f"({loop_seconds / projector_seconds:.1f}x), same positions: {same}")
+
+    quarter_seconds = time_projection(args.frames // 4)
+    full_seconds = time_projection(args.frames)
+    growth = full_seconds / quarter_seconds
+    print(f"{args.frames // 4} frames: {quarter_seconds:8.3f}s, {args.frames} frames: {full_seconds:8.3f}s, "
+          f"growth {growth:.1f}x for 4x the frames")
+
+    if not same:
+        sys.exit("CourtProjector positions differ from the loop")
+    if growth > args.max_growth:
+        sys.exit(f"Projection time grew {growth:.1f}x for 4x the frames, more than {args.max_growth}x")
+
+
+if __name__ == "__main__":
+    main()
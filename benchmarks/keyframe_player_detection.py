@@ -0,0 +1,86 @@
+"""
+Benchmark KeyframePlayerTracker against running the player detector on every frame on CPU.
+Accuracy is measured against the every-frame detections: for each baseline box of a
+player-sized person, the best IoU with any box of the same frame.
+
+Usage:
+    python benchmarks/keyframe_player_detection.py input_videos/input_video.mp4 --frames 240 --max-intervals 2 4 8
+"""
+import os
+# Hide GPUs before torch is imported so the numbers are CPU numbers
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+import argparse
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import read_video_chunks
+from trackers import PlayerTracker, KeyframePlayerTracker
+
+
+def get_iou(bbox, other_bbox):
+    x1, y1 = max(bbox[0], other_bbox[0]), max(bbox[1], other_bbox[1])
+    x2, y2 = min(bbox[2], other_bbox[2]), min(bbox[3], other_bbox[3])
+    intersection = max(x2 - x1, 0) * max(y2 - y1, 0)
+    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    other_area = (other_bbox[2] - other_bbox[0]) * (other_bbox[3] - other_bbox[1])
+    union = area + other_area - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def get_accuracy(player_detections, baseline_player_detections, min_area):
+    """Mean best IoU of the baseline boxes and the fraction found with IoU > 0.5"""
+    ious = []
+    for player_dict, baseline_player_dict in zip(player_detections, baseline_player_detections):
+        for bbox in baseline_player_dict.values():
+            if (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) < min_area:
+                continue
+            ious.append(max((get_iou(bbox, other_bbox) for other_bbox in player_dict.values()), default=0.0))
+    ious = np.array(ious)
+    if len(ious) == 0:
+        return 1.0, 1.0
+    return ious.mean(), (ious > 0.5).mean()
+
+
+def benchmark_tracker(tracker, frames):
+    start = time.perf_counter()
+    detections = tracker.detect_frames(frames)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video_path')
+    parser.add_argument('--frames', type=int, default=240)
+    parser.add_argument('--max-intervals', type=int, nargs='+', default=[2, 4, 8, 16])
+    parser.add_argument('--player-model', default='yolov8x')
+    # Smaller boxes are spectators and line judges, which choose_and_filter_players drops anyway
+    parser.add_argument('--min-area', type=float, default=2000)
+    args = parser.parse_args()
+
+    frames = next(read_video_chunks(args.video_path, args.frames))
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    player_tracker = PlayerTracker(model_path=args.player_model)
+    # Warm up so model fusing and the first allocation are not timed
+    player_tracker.detect_frames(frames[:1])
+
+    player_tracker.reset()
+    baseline_fps, baseline_player_detections = benchmark_tracker(player_tracker, frames)
+
+    print(f"{'interval':>9} {'fps':>7} {'speedup':>8} {'detector':>9} {'mean IoU':>9} {'IoU>0.5':>8}")
+    print(f"{'every':>9} {baseline_fps:>7.2f} {1.0:>7.2f}x {len(frames):>9} {1.0:>9.3f} {1.0:>8.3f}")
+    for max_interval in args.max_intervals:
+        tracker = KeyframePlayerTracker(player_tracker, max_interval=max_interval)
+        tracker.reset()
+        fps, player_detections = benchmark_tracker(tracker, frames)
+        mean_iou, found = get_accuracy(player_detections, baseline_player_detections, args.min_area)
+        print(f"{max_interval:>9} {fps:>7.2f} {fps / baseline_fps:>7.2f}x {tracker.keyframes:>9} "
+              f"{mean_iou:>9.3f} {found:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
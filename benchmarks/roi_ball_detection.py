@@ -0,0 +1,72 @@
+"""
+Benchmark RoiBallTracker against full-frame BallTracker detection on CPU.
+Recall is the fraction of full-frame ball detections that the crop search finds
+within --max-distance pixels.
+
+Usage:
+    python benchmarks/roi_ball_detection.py input_videos/input_video.mp4 --frames 240 --roi-sizes 256 320
+"""
+import os
+# Hide GPUs before torch is imported so the numbers are CPU numbers
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+import argparse
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import read_video_chunks, get_center_of_bbox, measure_distance
+from trackers import BallTracker, RoiBallTracker
+
+
+def get_recall(ball_detections, baseline_ball_detections, max_distance):
+    found = 0
+    total = 0
+    for ball_dict, baseline_ball_dict in zip(ball_detections, baseline_ball_detections):
+        if 1 not in baseline_ball_dict:
+            continue
+        total += 1
+        if 1 in ball_dict and measure_distance(get_center_of_bbox(ball_dict[1]),
+                                               get_center_of_bbox(baseline_ball_dict[1])) <= max_distance:
+            found += 1
+    return found / total if total else 1.0
+
+
+def benchmark_tracker(tracker, frames):
+    start = time.perf_counter()
+    detections = tracker.detect_frames(frames)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video_path')
+    parser.add_argument('--frames', type=int, default=240)
+    parser.add_argument('--roi-sizes', type=int, nargs='+', default=[192, 256, 320])
+    parser.add_argument('--ball-model', default='models/yolo5_last.pt')
+    parser.add_argument('--max-distance', type=float, default=5.0)
+    args = parser.parse_args()
+
+    frames = next(read_video_chunks(args.video_path, args.frames))
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    ball_tracker = BallTracker(model_path=args.ball_model)
+    # Warm up so model fusing and the first allocation are not timed
+    ball_tracker.detect_frames(frames[:1])
+
+    baseline_fps, baseline_ball_detections = benchmark_tracker(ball_tracker, frames)
+    baseline_found = sum(1 in ball_dict for ball_dict in baseline_ball_detections)
+
+    print(f"{'roi':>6} {'fps':>7} {'speedup':>8} {'full scans':>11} {'found':>6} {'recall':>7}")
+    print(f"{'full':>6} {baseline_fps:>7.2f} {1.0:>7.2f}x {len(frames):>11} {baseline_found:>6} {1.0:>7.3f}")
+    for roi_size in args.roi_sizes:
+        tracker = RoiBallTracker(ball_tracker, roi_size=roi_size)
+        fps, ball_detections = benchmark_tracker(tracker, frames)
+        found = sum(1 in ball_dict for ball_dict in ball_detections)
+        recall = get_recall(ball_detections, baseline_ball_detections, args.max_distance)
+        print(f"{roi_size:>6} {fps:>7.2f} {fps / baseline_fps:>7.2f}x {tracker.full_scans:>11} {found:>6} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
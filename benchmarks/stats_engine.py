@@ -0,0 +1,137 @@
+"""
+Benchmark StatsEngine against the per-shot loop it replaced in main.main, on synthetic
+mini court positions, and check that both produce the same per-frame table.
+
+Usage:
+    python benchmarks/stats_engine.py --frames 100000 --shot-interval 45
+"""
+import argparse
+import os
+import sys
+import time
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import constants
+from utils import measure_distance, convert_pixel_distance_to_meters
+from stats import StatsEngine
+
+
+def loop_frame_stats(ball_shot_frames, player_mini_court_positions, ball_mini_court_positions,
+                     number_of_frames, fps, mini_court_width):
+    """The stats loop of main.main before StatsEngine"""
+    player_mini_court_detections = [dict(zip([1, 2], positions)) for positions in player_mini_court_positions]
+    player_stats_data = [{
+        'frame_num':0,
+        'player_1_number_of_shots':0,
+        'player_1_total_shot_speed':0,
+        'player_1_last_shot_speed':0,
+        'player_1_total_player_speed':0,
+        'player_1_last_player_speed':0,
+
+        'player_2_number_of_shots':0,
+        'player_2_total_shot_speed':0,
+        'player_2_last_shot_speed':0,
+        'player_2_total_player_speed':0,
+        'player_2_last_player_speed':0,
+    } ]
+
+    for ball_shot_ind in range(len(ball_shot_frames)-1):
+        start_frame = ball_shot_frames[ball_shot_ind]
+        end_frame = ball_shot_frames[ball_shot_ind+1]
+        ball_shot_time_in_seconds = (end_frame-start_frame)/fps
+
+        distance_covered_by_ball_pixels = measure_distance(ball_mini_court_positions[start_frame],
+                                                           ball_mini_court_positions[end_frame])
+        distance_covered_by_ball_meters = convert_pixel_distance_to_meters(distance_covered_by_ball_pixels,
+                                                                           constants.DOUBLE_LINE_WIDTH,
+                                                                           mini_court_width)
+        speed_of_ball_shot = distance_covered_by_ball_meters/ball_shot_time_in_seconds * 3.6
+
+        player_positions = player_mini_court_detections[start_frame]
+        player_shot_ball = min(player_positions.keys(), key=lambda player_id: measure_distance(player_positions[player_id],
+                                                                                                ball_mini_court_positions[start_frame]))
+
+        opponent_player_id = 1 if player_shot_ball == 2 else 2
+        distance_covered_by_opponent_pixels = measure_distance(player_mini_court_detections[start_frame][opponent_player_id],
+                                                               player_mini_court_detections[end_frame][opponent_player_id])
+        distance_covered_by_opponent_meters = convert_pixel_distance_to_meters(distance_covered_by_opponent_pixels,
+                                                                               constants.DOUBLE_LINE_WIDTH,
+                                                                               mini_court_width)
+        speed_of_opponent = distance_covered_by_opponent_meters/ball_shot_time_in_seconds * 3.6
+
+        current_player_stats= deepcopy(player_stats_data[-1])
+        current_player_stats['frame_num'] = start_frame
+        current_player_stats[f'player_{player_shot_ball}_number_of_shots'] += 1
+        current_player_stats[f'player_{player_shot_ball}_total_shot_speed'] += speed_of_ball_shot
+        current_player_stats[f'player_{player_shot_ball}_last_shot_speed'] = speed_of_ball_shot
+
+        current_player_stats[f'player_{opponent_player_id}_total_player_speed'] += speed_of_opponent
+        current_player_stats[f'player_{opponent_player_id}_last_player_speed'] = speed_of_opponent
+
+        player_stats_data.append(current_player_stats)
+
+    player_stats_data_df = pd.DataFrame(player_stats_data)
+    frames_df = pd.DataFrame({'frame_num': list(range(number_of_frames))})
+    player_stats_data_df = pd.merge(frames_df, player_stats_data_df, on='frame_num', how='left')
+    player_stats_data_df = player_stats_data_df.ffill()
+
+    player_stats_data_df['player_1_average_shot_speed'] = player_stats_data_df['player_1_total_shot_speed']/player_stats_data_df['player_1_number_of_shots']
+    player_stats_data_df['player_2_average_shot_speed'] = player_stats_data_df['player_2_total_shot_speed']/player_stats_data_df['player_2_number_of_shots']
+    player_stats_data_df['player_1_average_player_speed'] = player_stats_data_df['player_1_total_player_speed']/player_stats_data_df['player_2_number_of_shots']
+    player_stats_data_df['player_2_average_player_speed'] = player_stats_data_df['player_2_total_player_speed']/player_stats_data_df['player_1_number_of_shots']
+    return player_stats_data_df
+
+
+def make_inputs(number_of_frames, shot_interval, seed=0):
+    rng = np.random.default_rng(seed)
+    # Random walks over a 250x500 mini court: players near their baselines, the ball between them
+    player_positions = np.cumsum(rng.normal(0, 1.5, (number_of_frames, 2, 2)), axis=0) % [250, 250] + [[0, 0], [0, 250]]
+    ball_positions = rng.uniform([0, 0], [250, 500], (number_of_frames, 2))
+    shot_frames = np.arange(1, number_of_frames, shot_interval) + rng.integers(0, shot_interval // 2, len(range(1, number_of_frames, shot_interval)))
+    shot_frames = np.unique(np.minimum(shot_frames, number_of_frames - 1)).tolist()
+    return shot_frames, player_positions, ball_positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--shot-interval', type=int, default=45)
+    parser.add_argument('--fps', type=float, default=24)
+    parser.add_argument('--mini-court-width', type=float, default=250)
+    parser.add_argument('--incremental-chunk', type=int, default=16,
+                        help="shots per add_shots call for the incremental run")
+    args = parser.parse_args()
+
+    shot_frames, player_positions, ball_positions = make_inputs(args.frames, args.shot_interval)
+    print(f"{args.frames} frames, {len(shot_frames)} shots")
+
+    start = time.perf_counter()
+    loop_stats = loop_frame_stats(shot_frames, player_positions, ball_positions, args.frames, args.fps, args.mini_court_width)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats_engine = StatsEngine(args.fps, args.mini_court_width)
+    stats_engine.add_shots(shot_frames, player_positions, ball_positions)
+    engine_stats = stats_engine.get_frame_stats(args.frames)
+    engine_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    incremental_engine = StatsEngine(args.fps, args.mini_court_width)
+    for i in range(0, len(shot_frames), args.incremental_chunk):
+        incremental_engine.add_shots(shot_frames[i:i + args.incremental_chunk], player_positions, ball_positions)
+    incremental_stats = incremental_engine.get_frame_stats(args.frames)
+    incremental_seconds = time.perf_counter() - start
+
+    columns = list(loop_stats.columns)
+    same = np.allclose(loop_stats[columns].to_numpy(np.float64), engine_stats[columns].to_numpy(np.float64), equal_nan=True)
+    same_incremental = engine_stats.equals(incremental_stats)
+    print(f"loop:        {loop_seconds:8.3f}s")
+    print(f"StatsEngine: {engine_seconds:8.3f}s ({loop_seconds / engine_seconds:.0f}x), same table: {same}")
+    print(f"incremental: {incremental_seconds:8.3f}s ({args.incremental_chunk} shots per call), same table: {same_incremental}")
+
+
+if __name__ == "__main__":
+    main()
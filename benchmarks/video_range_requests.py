@@ -0,0 +1,93 @@
+"""
+Measure the bytes the video endpoint sends for a full download, a seek into a large
+output file (Range request), a cache revalidation (If-None-Match) and If-Range with a
+current and a stale ETag. Runs the Flask app on a local port against a sparse file.
+
+Usage:
+    python benchmarks/video_range_requests.py --size-mb 500 --seek-mb 400 --range-kb 1024
+    OUTPUT_FILE_OFFLOAD=x-accel-redirect python benchmarks/video_range_requests.py
+"""
+import argparse
+import http.client
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+
+def fetch(port, path, headers):
+    """(status, headers, body bytes read, seconds) of one GET"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    # No ETag comes back when the proxy is meant to answer conditional requests
+    connection.request('GET', path, headers={key: value for key, value in headers.items() if value is not None})
+    response = connection.getresponse()
+    body_bytes = 0
+    while True:
+        block = response.read(1024 * 1024)
+        if not block:
+            break
+        body_bytes += len(block)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return response.status, dict(response.getheaders()), body_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=500)
+    parser.add_argument('--seek-mb', type=int, default=400)
+    parser.add_argument('--range-kb', type=int, default=1024)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    # Throwaway database, and no job dispatching in this process
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+    from werkzeug.serving import make_server
+    import backend.app as backend_app
+    backend_app.job_queue.stop()
+    backend_app.app.config['OUTPUT_FOLDER'] = work_dir
+
+    filename = 'benchmark_analyzed.mp4'
+    with open(os.path.join(work_dir, filename), 'wb') as f:
+        f.truncate(args.size_mb * 1024 * 1024)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, backend_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    path = f'/api/video/{filename}'
+
+    seek_start = args.seek_mb * 1024 * 1024
+    seek_range = f'bytes={seek_start}-{seek_start + args.range_kb * 1024 - 1}'
+    _, headers, _, _ = fetch(port, path, {'Range': 'bytes=0-0'})
+    etag = headers.get('ETag')
+    print(f"{args.size_mb} MB file, ETag {etag}, Cache-Control: {headers.get('Cache-Control')}, "
+          f"offload: {backend_app.OUTPUT_FILE_OFFLOAD or 'none'}")
+
+    requests = [
+        ('full download', {}),
+        (f'seek to {args.seek_mb} MB', {'Range': seek_range}),
+        ('revalidate (If-None-Match)', {'If-None-Match': etag}),
+        ('If-Range, current ETag', {'Range': seek_range, 'If-Range': etag}),
+        ('If-Range, stale ETag', {'Range': seek_range, 'If-Range': '"stale"'}),
+    ]
+    print(f"{'request':<28} {'status':>6} {'bytes':>12} {'seconds':>8}  headers")
+    for name, request_headers in requests:
+        status, headers, body_bytes, elapsed = fetch(port, path, request_headers)
+        offload_headers = {key: value for key, value in headers.items()
+                           if key in ('Content-Range', 'X-Accel-Redirect', 'X-Sendfile')}
+        print(f"{name:<28} {status:>6} {body_bytes:>12} {elapsed:>8.3f}  {offload_headers}")
+
+    server.shutdown()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
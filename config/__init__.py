@@ -0,0 +1 @@
+from .analysis_config import AnalysisConfig
@@ -0,0 +1,56 @@
+from dataclasses import dataclass, replace
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+    """
+    Model paths, cache location and parameters of an analysis job.
+    Call resolved() before use: relative paths become absolute against base_dir, so a
+    job never depends on the working directory and several jobs can share a process.
+    """
+    # Missing official YOLO weights are downloaded to this path by ultralytics
+    player_model_path: str = 'models/yolov8x.pt'
+    ball_model_path: str = 'models/yolo5_last.pt'
+    court_model_path: str = 'models/keypoints_model.pth'
+    use_torchscript: bool = False
+
+    player_imgsz: int = 640
+    # Run the player detector at most every this many frames and carry boxes with
+    # optical flow in between (KeyframePlayerTracker); 1 detects on every frame
+    player_keyframe_max_interval: int = 1
+    ball_conf: float = 0.15
+    ball_imgsz: int = 640
+    # Search for the ball in a crop of this size around its predicted position
+    # (RoiBallTracker), scanning full frames only after misses; 0 scans every full frame
+    ball_roi_size: int = 0
+
+    # Frames per pipeline item; with the queues between stages, a few chunks are alive at once
+    chunk_size: int = 16
+    batch_size: int = 8
+    # Chunks waiting between two pipeline stages
+    pipeline_queue_size: int = 1
+    keypoint_refresh_interval: int = 120
+    # Frames of position history drawn as trails on the mini court, 0 disables them
+    mini_court_trail_length: int = 0
+    # Write boxes, mini court positions, shots and stats of every frame to a Parquet
+    # file next to the output video (utils.get_track_file_path)
+    save_track_file: bool = True
+
+    cache_dir: str = 'detection_cache'
+    cache_max_size_bytes: int = 2 * 1024**3
+
+    base_dir: str = PROJECT_DIR
+
+    def resolve_path(self, path):
+        return os.path.normpath(os.path.join(self.base_dir, path))
+
+    def resolved(self):
+        return replace(self,
+                       player_model_path=self.resolve_path(self.player_model_path),
+                       ball_model_path=self.resolve_path(self.ball_model_path),
+                       court_model_path=self.resolve_path(self.court_model_path),
+                       cache_dir=self.resolve_path(self.cache_dir),
+                       base_dir=os.path.abspath(self.base_dir))
@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+
+
+class CourtKeypointTracker:
+    """
+    Per-frame court keypoints without running the CNN on every frame.
+    A cheap thumbnail difference against the frame of the last CNN run detects camera
+    motion; the CNN re-runs (batched per chunk) when the view changed or every
+    refresh_interval frames, and sparse optical flow carries keypoints in between.
+    The keypoints returned stay constant until the flow-carried ones move more than
+    min_keypoint_shift pixels on average, so a static camera gives one keypoint set
+    (and one homography) per CNN run instead of a slightly different set every frame.
+    Its CNN runs skip the per-image cache: the keypoints of the whole video are cached
+    as one entry (save_cached_keypoints).
+    """
+    def __init__(self, court_line_detector, refresh_interval=120, change_threshold=12.0,
+                 flow_scale=0.5, min_tracked_ratio=0.5, min_keypoint_shift=2.0):
+        self.court_line_detector = court_line_detector
+        self.refresh_interval = refresh_interval
+        self.change_threshold = change_threshold
+        self.flow_scale = flow_scale
+        self.min_tracked_ratio = min_tracked_ratio
+        self.min_keypoint_shift = min_keypoint_shift
+
+        self.reference_thumbnail = None
+        self.frames_since_refresh = 0
+        self.previous_gray = None
+        # Flow-carried keypoints of the previous frame, and the keypoints last returned
+        self.keypoints = None
+        self.published_keypoints = None
+
+    def get_params(self):
+        return {
+            'refresh_interval': self.refresh_interval,
+            'change_threshold': self.change_threshold,
+            'flow_scale': self.flow_scale,
+            'min_tracked_ratio': self.min_tracked_ratio,
+            'min_keypoint_shift': self.min_keypoint_shift,
+        }
+
+    def get_cache_key(self, video_hash):
+        cache = self.court_line_detector.cache
+        return cache.make_key('court_keypoint_track', video_hash, self.court_line_detector.model_path, self.get_params())
+
+    def load_cached_keypoints(self, video_hash):
+        if self.court_line_detector.cache is None:
+            return None
+        cached = self.court_line_detector.cache.load_arrays(self.get_cache_key(video_hash))
+        return None if cached is None else cached['keypoints']
+
+    def save_cached_keypoints(self, video_hash, keypoints):
+        if self.court_line_detector.cache is not None:
+            self.court_line_detector.cache.save_arrays(self.get_cache_key(video_hash), keypoints=keypoints)
+
+    def _get_thumbnail(self, frame):
+        thumbnail = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(thumbnail, (3, 3), 0).astype(np.float32)
+
+    def _get_flow_gray(self, frame):
+        small_frame = cv2.resize(frame, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+
+    def _choose_refresh_frames(self, frames):
+        """Indices of the frames in this chunk that need a CNN run, and the thumbnails of all frames"""
+        refresh_frames = []
+        thumbnails = [self._get_thumbnail(frame) for frame in frames]
+        for i, thumbnail in enumerate(thumbnails):
+            if self.reference_thumbnail is None:
+                view_changed = True
+            else:
+                view_changed = float(np.mean(np.abs(thumbnail - self.reference_thumbnail))) > self.change_threshold
+
+            if view_changed or self.frames_since_refresh >= self.refresh_interval:
+                refresh_frames.append(i)
+                self.reference_thumbnail = thumbnail
+                self.frames_since_refresh = 0
+            else:
+                self.frames_since_refresh += 1
+        return refresh_frames, thumbnails
+
+    def _track_keypoints(self, previous_gray, gray, keypoints):
+        """Move keypoints with pyramidal Lucas-Kanade flow; returns None when too few points were tracked"""
+        points = (keypoints.reshape(-1, 1, 2) * self.flow_scale).astype(np.float32)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, points, None,
+                                                          winSize=(21, 21), maxLevel=3)
+        if next_points is None:
+            return None
+        tracked = status.reshape(-1) == 1
+        if tracked.mean() < self.min_tracked_ratio:
+            return None
+
+        # Lost points keep their previous position
+        next_points = next_points.reshape(-1, 2) / self.flow_scale
+        tracked_keypoints = keypoints.reshape(-1, 2).copy()
+        tracked_keypoints[tracked] = next_points[tracked]
+        return tracked_keypoints.reshape(-1)
+
+    def _get_keypoint_shift(self, keypoints):
+        """Mean distance in pixels between keypoints and the keypoints last returned"""
+        shift = keypoints.reshape(-1, 2) - self.published_keypoints.reshape(-1, 2)
+        return float(np.mean(np.linalg.norm(shift, axis=1)))
+
+    def update(self, frames):
+        """Keypoints for the next chunk of frames, as an (n_frames, 28) float32 array"""
+        refresh_frames, thumbnails = self._choose_refresh_frames(frames)
+        refreshed_keypoints = {}
+        if refresh_frames:
+            predicted = self.court_line_detector.predict_batch([frames[i] for i in refresh_frames], use_cache=False)
+            refreshed_keypoints = dict(zip(refresh_frames, predicted))
+
+        # Last frame of the chunk the CNN ran on, planned or after flow was lost
+        last_refresh_frame = refresh_frames[-1] if refresh_frames else None
+
+        keypoints = np.zeros((len(frames), 14*2), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            gray = self._get_flow_gray(frame)
+            refreshed = i in refreshed_keypoints
+            if refreshed:
+                frame_keypoints = refreshed_keypoints[i]
+            else:
+                frame_keypoints = self._track_keypoints(self.previous_gray, gray, self.keypoints)
+                if frame_keypoints is None:
+                    # Flow lost the court, so this frame cannot wait for the next batch
+                    frame_keypoints = self.court_line_detector.predict(frame, use_cache=False)
+                    refreshed = True
+                    if last_refresh_frame is None or i > last_refresh_frame:
+                        last_refresh_frame = i
+
+            self.keypoints = np.asarray(frame_keypoints, dtype=np.float32)
+            self.previous_gray = gray
+            if refreshed or self._get_keypoint_shift(self.keypoints) > self.min_keypoint_shift:
+                self.published_keypoints = self.keypoints
+            keypoints[i] = self.published_keypoints
+
+        # The plan already moved the motion reference through the chunk; a CNN run after
+        # the last planned one becomes the reference the next chunk is compared with
+        if last_refresh_frame is not None:
+            self.reference_thumbnail = thumbnails[last_refresh_frame]
+            self.frames_since_refresh = len(frames) - 1 - last_refresh_frame
+        return keypoints
@@ -3,12 +3,21 @@ import torchvision.transforms as transforms
 import cv2
 from torchvision import models
 import numpy as np
+import hashlib
+import os
+import pickle
+import tempfile
 
 class CourtLineDetector:
-    def __init__(self, model_path):
-        self.model = models.resnet50(pretrained=True)
-        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14*2) 
-        self.model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    def __init__(self, model_path, cache=None, use_torchscript=False, torchscript_dir=None):
+        self.model_path = model_path
+        self.cache = cache
+        # The checkpoint folder can be read-only (container images), so exports go to a cache folder
+        self.torchscript_dir = torchscript_dir or os.path.join(tempfile.gettempdir(), 'court_torchscript')
+        if use_torchscript:
+            self.model = self._load_torchscript_model(model_path)
+        else:
+            self.model = self._build_model(model_path)
         self.transform = transforms.Compose([
             transforms.ToPILImage(),
             transforms.Resize((224, 224)),
@@ -16,17 +25,113 @@ class CourtLineDetector:
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
 
-    def predict(self, image):
+    @classmethod
+    def from_config(cls, config, cache=None):
+        return cls(config.court_model_path, cache=cache, use_torchscript=config.use_torchscript,
+                   torchscript_dir=os.path.join(config.cache_dir, 'torchscript'))
 
-    
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image_tensor = self.transform(image_rgb).unsqueeze(0)
+    def _load_state_dict(self, model_path):
+        try:
+            # Memory-map the checkpoint instead of reading it all into memory up front
+            return torch.load(model_path, map_location='cpu', mmap=True, weights_only=True)
+        except (TypeError, RuntimeError, pickle.UnpicklingError):
+            # Older torch without mmap support, a legacy non-zip checkpoint, or one
+            # holding objects the weights_only unpickler refuses. Since torch 2.6
+            # weights_only defaults to True, so the full unpickler has to be asked for
+            try:
+                return torch.load(model_path, map_location='cpu', weights_only=False)
+            except TypeError:  # torch before 1.13 has no weights_only
+                return torch.load(model_path, map_location='cpu')
+
+    def _build_model(self, model_path):
+        # No pretrained weights: every parameter is overwritten by the checkpoint anyway,
+        # and the ImageNet download fails in offline containers
+        model = models.resnet50(weights=None)
+        model.fc = torch.nn.Linear(model.fc.in_features, 14*2)
+        state_dict = self._load_state_dict(model_path)
+        try:
+            # Keep the memory-mapped tensors instead of copying them into fresh ones
+            model.load_state_dict(state_dict, assign=True)
+        except TypeError:
+            model.load_state_dict(state_dict)
+        # Inference mode: BatchNorm must use its running statistics so batched predictions
+        # do not depend on the other images in the batch
+        model.eval()
+        return model
+
+    def get_torchscript_path(self, model_path):
+        """Export path in torchscript_dir, named after the checkpoint so two models never share it"""
+        model_path = os.path.abspath(model_path)
+        path_hash = hashlib.sha256(model_path.encode()).hexdigest()[:12]
+        model_name = os.path.splitext(os.path.basename(model_path))[0]
+        return os.path.join(self.torchscript_dir, f"{model_name}-{path_hash}.torchscript.pt")
+
+    def _load_torchscript_model(self, model_path):
+        """Load the TorchScript export of the checkpoint, exporting it first if it is missing or stale"""
+        torchscript_path = self.get_torchscript_path(model_path)
+        if os.path.exists(torchscript_path) and os.path.getmtime(torchscript_path) >= os.path.getmtime(model_path):
+            return torch.jit.load(torchscript_path, map_location='cpu')
+
+        model = self._build_model(model_path)
         with torch.no_grad():
-            outputs = self.model(image_tensor)
-        keypoints = outputs.squeeze().cpu().numpy()
-        original_h, original_w = image.shape[:2]
-        keypoints[::2] *= original_w / 224.0
-        keypoints[1::2] *= original_h / 224.0
+            traced_model = torch.jit.freeze(torch.jit.trace(model, torch.zeros(1, 3, 224, 224)))
+
+        # Save under a temporary name so concurrent workers never load a partial file.
+        # Without a writable folder the traced model is still used, only not reused next time
+        tmp_path = f"{torchscript_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.torchscript_dir, exist_ok=True)
+            torch.jit.save(traced_model, tmp_path)
+            os.replace(tmp_path, torchscript_path)
+        except (OSError, RuntimeError) as e:
+            print(f"Could not save the TorchScript export to {torchscript_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return traced_model
+
+    def predict(self, image, use_cache=True):
+        return self.predict_batch([image], use_cache)[0]
+
+    def _get_cache_key(self, image):
+        return self.cache.make_key('court_keypoints', self.cache.hash_image(image), self.model_path, {'input_size': 224})
+
+    def predict_batch(self, images, use_cache=True):
+        """
+        Predict the keypoints of several images with one forward pass, returns an (n, 28) array.
+        use_cache=False skips the per-image cache entries, for callers that cache their own results.
+        """
+        keypoints = np.zeros((len(images), 14*2), dtype=np.float32)
+        images_to_predict = list(range(len(images)))
+        use_cache = use_cache and self.cache is not None
+
+        if use_cache:
+            cache_keys = [self._get_cache_key(image) for image in images]
+            images_to_predict = []
+            for i, cache_key in enumerate(cache_keys):
+                cached = self.cache.load_arrays(cache_key)
+                if cached is not None:
+                    keypoints[i] = cached['keypoints']
+                else:
+                    images_to_predict.append(i)
+
+        if not images_to_predict:
+            return keypoints
+
+        image_tensors = [self.transform(cv2.cvtColor(images[i], cv2.COLOR_BGR2RGB)) for i in images_to_predict]
+        with torch.no_grad():
+            outputs = self.model(torch.stack(image_tensors))
+        outputs = outputs.cpu().numpy()
+
+        for i, image_keypoints in zip(images_to_predict, outputs):
+            original_h, original_w = images[i].shape[:2]
+            image_keypoints[::2] *= original_w / 224.0
+            image_keypoints[1::2] *= original_h / 224.0
+            keypoints[i] = image_keypoints
+
+        if use_cache:
+            self.cache.save_many_arrays({cache_keys[i]: {'keypoints': keypoints[i]} for i in images_to_predict})
 
         return keypoints
 
@@ -40,8 +145,11 @@ class CourtLineDetector:
         return image
     
     def draw_keypoints_on_video(self, video_frames, keypoints):
+        # keypoints is one set for every frame, or an (n_frames, 28) array with one set per frame
+        keypoints = np.asarray(keypoints)
         output_video_frames = []
-        for frame in video_frames:
-            frame = self.draw_keypoints(frame, keypoints)
+        for frame_num, frame in enumerate(video_frames):
+            frame_keypoints = keypoints[frame_num] if keypoints.ndim == 2 else keypoints
+            frame = self.draw_keypoints(frame, frame_keypoints)
             output_video_frames.append(frame)
         return output_video_frames
\ No newline at end of file
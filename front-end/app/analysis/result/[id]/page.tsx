@@ -10,8 +10,9 @@ import { AlertCircle, CheckCircle2, Download, Home, Loader2, ExternalLink } from
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000'
 
 interface AnalysisStatus {
-  status: 'processing' | 'completed' | 'failed'
+  status: 'queued' | 'processing' | 'completed' | 'failed'
   progress: number
+  stage?: string | null
   outputFile?: string
   error?: string
   fileSize?: number
@@ -35,6 +36,12 @@ export default function ResultPage() {
       return
     }
 
+    let eventSource: EventSource | null = null
+    let pollTimeout: ReturnType<typeof setTimeout> | null = null
+    let cancelled = false
+
+    const isFinished = (data: AnalysisStatus) => data.status === 'completed' || data.status === 'failed'
+
     const checkStatus = async () => {
       try {
         console.log('Checking status for:', analysisId)
@@ -52,26 +59,68 @@ export default function ResultPage() {
 
         const data = await response.json()
         console.log('Status data:', data)
+        if (cancelled) return
         
         setStatus(data)
         setError(null)
         setIsLoading(false)
 
-        if (data.status === 'processing') {
-          setTimeout(checkStatus, 2000)
+        if (!isFinished(data)) {
+          pollTimeout = setTimeout(checkStatus, 2000)
         }
       } catch (err) {
         console.error('Error fetching status:', err)
+        if (cancelled) return
         setError(err instanceof Error ? err.message : 'Failed to fetch analysis status')
         setIsLoading(false)
-        
-        if (status?.status === 'processing') {
-          setTimeout(checkStatus, 3000)
+        pollTimeout = setTimeout(checkStatus, 3000)
+      }
+    }
+
+    // Progress is pushed with Server-Sent Events; polling is only the fallback
+    const subscribe = () => {
+      if (typeof EventSource === 'undefined') {
+        checkStatus()
+        return
+      }
+
+      let receivedEvent = false
+      eventSource = new EventSource(`${API_URL}/api/analysis/${analysisId}/events`)
+
+      eventSource.onmessage = (event) => {
+        receivedEvent = true
+        const data = JSON.parse(event.data)
+        setStatus((previous) => ({ ...previous, ...data }))
+        setError(null)
+        setIsLoading(false)
+
+        if (isFinished(data)) {
+          eventSource?.close()
         }
       }
+
+      eventSource.addEventListener('error', (event) => {
+        // Named 'error' events carry a message from the server; plain errors are
+        // connection drops, which EventSource retries by itself once it had a connection
+        const message = (event as MessageEvent).data
+        if (message) {
+          eventSource?.close()
+          setError(JSON.parse(message).error)
+          setIsLoading(false)
+        } else if (!receivedEvent) {
+          eventSource?.close()
+          checkStatus()
+        }
+      })
     }
 
-    checkStatus()
+    subscribe()
+
+    return () => {
+      cancelled = true
+      eventSource?.close()
+      if (pollTimeout) clearTimeout(pollTimeout)
+    }
   }, [analysisId])
 
   const getVideoUrl = () => {
@@ -172,7 +221,7 @@ export default function ResultPage() {
       )
     }
 
-    if (status.status === 'processing') {
+    if (status.status === 'queued' || status.status === 'processing') {
       return (
         <Card>
           <CardHeader>
@@ -193,11 +242,11 @@ export default function ResultPage() {
               <Progress value={status.progress} />
             </div>
             <p className="text-sm text-muted-foreground">
-              {status.progress < 25 && "Detecting players..."}
-              {status.progress >= 25 && status.progress < 50 && "Detecting ball..."}
-              {status.progress >= 50 && status.progress < 70 && "Analyzing court..."}
-              {status.progress >= 70 && status.progress < 85 && "Calculating statistics..."}
-              {status.progress >= 85 && "Generating output video..."}
+              {status.status === 'queued' && "Waiting in queue..."}
+              {status.status === 'processing' && !status.stage && "Starting analysis..."}
+              {status.stage === 'detection' && "Detecting players, ball and court..."}
+              {status.stage === 'statistics' && "Calculating statistics..."}
+              {status.stage === 'rendering' && "Generating output video..."}
             </p>
           </CardContent>
         </Card>
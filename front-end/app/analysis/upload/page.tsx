@@ -7,6 +7,84 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/com
 import { Upload, Loader2, FileVideo, AlertCircle } from 'lucide-react'
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000'
+// Largest upload the backend accepts by default (MAX_UPLOAD_SIZE_MB)
+const MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024
+// Attempts per chunk before the upload gives up; each one resumes from the server's offset
+const MAX_CHUNK_ATTEMPTS = 5
+
+// PUT one chunk with upload progress; resolves with the server's JSON response and status
+function putChunk(url: string, chunk: Blob, onProgress: (loaded: number) => void) {
+  return new Promise<{ status: number; body: any }>((resolve, reject) => {
+    const xhr = new XMLHttpRequest()
+    xhr.upload.addEventListener('progress', (e) => onProgress(e.loaded))
+    xhr.addEventListener('load', () => {
+      try {
+        resolve({ status: xhr.status, body: JSON.parse(xhr.responseText) })
+      } catch {
+        resolve({ status: xhr.status, body: {} })
+      }
+    })
+    xhr.addEventListener('error', () => reject(new Error('Network error occurred during upload')))
+    xhr.addEventListener('abort', () => reject(new Error('Upload was cancelled')))
+    xhr.open('PUT', url)
+    xhr.setRequestHeader('Content-Type', 'application/octet-stream')
+    xhr.send(chunk)
+  })
+}
+
+// Chunked upload: init, PUT the chunks at the server's offset, then finalize.
+// After a dropped connection the offset is fetched again and the upload resumes there.
+async function uploadInChunks(file: File, onProgress: (progress: number) => void) {
+  const initResponse = await fetch(`${API_URL}/api/uploads`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size }),
+  })
+  const session = await initResponse.json().catch(() => ({}))
+  if (!initResponse.ok) {
+    throw new Error(session.error || `Upload failed with status ${initResponse.status}`)
+  }
+
+  const uploadUrl = `${API_URL}/api/uploads/${session.uploadId}`
+  let offset: number = session.offset
+  let attempts = 0
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + session.chunkSize)
+    let response: { status: number; body: any } | null = null
+    try {
+      response = await putChunk(`${uploadUrl}?offset=${offset}`, chunk, (loaded) => {
+        onProgress(Math.round(((offset + loaded) / file.size) * 100))
+      })
+    } catch (err) {
+      if (attempts + 1 >= MAX_CHUNK_ATTEMPTS) throw err
+    }
+    if (response && response.status >= 200 && response.status < 300) {
+      offset = response.body.offset
+      attempts = 0
+      continue
+    }
+    // Only dropped connections, interrupted chunks and conflicts (409) can be resumed
+    if (response && response.status !== 409 && typeof response.body.offset !== 'number') {
+      throw new Error(response.body.error || `Upload failed with status ${response.status}`)
+    }
+    if (++attempts >= MAX_CHUNK_ATTEMPTS) {
+      throw new Error(response?.body.error || 'Upload failed after several attempts')
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000 * attempts))
+    // Continue from however many bytes the server actually received
+    const statusResponse = await fetch(uploadUrl).catch(() => null)
+    if (statusResponse?.ok) {
+      offset = (await statusResponse.json()).offset
+    }
+  }
+
+  const finalizeResponse = await fetch(`${uploadUrl}/finalize`, { method: 'POST' })
+  const result = await finalizeResponse.json().catch(() => ({}))
+  if (!finalizeResponse.ok) {
+    throw new Error(result.error || `Upload failed with status ${finalizeResponse.status}`)
+  }
+  return result
+}
 
 export default function UploadPage() {
   const router = useRouter()
@@ -25,9 +103,9 @@ export default function UploadPage() {
         return
       }
       
-      // Validate file size (max 500MB)
-      if (file.size > 500 * 1024 * 1024) {
-        setError('File size must be less than 500MB')
+      // Validate file size (max 4GB)
+      if (file.size > MAX_UPLOAD_SIZE) {
+        setError('File size must be less than 4GB')
         return
       }
 
@@ -48,9 +126,6 @@ export default function UploadPage() {
 
     try {
       console.log('Starting upload for file:', selectedFile.name)
-      
-      const formData = new FormData()
-      formData.append('video', selectedFile)
 
       // Test backend connection first
       try {
@@ -68,49 +143,11 @@ export default function UploadPage() {
         throw new Error('Cannot connect to backend server. Make sure it is running on http://localhost:5000')
       }
 
-      // Upload with progress
-      const xhr = new XMLHttpRequest()
-
-      xhr.upload.addEventListener('progress', (e) => {
-        if (e.lengthComputable) {
-          const progress = Math.round((e.loaded / e.total) * 100)
-          setUploadProgress(progress)
-          console.log('Upload progress:', progress + '%')
-        }
-      })
-
-      const uploadPromise = new Promise<any>((resolve, reject) => {
-        xhr.addEventListener('load', () => {
-          if (xhr.status >= 200 && xhr.status < 300) {
-            try {
-              const response = JSON.parse(xhr.responseText)
-              resolve(response)
-            } catch (err) {
-              reject(new Error('Invalid JSON response from server'))
-            }
-          } else {
-            try {
-              const errorResponse = JSON.parse(xhr.responseText)
-              reject(new Error(errorResponse.error || `Upload failed with status ${xhr.status}`))
-            } catch {
-              reject(new Error(`Upload failed with status ${xhr.status}`))
-            }
-          }
-        })
-
-        xhr.addEventListener('error', () => {
-          reject(new Error('Network error occurred during upload'))
-        })
-
-        xhr.addEventListener('abort', () => {
-          reject(new Error('Upload was cancelled'))
-        })
-
-        xhr.open('POST', `${API_URL}/api/upload`)
-        xhr.send(formData)
+      // Upload in resumable chunks with progress
+      const result = await uploadInChunks(selectedFile, (progress) => {
+        setUploadProgress(progress)
+        console.log('Upload progress:', progress + '%')
       })
-
-      const result = await uploadPromise
       console.log('Upload successful:', result)
 
       if (result.analysisId) {
@@ -147,7 +184,7 @@ export default function UploadPage() {
         <CardHeader>
           <CardTitle>Video Upload</CardTitle>
           <CardDescription>
-            Select a video file (MP4, MOV, AVI) - Max 500MB
+            Select a video file (MP4, MOV, AVI) - Max 4GB
           </CardDescription>
         </CardHeader>
         <CardContent className="space-y-6">
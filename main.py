@@ -1,144 +1,222 @@
-from utils import (read_video, 
-                   save_video,
-                   measure_distance,
-                   draw_player_stats,
-                   convert_pixel_distance_to_meters
+from utils import (read_video_chunks,
+                   read_first_frame,
+                   get_video_frame_count,
+                   get_video_fps,
+                   DetectionCache,
+                   open_video_writer,
+                   abort_video_writer,
+                   FrameCompositor,
+                   StagePipeline,
+                   get_track_file_path,
+                   build_track_columns,
+                   save_track_file
                    )
-import constants
-from trackers import PlayerTracker,BallTracker
-from court_line_detector import CourtLineDetector
+from config import AnalysisConfig
+from trackers import PlayerTracker,BallTracker,Tracks,KeyframePlayerTracker,RoiBallTracker
+from court_line_detector import CourtLineDetector, CourtKeypointTracker
 from mini_court import MiniCourt
+from stats import StatsEngine, PLAYER_IDS
 import cv2
-import pandas as pd
-from copy import deepcopy
-
-
-def main(input_video_path="input_videos/input_video.mp4", output_video_path="output_videos/output_video.avi"):
-    # Read Video
-    video_frames = read_video(input_video_path)
-
-    # Detect Players and Ball
-    player_tracker = PlayerTracker(model_path='yolov8x')
-    ball_tracker = BallTracker(model_path='models/yolo5_last.pt')
-
-    player_detections = player_tracker.detect_frames(video_frames,
-                                                     read_from_stub=False,
-                                                     stub_path="tracker_stubs/player_detections.pkl"
-                                                     )
-    ball_detections = ball_tracker.detect_frames(video_frames,
-                                                     read_from_stub=False,
-                                                     stub_path="tracker_stubs/ball_detections.pkl"
-                                                     )
-    ball_detections = ball_tracker.interpolate_ball_positions(ball_detections)
-    # Smooth ball positions to remove extreme outliers while keeping natural movement
-    ball_detections = ball_tracker.smooth_ball_positions(ball_detections, max_jump_px=200, alpha=0.4)
-    
-    
-    # Court Line Detector model
-    court_model_path = "models/keypoints_model.pth"
-    court_line_detector = CourtLineDetector(court_model_path)
-    court_keypoints = court_line_detector.predict(video_frames[0])
+import os
+import numpy as np
+
+
+def main(input_video_path="input_videos/input_video.mp4", output_video_path="output_videos/output_video.mp4", config=None,
+         player_tracker=None, ball_tracker=None, court_line_detector=None, progress_callback=None, video_hash=None):
+    # All model, cache and input/output paths are resolved to absolute paths up front,
+    # so the analysis never depends on the process working directory.
+    config = (config or AnalysisConfig()).resolved()
+    input_video_path = os.path.abspath(input_video_path)
+    output_video_path = os.path.abspath(output_video_path)
+
+    # Frames are streamed in chunks of chunk_size: the first pass only keeps the small
+    # detection lists, the second pass decodes the video again to draw and encode it.
+    # Peak frame memory depends on chunk_size and the pipeline stages, not on the video length.
+    chunk_size = config.chunk_size
+    batch_size = config.batch_size
+
+    # progress_callback(stage, current, total) is called once per chunk in the
+    # 'detection' and 'rendering' stages, and around the 'statistics' stage
+    def report_progress(stage, current, total):
+        if progress_callback is not None:
+            progress_callback(stage, current, total)
+    expected_number_of_frames = get_video_frame_count(input_video_path) or None
+    # Shot and player speeds and the output video use the real frame rate of the input
+    fps = get_video_fps(input_video_path)
+
+    # Detections are cached by video content, model weights and inference parameters,
+    # so re-analysing the same upload skips inference. video_hash is the SHA-256 of the
+    # input when the caller already has it (chunked uploads hash while receiving)
+    detection_cache = DetectionCache(config.cache_dir, config.cache_max_size_bytes)
+    if video_hash is None:
+        video_hash = detection_cache.hash_file(input_video_path)
+
+    # Detect Players and Ball. Long-lived workers pass in models they loaded once;
+    # the tracker state is reset so nothing carries over from the previous job.
+    if player_tracker is None:
+        player_tracker = PlayerTracker.from_config(config)
+    if ball_tracker is None:
+        ball_tracker = BallTracker.from_config(config)
+    player_tracker.reset()
+
+    # Court Line Detector model, re-run on camera motion or every keypoint_refresh_interval frames
+    if court_line_detector is None:
+        court_line_detector = CourtLineDetector.from_config(config)
+
+    for model in (player_tracker, ball_tracker, court_line_detector):
+        if model.cache is None:
+            model.cache = detection_cache
+    if config.player_keyframe_max_interval > 1:
+        player_tracker = KeyframePlayerTracker(player_tracker, max_interval=config.player_keyframe_max_interval)
+    if config.ball_roi_size > 0:
+        ball_tracker = RoiBallTracker(ball_tracker, roi_size=config.ball_roi_size)
+    court_keypoint_tracker = CourtKeypointTracker(court_line_detector, refresh_interval=config.keypoint_refresh_interval)
+
+    player_detections = player_tracker.load_cached_detections(video_hash)
+    ball_detections = ball_tracker.load_cached_detections(video_hash)
+    court_keypoints = court_keypoint_tracker.load_cached_keypoints(video_hash)
+    first_frame = read_first_frame(input_video_path)
+
+    if player_detections is None or ball_detections is None or court_keypoints is None:
+        detect_players = player_detections is None
+        detect_balls = ball_detections is None
+        detect_keypoints = court_keypoints is None
+        if detect_players:
+            player_detections = []
+        if detect_balls:
+            ball_detections = []
+        if detect_keypoints:
+            court_keypoint_chunks = []
+
+        # Decoding and each model run in their own pipeline stage, so the models work on
+        # consecutive chunks at the same time instead of waiting for each other
+        def detect_player_chunk(frame_chunk):
+            player_detections.extend(player_tracker.detect_frames(frame_chunk, batch_size=batch_size))
+            return frame_chunk
+
+        def detect_ball_chunk(frame_chunk):
+            ball_detections.extend(ball_tracker.detect_frames(frame_chunk, batch_size=batch_size))
+            return frame_chunk
+
+        def detect_keypoint_chunk(frame_chunk):
+            court_keypoint_chunks.append(court_keypoint_tracker.update(frame_chunk))
+            return frame_chunk
+
+        frames_detected = 0
+        def count_detected_chunk(frame_chunk):
+            nonlocal frames_detected
+            frames_detected += len(frame_chunk)
+            report_progress('detection', frames_detected, expected_number_of_frames)
+            return frame_chunk
+
+        detection_stages = []
+        if detect_players:
+            detection_stages.append(('players', detect_player_chunk))
+        if detect_balls:
+            detection_stages.append(('ball', detect_ball_chunk))
+        if detect_keypoints:
+            detection_stages.append(('court_keypoints', detect_keypoint_chunk))
+        detection_stages.append(('progress', count_detected_chunk))
+
+        detection_pipeline = StagePipeline(('decode', read_video_chunks(input_video_path, chunk_size)),
+                                           detection_stages, queue_size=config.pipeline_queue_size)
+        detection_pipeline.run()
+        print(f"Detection pipeline: {detection_pipeline.format_report()}")
+
+        if detect_players:
+            player_tracker.save_cached_detections(video_hash, player_detections)
+        if detect_balls:
+            ball_tracker.save_cached_detections(video_hash, ball_detections)
+        if detect_keypoints:
+            # One (n_frames, 28) keypoint array, a row per frame
+            court_keypoints = np.concatenate(court_keypoint_chunks)
+            court_keypoint_tracker.save_cached_keypoints(video_hash, court_keypoints)
+    number_of_frames = len(player_detections)
+    report_progress('statistics', 0, 1)
+
+    # Post-processing runs on columnar (n_frames, n_ids, 4) track arrays
+    ball_tracks = Tracks.from_detections(ball_detections, track_ids=[1])
+    # Gate outlier jumps, fill short gaps and smooth in one Kalman filter pass
+    ball_tracks = ball_tracker.filter_ball_positions(ball_tracks)
+    # Long gaps (ball out of view) are held/interpolated so every frame has a ball position
+    ball_tracks = ball_tracker.interpolate_ball_positions(ball_tracks)
 
     # choose players
     player_detections = player_tracker.choose_and_filter_players(court_keypoints, player_detections)
+    player_tracks = Tracks.from_detections(player_detections, track_ids=[1, 2])
 
     # MiniCourt
-    mini_court = MiniCourt(video_frames[0]) 
+    mini_court = MiniCourt(first_frame)
 
     # Detect ball shots
-    ball_shot_frames= ball_tracker.get_ball_shot_frames(ball_detections)
-
-    # Convert positions to mini court positions
-    player_mini_court_detections, ball_mini_court_detections = mini_court.convert_bounding_boxes_to_mini_court_coordinates(player_detections, 
-                                                                                                          ball_detections,
-                                                                                                          court_keypoints)
-
-    player_stats_data = [{
-        'frame_num':0,
-        'player_1_number_of_shots':0,
-        'player_1_total_shot_speed':0,
-        'player_1_last_shot_speed':0,
-        'player_1_total_player_speed':0,
-        'player_1_last_player_speed':0,
-
-        'player_2_number_of_shots':0,
-        'player_2_total_shot_speed':0,
-        'player_2_last_shot_speed':0,
-        'player_2_total_player_speed':0,
-        'player_2_last_player_speed':0,
-    } ]
-    
-    for ball_shot_ind in range(len(ball_shot_frames)-1):
-        start_frame = ball_shot_frames[ball_shot_ind]
-        end_frame = ball_shot_frames[ball_shot_ind+1]
-        ball_shot_time_in_seconds = (end_frame-start_frame)/24 # 24fps
-
-        # Get distance covered by the ball
-        distance_covered_by_ball_pixels = measure_distance(ball_mini_court_detections[start_frame][1],
-                                                           ball_mini_court_detections[end_frame][1])
-        distance_covered_by_ball_meters = convert_pixel_distance_to_meters( distance_covered_by_ball_pixels,
-                                                                           constants.DOUBLE_LINE_WIDTH,
-                                                                           mini_court.get_width_of_mini_court()
-                                                                           ) 
-
-        # Speed of the ball shot in km/h
-        speed_of_ball_shot = distance_covered_by_ball_meters/ball_shot_time_in_seconds * 3.6
-
-        # player who the ball
-        player_positions = player_mini_court_detections[start_frame]
-        player_shot_ball = min( player_positions.keys(), key=lambda player_id: measure_distance(player_positions[player_id],
-                                                                                                 ball_mini_court_detections[start_frame][1]))
-
-        # opponent player speed
-        opponent_player_id = 1 if player_shot_ball == 2 else 2
-        distance_covered_by_opponent_pixels = measure_distance(player_mini_court_detections[start_frame][opponent_player_id],
-                                                                player_mini_court_detections[end_frame][opponent_player_id])
-        distance_covered_by_opponent_meters = convert_pixel_distance_to_meters( distance_covered_by_opponent_pixels,
-                                                                           constants.DOUBLE_LINE_WIDTH,
-                                                                           mini_court.get_width_of_mini_court()
-                                                                           ) 
-
-        speed_of_opponent = distance_covered_by_opponent_meters/ball_shot_time_in_seconds * 3.6
-
-        current_player_stats= deepcopy(player_stats_data[-1])
-        current_player_stats['frame_num'] = start_frame
-        current_player_stats[f'player_{player_shot_ball}_number_of_shots'] += 1
-        current_player_stats[f'player_{player_shot_ball}_total_shot_speed'] += speed_of_ball_shot
-        current_player_stats[f'player_{player_shot_ball}_last_shot_speed'] = speed_of_ball_shot
-
-        current_player_stats[f'player_{opponent_player_id}_total_player_speed'] += speed_of_opponent
-        current_player_stats[f'player_{opponent_player_id}_last_player_speed'] = speed_of_opponent
-
-        player_stats_data.append(current_player_stats)
-
-    player_stats_data_df = pd.DataFrame(player_stats_data)
-    frames_df = pd.DataFrame({'frame_num': list(range(len(video_frames)))})
-    player_stats_data_df = pd.merge(frames_df, player_stats_data_df, on='frame_num', how='left')
-    player_stats_data_df = player_stats_data_df.ffill()
-
-    player_stats_data_df['player_1_average_shot_speed'] = player_stats_data_df['player_1_total_shot_speed']/player_stats_data_df['player_1_number_of_shots']
-    player_stats_data_df['player_2_average_shot_speed'] = player_stats_data_df['player_2_total_shot_speed']/player_stats_data_df['player_2_number_of_shots']
-    player_stats_data_df['player_1_average_player_speed'] = player_stats_data_df['player_1_total_player_speed']/player_stats_data_df['player_2_number_of_shots']
-    player_stats_data_df['player_2_average_player_speed'] = player_stats_data_df['player_2_total_player_speed']/player_stats_data_df['player_1_number_of_shots']
-
-
-
-    # Draw output
-    ## Draw Player Bounding Boxes
-    output_video_frames= player_tracker.draw_bboxes(video_frames, player_detections)
-    output_video_frames= ball_tracker.draw_bboxes(output_video_frames, ball_detections)
-
-    ## Draw court Keypoints
-    output_video_frames  = court_line_detector.draw_keypoints_on_video(output_video_frames, court_keypoints)
-
-    # Draw Player Stats
-    output_video_frames = draw_player_stats(output_video_frames,player_stats_data_df)
-
-    ## Draw frame number on top left corner
-    for i, frame in enumerate(output_video_frames):
-        cv2.putText(frame, f"Frame: {i}",(10,30),cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-    save_video(output_video_frames, output_video_path)
+    ball_shot_frames= ball_tracker.get_ball_shot_frames(ball_tracks)
+
+    # Project positions of the whole video to mini court positions with the court homography
+    player_mini_court_positions, ball_mini_court_positions = mini_court.project_tracks_to_mini_court(player_tracks,
+                                                                                                   ball_tracks,
+                                                                                                   court_keypoints)
+
+    # Shot speeds, player speeds and their running averages for every frame
+    stats_engine = StatsEngine(fps, mini_court.get_width_of_mini_court())
+    stats_engine.add_shots(ball_shot_frames, player_mini_court_positions, ball_mini_court_positions)
+    player_stats_data_df = stats_engine.get_frame_stats(number_of_frames)
+
+    if config.save_track_file:
+        # Everything computed per frame, so new charts do not need a re-run
+        track_columns = build_track_columns(player_tracks, ball_tracks, player_mini_court_positions,
+                                            ball_mini_court_positions, ball_shot_frames, player_stats_data_df)
+        save_track_file(get_track_file_path(output_video_path), track_columns, metadata={
+            'fps': fps,
+            'number_of_frames': number_of_frames,
+            'shot_frames': [int(frame_num) for frame_num in ball_shot_frames],
+            'player_stats': {str(player_id): stats_engine.get_player_summary(player_id) for player_id in PLAYER_IDS},
+        })
+
+    report_progress('statistics', 1, 1)
+
+    frame_compositor = FrameCompositor(player_tracks, ball_tracks, court_keypoints, player_stats_data_df,
+                                       mini_court=mini_court,
+                                       player_mini_court_positions=player_mini_court_positions,
+                                       ball_mini_court_positions=ball_mini_court_positions,
+                                       mini_court_trail_length=config.mini_court_trail_length)
+
+    # Draw output, decoding the video a second time chunk by chunk. Decoding, drawing
+    # and encoding run concurrently; .mp4 outputs go straight to one ffmpeg H.264 process.
+    video_writer = None
+    frames_rendered = 0
+
+    def draw_chunk(frame_chunk):
+        # Player and ball boxes, court keypoints, mini court, stats panel and frame number in one pass per frame
+        nonlocal frames_rendered
+        output_video_frames = frame_compositor.draw_frames(frame_chunk, frames_rendered)
+        frames_rendered += len(frame_chunk)
+        return output_video_frames
+
+    frames_encoded = 0
+    def encode_chunk(output_video_frames):
+        nonlocal video_writer, frames_encoded
+        if video_writer is None:
+            video_writer = open_video_writer(output_video_path, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]), fps)
+        for frame in output_video_frames:
+            video_writer.write(frame)
+        frames_encoded += len(output_video_frames)
+        report_progress('rendering', frames_encoded, number_of_frames)
+        return output_video_frames
+
+    rendering_pipeline = StagePipeline(('decode', read_video_chunks(input_video_path, chunk_size)),
+                                       [('draw', draw_chunk), ('encode', encode_chunk)],
+                                       queue_size=config.pipeline_queue_size)
+    try:
+        rendering_pipeline.run()
+        if video_writer is not None:
+            # Finishes the file; raises if ffmpeg failed
+            video_writer.release()
+    except BaseException:
+        # No partial output left behind, and the error that stopped rendering is the one raised
+        if video_writer is not None:
+            abort_video_writer(video_writer, output_video_path)
+        raise
+    print(f"Rendering pipeline: {rendering_pipeline.format_report()}")
     return output_video_path
 
 if __name__ == "__main__":
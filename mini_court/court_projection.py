@@ -0,0 +1,73 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+class CourtProjector:
+    """
+    Projects image points onto the mini court through a homography fitted from the
+    14 CourtLineDetector keypoints to the matching MiniCourt drawing keypoints.
+    Homographies are cached per keypoint set, so a static camera fits exactly once.
+    """
+    def __init__(self, drawing_key_points, max_cached_homographies=64):
+        self.drawing_key_points = np.asarray(drawing_key_points, dtype=np.float32).reshape(-1, 2)
+        self.max_cached_homographies = max_cached_homographies
+        self.homographies = OrderedDict()
+
+    def get_homography(self, court_key_points):
+        court_key_points = np.asarray(court_key_points, dtype=np.float32).reshape(-1, 2)
+        cache_key = court_key_points.tobytes()
+        if cache_key in self.homographies:
+            self.homographies.move_to_end(cache_key)
+            return self.homographies[cache_key]
+
+        # RANSAC drops badly predicted keypoints; fall back to least squares if it finds no model
+        homography, _ = cv2.findHomography(court_key_points, self.drawing_key_points, cv2.RANSAC, 5.0)
+        if homography is None:
+            homography, _ = cv2.findHomography(court_key_points, self.drawing_key_points, 0)
+
+        self.homographies[cache_key] = homography
+        if len(self.homographies) > self.max_cached_homographies:
+            self.homographies.popitem(last=False)
+        return homography
+
+    def refresh(self, court_key_points=None):
+        """Drop cached homographies, or only the one for court_key_points, after keypoints are re-detected"""
+        if court_key_points is None:
+            self.homographies.clear()
+        else:
+            self.homographies.pop(np.asarray(court_key_points, dtype=np.float32).tobytes(), None)
+
+    def project_points(self, points, court_key_points):
+        """
+        Project points of shape (n_frames, ..., 2) to mini court coordinates.
+        court_key_points is either one set of 28 values for the whole video, or an
+        (n_frames, 28) array with the keypoints of every frame. NaN points stay NaN.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        court_key_points = np.asarray(court_key_points, dtype=np.float32)
+
+        if court_key_points.ndim == 1:
+            homographies = self.get_homography(court_key_points)[None]
+            frame_points = points.reshape(1, -1, 2)
+        else:
+            # One fit per distinct keypoint set, then every frame picks up the matrix of its set
+            unique_key_points, frame_groups = np.unique(court_key_points, axis=0, return_inverse=True)
+            group_homographies = np.stack([self.get_homography(key_points) for key_points in unique_key_points])
+            homographies = group_homographies[frame_groups.reshape(-1)]
+            frame_points = points.reshape(len(court_key_points), -1, 2)
+
+        return transform_points(frame_points, homographies).reshape(points.shape)
+
+
+def transform_points(points, homographies):
+    """
+    cv2.perspectiveTransform of (n_frames, n_points, 2) points with one 3x3 homography
+    per frame, (n_frames, 3, 3), in one einsum. NaN points and points mapped to
+    infinity come out as NaN.
+    """
+    homogeneous = np.einsum('fij,fpj->fpi', homographies[:, :, :2], points) + homographies[:, None, :, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        projected = homogeneous[..., :2] / homogeneous[..., 2:]
+    projected[~np.isfinite(projected).all(axis=-1)] = np.nan
+    return projected
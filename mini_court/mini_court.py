@@ -1,8 +1,12 @@
 import cv2
+import math
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import sys
 sys.path.append('../')
 import constants
+from trackers.tracks import Tracks
+from .court_projection import CourtProjector
 from utils import (
     convert_meters_to_pixel_distance,
     convert_pixel_distance_to_meters,
@@ -11,7 +15,11 @@ from utils import (
     get_height_of_bbox,
     measure_xy_distance,
     get_center_of_bbox,
-    measure_distance
+    measure_distance,
+    get_centers_of_bboxes,
+    get_foot_positions,
+    get_heights_of_bboxes,
+    measure_distances
 )
 
 class MiniCourt():
@@ -25,6 +33,9 @@ class MiniCourt():
         self.set_mini_court_position()
         self.set_court_drawing_key_points()
         self.set_court_lines()
+        self.court_projector = CourtProjector(self.drawing_key_points)
+        # Pre-rendered background and court, built for the first frame shape drawn
+        self.static_tile = None
 
 
     def convert_meters_to_pixels(self, meters):
@@ -128,23 +139,81 @@ class MiniCourt():
         return frame
 
     def draw_background_rectangle(self,frame):
-        shapes = np.zeros_like(frame,np.uint8)
-        # Draw the rectangle
-        cv2.rectangle(shapes, (self.start_x, self.start_y), (self.end_x, self.end_y), (255, 255, 255), cv2.FILLED)
-        out = frame.copy()
+        # Blend white into the rectangle region only, in place
+        roi = self.get_background_roi(frame)
         alpha=0.5
-        mask = shapes.astype(bool)
-        out[mask] = cv2.addWeighted(frame, alpha, shapes, 1 - alpha, 0)[mask]
+        cv2.addWeighted(roi, alpha, np.full_like(roi, 255), 1 - alpha, 0, roi)
+        return frame
 
-        return out
+    def get_background_roi(self, frame):
+        """View of the background rectangle (inclusive corners), clipped to the frame"""
+        return frame[max(self.start_y, 0):min(self.end_y + 1, frame.shape[0]),
+                     max(self.start_x, 0):min(self.end_x + 1, frame.shape[1])]
+
+    def build_static_tile(self, frame_shape):
+        """
+        Render the background and court once for frames of frame_shape. The tile is the
+        court drawing over white for the background rectangle, and a mask of the pixels
+        the court drawing covers; those are opaque, the rest is blended at 50%.
+        """
+        # Drawing the court on a white and on a black canvas finds every pixel it touches:
+        # those are the same on both canvases
+        white_canvas = np.full(frame_shape, 255, np.uint8)
+        black_canvas = np.zeros(frame_shape, np.uint8)
+        self.draw_court(white_canvas)
+        self.draw_court(black_canvas)
+
+        tile_color = self.get_background_roi(white_canvas).copy()
+        tile_opaque = np.all(tile_color == self.get_background_roi(black_canvas), axis=2)
+        self.static_tile = (frame_shape, tile_color, tile_opaque[..., None], np.full_like(tile_color, 255))
+
+    def draw_static_layers(self, frame):
+        """Background and court from the cached tile; only the rectangle region is touched"""
+        if self.static_tile is None or self.static_tile[0] != frame.shape:
+            self.build_static_tile(frame.shape)
+        _, tile_color, tile_opaque, tile_background = self.static_tile
+
+        roi = self.get_background_roi(frame)
+        alpha=0.5
+        cv2.addWeighted(roi, alpha, tile_background, 1 - alpha, 0, roi)
+        np.copyto(roi, tile_color, where=tile_opaque)
+        return frame
 
     def draw_mini_court(self,frames):
-        output_frames = []
         for frame in frames:
-            frame = self.draw_background_rectangle(frame)
-            frame = self.draw_court(frame)
-            output_frames.append(frame)
-        return output_frames
+            self.draw_static_layers(frame)
+        return frames
+
+    def draw_trail(self, frame, positions, color):
+        """Connect consecutive known positions of an (n, 2) array, oldest first"""
+        known = np.isfinite(positions).all(axis=1)
+        segments = np.stack([positions[:-1], positions[1:]], axis=1)[known[:-1] & known[1:]]
+        if len(segments):
+            cv2.polylines(frame, segments.astype(np.int32), False, color, 1)
+
+    def draw_frame(self, frame, frame_num, player_positions, ball_positions, trail_length=0,
+                   player_color=(0,255,0), ball_color=(0,255,255)):
+        """
+        Draw the mini court with the player and ball markers of frame_num, and trails of
+        the last trail_length frames when trail_length > 0.
+        player_positions is (n_frames, n_players, 2) and ball_positions (n_frames, 2),
+        as returned by project_tracks_to_mini_court, with NaN for unknown positions.
+        """
+        self.draw_static_layers(frame)
+
+        if trail_length > 0:
+            first_frame = max(frame_num - trail_length, 0)
+            for player_num in range(player_positions.shape[1]):
+                self.draw_trail(frame, player_positions[first_frame:frame_num+1, player_num], player_color)
+            self.draw_trail(frame, ball_positions[first_frame:frame_num+1], ball_color)
+
+        for position in player_positions[frame_num].tolist():
+            if all(math.isfinite(value) for value in position):
+                cv2.circle(frame, (int(position[0]), int(position[1])), 5, player_color, -1)
+        ball_position = ball_positions[frame_num].tolist()
+        if all(math.isfinite(value) for value in ball_position):
+            cv2.circle(frame, (int(ball_position[0]), int(ball_position[1])), 5, ball_color, -1)
+        return frame
 
     def get_start_point_of_mini_court(self):
         return (self.court_start_x,self.court_start_y)
@@ -186,58 +255,100 @@ class MiniCourt():
 
         return  mini_court_player_position
 
+    def project_tracks_to_mini_court(self, player_tracks, ball_tracks, court_key_points):
+        """
+        Project player foot positions and ball centers of the whole video onto the mini court
+        with the court homography. court_key_points is one keypoint set or one per frame.
+        Returns (player_positions, ball_positions) of shape (n_frames, n_players, 2) and (n_frames, 2).
+        """
+        player_points = np.where(player_tracks.valid[..., None], get_foot_positions(player_tracks.boxes), np.nan)
+        ball_points = get_centers_of_bboxes(ball_tracks.get_track(1))
+
+        # Stack players and ball so the whole video goes through as few transforms as possible
+        points = np.concatenate([player_points, ball_points[:, None, :]], axis=1)
+        projected = self.court_projector.project_points(points, court_key_points)
+
+        return projected[:, :-1], projected[:, -1]
+
+    def convert_tracks_to_mini_court_coordinates(self, player_tracks, ball_tracks, original_court_key_points):
+        """
+        Batch conversion of whole player and ball tracks to mini court coordinates.
+        Returns (player_positions, ball_positions) arrays of shape (n_frames, n_players, 2)
+        and (n_frames, 2), NaN where there is no position.
+        """
+        player_heights_in_meters = np.array([{1: constants.PLAYER_1_HEIGHT_METERS,
+                                              2: constants.PLAYER_2_HEIGHT_METERS}[player_id]
+                                             for player_id in player_tracks.track_ids])
+        player_boxes = player_tracks.boxes.astype(np.float64)
+        player_valid = player_tracks.valid
+        ball_boxes = ball_tracks.get_track(1).astype(np.float64)
+
+        # Ball position and the player closest to it in every frame
+        ball_positions = get_centers_of_bboxes(ball_boxes)
+        distances_to_ball = measure_distances(ball_positions[:, None, :], get_centers_of_bboxes(player_boxes))
+        distances_to_ball = np.where(player_valid, distances_to_ball, np.inf)
+        closest_player_to_ball = np.argmin(distances_to_ball, axis=1)
+        ball_valid = player_valid.any(axis=1) & ~np.isnan(ball_positions).any(axis=1)
+
+        # Tallest bbox of each player in the window [frame_num-20, frame_num+50)
+        bbox_heights = np.where(player_valid, get_heights_of_bboxes(player_boxes), -np.inf)
+        padded_heights = np.pad(bbox_heights, ((20, 49), (0, 0)), constant_values=-np.inf)
+        max_player_heights_in_pixels = sliding_window_view(padded_heights, 70, axis=0).max(axis=-1)
+
+        player_positions = self.get_mini_court_coordinates_batch(get_foot_positions(player_boxes),
+                                                                 original_court_key_points,
+                                                                 max_player_heights_in_pixels,
+                                                                 player_heights_in_meters[None, :])
+        player_positions[~player_valid] = np.nan
+
+        frame_nums = np.arange(len(player_tracks))
+        ball_positions = self.get_mini_court_coordinates_batch(ball_positions,
+                                                               original_court_key_points,
+                                                               max_player_heights_in_pixels[frame_nums, closest_player_to_ball],
+                                                               player_heights_in_meters[closest_player_to_ball])
+        ball_positions[~ball_valid] = np.nan
+
+        return player_positions, ball_positions
+
+    def get_mini_court_coordinates_batch(self, object_positions, original_court_key_points, player_heights_in_pixels, player_heights_in_meters):
+        """Vectorized get_mini_court_coordinates, measuring from the closest of keypoints 0, 2, 12 and 13 by y"""
+        keypoint_indices = np.array([0, 2, 12, 13])
+        court_key_points = np.asarray(original_court_key_points, dtype=np.float64).reshape(-1, 2)
+        drawing_key_points = np.asarray(self.drawing_key_points, dtype=np.float64).reshape(-1, 2)
+
+        # np.argmin keeps the first of equally close keypoints, like get_closest_keypoint_index
+        y_distances = np.abs(object_positions[..., 1:2] - court_key_points[keypoint_indices, 1])
+        closest_key_point_indices = keypoint_indices[np.argmin(y_distances, axis=-1)]
+        closest_key_points = court_key_points[closest_key_point_indices]
+
+        distances_from_keypoint_pixels = np.abs(object_positions - closest_key_points)
+        distances_from_keypoint_meters = convert_pixel_distance_to_meters(distances_from_keypoint_pixels,
+                                                                          player_heights_in_meters[..., None],
+                                                                          player_heights_in_pixels[..., None])
+        mini_court_distances_pixels = self.convert_meters_to_pixels(distances_from_keypoint_meters)
+
+        return drawing_key_points[closest_key_point_indices] + mini_court_distances_pixels
+
     def convert_bounding_boxes_to_mini_court_coordinates(self,player_boxes, ball_boxes, original_court_key_points ):
-        player_heights = {
-            1: constants.PLAYER_1_HEIGHT_METERS,
-            2: constants.PLAYER_2_HEIGHT_METERS
-        }
+        # Lists of boxes are kept in float64, so the result is the same as converting them one by one
+        if not isinstance(player_boxes, Tracks):
+            player_boxes = Tracks.from_detections(player_boxes, track_ids=[1, 2], dtype=np.float64)
+        if not isinstance(ball_boxes, Tracks):
+            ball_boxes = Tracks.from_detections(ball_boxes, track_ids=[1], dtype=np.float64)
+
+        player_positions, ball_positions = self.convert_tracks_to_mini_court_coordinates(player_boxes,
+                                                                                       ball_boxes,
+                                                                                       original_court_key_points)
 
         output_player_boxes= []
         output_ball_boxes= []
-
-        for frame_num, player_bbox in enumerate(player_boxes):
-            ball_box = ball_boxes[frame_num][1]
-            ball_position = get_center_of_bbox(ball_box)
-            closest_player_id_to_ball = min(player_bbox.keys(), key=lambda x: measure_distance(ball_position, get_center_of_bbox(player_bbox[x])))
-
-            output_player_bboxes_dict = {}
-            for player_id, bbox in player_bbox.items():
-                foot_position = get_foot_position(bbox)
-
-                # Get The closest keypoint in pixels
-                closest_key_point_index = get_closest_keypoint_index(foot_position,original_court_key_points, [0,2,12,13])
-                closest_key_point = (original_court_key_points[closest_key_point_index*2], 
-                                     original_court_key_points[closest_key_point_index*2+1])
-
-                # Get Player height in pixels
-                frame_index_min = max(0, frame_num-20)
-                frame_index_max = min(len(player_boxes), frame_num+50)
-                bboxes_heights_in_pixels = [get_height_of_bbox(player_boxes[i][player_id]) for i in range (frame_index_min,frame_index_max)]
-                max_player_height_in_pixels = max(bboxes_heights_in_pixels)
-
-                mini_court_player_position = self.get_mini_court_coordinates(foot_position,
-                                                                            closest_key_point, 
-                                                                            closest_key_point_index, 
-                                                                            max_player_height_in_pixels,
-                                                                            player_heights[player_id]
-                                                                            )
-                
-                output_player_bboxes_dict[player_id] = mini_court_player_position
-
-                if closest_player_id_to_ball == player_id:
-                    # Get The closest keypoint in pixels
-                    closest_key_point_index = get_closest_keypoint_index(ball_position,original_court_key_points, [0,2,12,13])
-                    closest_key_point = (original_court_key_points[closest_key_point_index*2], 
-                                        original_court_key_points[closest_key_point_index*2+1])
-                    
-                    mini_court_player_position = self.get_mini_court_coordinates(ball_position,
-                                                                            closest_key_point, 
-                                                                            closest_key_point_index, 
-                                                                            max_player_height_in_pixels,
-                                                                            player_heights[player_id]
-                                                                            )
-                    output_ball_boxes.append({1:mini_court_player_position})
-            output_player_boxes.append(output_player_bboxes_dict)
+        for frame_player_positions, frame_player_valid, ball_position in zip(player_positions.tolist(),
+                                                                             player_boxes.valid.tolist(),
+                                                                             ball_positions.tolist()):
+            output_player_boxes.append({player_id: tuple(position)
+                                        for player_id, position, is_valid in zip(player_boxes.track_ids, frame_player_positions, frame_player_valid)
+                                        if is_valid})
+            output_ball_boxes.append({1: tuple(ball_position)} if not math.isnan(ball_position[0]) else {})
 
         return output_player_boxes , output_ball_boxes
     
@@ -0,0 +1 @@
+from .stats_engine import StatsEngine, PLAYER_IDS
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import sys
+sys.path.append('../')
+import constants
+from utils import measure_distances
+
+PLAYER_IDS = (1, 2)
+
+
+class StatsEngine:
+    """
+    Shot and player speed statistics from the shot frames and the mini court positions.
+    Every shot runs from its frame to the next shot frame: the ball speed over that span
+    counts for the player closest to the ball at the start, and the distance covered by
+    the opponent is that player's speed sample. Speeds that cannot be measured because a
+    position is missing are skipped. Running totals, last values and averages
+    are cumulative sums over the shot arrays, so the per-frame table is a gather instead
+    of a copy of the stats per shot.
+    add_shots can be called again as new shots are detected; the last shot stays pending
+    until the next one gives it an end frame.
+    """
+    def __init__(self, fps, mini_court_width_pixels, court_width_meters=constants.DOUBLE_LINE_WIDTH):
+        self.fps = fps
+        self.mini_court_width_pixels = mini_court_width_pixels
+        self.court_width_meters = court_width_meters
+
+        self.pending_shot_frame = None
+        # One entry per finished shot
+        self.shot_frames = np.zeros(0, dtype=np.int64)
+        self.shooter_indices = np.zeros(0, dtype=np.int64)
+        self.shot_speeds = np.zeros(0)
+        self.player_speeds = np.zeros(0)
+        # Row 0 is the all-zero state before the first shot, row i the state after shot i
+        self.columns = {column: np.zeros(1) for column in self._get_column_names()}
+
+    def _get_column_names(self):
+        columns = []
+        for player_id in PLAYER_IDS:
+            columns += [f'player_{player_id}_number_of_shots',
+                        f'player_{player_id}_number_of_shot_speed_samples',
+                        f'player_{player_id}_total_shot_speed',
+                        f'player_{player_id}_last_shot_speed',
+                        f'player_{player_id}_number_of_speed_samples',
+                        f'player_{player_id}_total_player_speed',
+                        f'player_{player_id}_last_player_speed']
+        return columns
+
+    def _to_km_per_hour(self, distances_pixels, seconds):
+        distances_meters = (distances_pixels * self.court_width_meters) / self.mini_court_width_pixels
+        return distances_meters / seconds * 3.6
+
+    def add_shots(self, shot_frames, player_positions, ball_positions):
+        """
+        Add shot frames that come after the ones added before.
+        player_positions (n_frames, 2, 2) and ball_positions (n_frames, 2) are mini court
+        positions indexed by frame number, covering at least the last shot frame.
+        """
+        shot_frames = np.asarray(shot_frames, dtype=np.int64)
+        if len(shot_frames) == 0:
+            return
+        if self.pending_shot_frame is not None:
+            shot_frames = np.concatenate([[self.pending_shot_frame], shot_frames])
+        self.pending_shot_frame = int(shot_frames[-1])
+        if len(shot_frames) < 2:
+            return
+
+        start_frames, end_frames = shot_frames[:-1], shot_frames[1:]
+        seconds = (end_frames - start_frames) / self.fps
+        player_positions = np.asarray(player_positions, dtype=np.float64)
+        ball_positions = np.asarray(ball_positions, dtype=np.float64)
+
+        shot_speeds = self._to_km_per_hour(measure_distances(ball_positions[start_frames], ball_positions[end_frames]), seconds)
+
+        # The player closest to the ball hit it; player 1 wins ties. A missing position
+        # never beats a present one, player 1 is only the default when both are missing
+        distances_to_ball = measure_distances(player_positions[start_frames], ball_positions[start_frames][:, None])
+        distances_to_ball = np.where(np.isnan(distances_to_ball), np.inf, distances_to_ball)
+        shooter_indices = (distances_to_ball[:, 1] < distances_to_ball[:, 0]).astype(np.int64)
+        opponent_indices = 1 - shooter_indices
+        shot_range = np.arange(len(start_frames))
+        opponent_distances = measure_distances(player_positions[start_frames, opponent_indices],
+                                               player_positions[end_frames, opponent_indices])
+        player_speeds = self._to_km_per_hour(opponent_distances, seconds)
+
+        self.shot_frames = np.concatenate([self.shot_frames, start_frames])
+        self.shooter_indices = np.concatenate([self.shooter_indices, shooter_indices])
+        self.shot_speeds = np.concatenate([self.shot_speeds, shot_speeds])
+        self.player_speeds = np.concatenate([self.player_speeds, player_speeds])
+
+        for player_index, player_id in enumerate(PLAYER_IDS):
+            is_shooter = shooter_indices == player_index
+            self._extend_counts(f'player_{player_id}_number_of_shots', is_shooter)
+            has_shot_speed = is_shooter & np.isfinite(shot_speeds)
+            self._extend_counts(f'player_{player_id}_number_of_shot_speed_samples', has_shot_speed)
+            self._extend_totals(f'player_{player_id}_total_shot_speed', shot_speeds, has_shot_speed)
+            self._extend_last_values(f'player_{player_id}_last_shot_speed', shot_speeds, has_shot_speed, shot_range)
+            # A player's speed is sampled on the opponent's shots
+            has_player_speed = ~is_shooter & np.isfinite(player_speeds)
+            self._extend_counts(f'player_{player_id}_number_of_speed_samples', has_player_speed)
+            self._extend_totals(f'player_{player_id}_total_player_speed', player_speeds, has_player_speed)
+            self._extend_last_values(f'player_{player_id}_last_player_speed', player_speeds, has_player_speed, shot_range)
+
+    def _extend_counts(self, column, mask):
+        values = self.columns[column]
+        self.columns[column] = np.concatenate([values, values[-1] + np.cumsum(mask)])
+
+    def _extend_totals(self, column, speeds, mask):
+        # The running total goes through cumsum starting from the previous total, which
+        # adds in the same order as a loop over the shots
+        values = self.columns[column]
+        totals = np.cumsum(np.concatenate([values[-1:], np.where(mask, speeds, 0.0)]))
+        self.columns[column] = np.concatenate([values, totals[1:]])
+
+    def _extend_last_values(self, column, speeds, mask, shot_range):
+        # Index of the latest shot that updated the column, -1 while it is the previous value
+        values = self.columns[column]
+        last_index = np.maximum.accumulate(np.where(mask, shot_range, -1))
+        last_values = np.where(last_index >= 0, speeds[np.maximum(last_index, 0)], values[-1])
+        self.columns[column] = np.concatenate([values, last_values])
+
+    def get_frame_stats(self, number_of_frames):
+        """
+        One row per frame with the stats of the latest finished shot at or before it,
+        plus average shot and player speeds (NaN before a player's first sample).
+        """
+        frame_nums = np.arange(number_of_frames)
+        # Row 0 of the columns is frame 0 before any shot
+        row_frames = np.concatenate([[0], self.shot_frames])
+        rows = np.searchsorted(row_frames, frame_nums, side='right') - 1
+
+        frame_stats = {'frame_num': frame_nums}
+        for column, values in self.columns.items():
+            frame_stats[column] = values[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for player_id in PLAYER_IDS:
+                frame_stats[f'player_{player_id}_average_shot_speed'] = (frame_stats[f'player_{player_id}_total_shot_speed'] /
+                                                                         frame_stats[f'player_{player_id}_number_of_shot_speed_samples'])
+                frame_stats[f'player_{player_id}_average_player_speed'] = (frame_stats[f'player_{player_id}_total_player_speed'] /
+                                                                           frame_stats[f'player_{player_id}_number_of_speed_samples'])
+        return pd.DataFrame(frame_stats)
+
+    def get_player_summary(self, player_id):
+        """Totals of one player over the finished shots, in km/h; None where there is no sample"""
+        player_index = PLAYER_IDS.index(player_id)
+        is_shooter = self.shooter_indices == player_index
+        shot_speeds = self.shot_speeds[is_shooter & np.isfinite(self.shot_speeds)]
+        player_speeds = self.player_speeds[~is_shooter & np.isfinite(self.player_speeds)]
+        return {
+            'number_of_shots': int(is_shooter.sum()),
+            'average_shot_speed': float(shot_speeds.mean()) if len(shot_speeds) else None,
+            'max_shot_speed': float(shot_speeds.max()) if len(shot_speeds) else None,
+            'average_player_speed': float(player_speeds.mean()) if len(player_speeds) else None,
+            'max_player_speed': float(player_speeds.max()) if len(player_speeds) else None,
+        }
@@ -0,0 +1,78 @@
+"""
+CourtKeypointTracker on synthetic frames with a stub keypoint model: a static camera
+gives one keypoint set per CNN run, a panning camera moves the keypoints with it.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from court_line_detector import CourtKeypointTracker
+
+FRAME_SIZE = (640, 360)
+KEY_POINTS = np.array([[x, y] for y in (80, 160, 240) for x in (120, 220, 320, 420, 520)][:14], dtype=np.float32)
+
+
+class StubCourtLineDetector:
+    """Returns the keypoints of a frame from its known pan offset"""
+    cache = None
+
+    def __init__(self, offsets):
+        self.offsets = offsets
+        self.runs = 0
+
+    def predict(self, image, use_cache=True):
+        self.runs += 1
+        return (KEY_POINTS + [self.offsets[id(image)], 0]).reshape(-1)
+
+    def predict_batch(self, images, use_cache=True):
+        return [self.predict(image) for image in images]
+
+
+def make_frames(number_of_frames, pan_per_frame, seed=0):
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (FRAME_SIZE[1], FRAME_SIZE[0] + 200, 3), dtype=np.uint8), (5, 5), 0)
+    frames, offsets = [], {}
+    for frame_num in range(number_of_frames):
+        offset = pan_per_frame * frame_num
+        shift = np.float32([[1, 0, offset], [0, 1, 0]])
+        frame = cv2.warpAffine(background, shift, (background.shape[1], background.shape[0]))[:, :FRAME_SIZE[0]]
+        # Sensor noise, so flow never returns exactly the same points
+        frame = cv2.add(frame, rng.integers(0, 3, frame.shape, dtype=np.uint8))
+        frames.append(frame)
+        offsets[id(frame)] = offset
+    return frames, offsets
+
+
+def run_tracker(tracker, frames, chunk_size=16):
+    return np.concatenate([tracker.update(frames[start:start + chunk_size])
+                           for start in range(0, len(frames), chunk_size)])
+
+
+def test_static_camera_keeps_keypoints_between_refreshes():
+    frames, offsets = make_frames(96, pan_per_frame=0)
+    court_line_detector = StubCourtLineDetector(offsets)
+    tracker = CourtKeypointTracker(court_line_detector, refresh_interval=40)
+    keypoints = run_tracker(tracker, frames)
+
+    assert keypoints.shape == (96, 28)
+    assert court_line_detector.runs == 3
+    assert len(np.unique(keypoints, axis=0)) == 1
+    np.testing.assert_allclose(keypoints[0], KEY_POINTS.reshape(-1))
+
+
+def test_panning_camera_moves_keypoints():
+    frames, offsets = make_frames(48, pan_per_frame=0.5)
+    court_line_detector = StubCourtLineDetector(offsets)
+    tracker = CourtKeypointTracker(court_line_detector, refresh_interval=1000, change_threshold=1e9)
+    keypoints = run_tracker(tracker, frames)
+
+    assert court_line_detector.runs == 1
+    # A new set about every min_keypoint_shift pixels of motion, not one per frame
+    number_of_sets = len(np.unique(keypoints, axis=0))
+    assert 5 <= number_of_sets <= 24
+    expected = np.stack([(KEY_POINTS + [offsets[id(frame)], 0]).reshape(-1) for frame in frames])
+    shift = np.linalg.norm((keypoints - expected).reshape(48, 14, 2), axis=-1).mean(axis=1)
+    assert shift.max() <= tracker.min_keypoint_shift + 0.5
@@ -0,0 +1,73 @@
+"""
+CourtProjector.project_points with one keypoint set and with keypoints of every frame,
+against court keypoints made from known homographies.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mini_court import CourtProjector
+
+
+def make_drawing_key_points(rng):
+    return rng.uniform(0, 300, (14, 2))
+
+
+def make_camera_homography(rng):
+    """Mini court -> image homography of a camera behind the baseline, with a random tilt"""
+    homography = np.array([[3.0, 0.4, 200.0],
+                           [0.0, 2.0, 100.0],
+                           [0.0, 0.001, 1.0]])
+    return homography + rng.normal(0, [[0.05, 0.02, 5.0], [0.02, 0.05, 5.0], [1e-5, 1e-5, 0.0]])
+
+
+def to_image(points, camera_homography):
+    return cv2.perspectiveTransform(np.asarray(points, dtype=np.float64).reshape(-1, 1, 2),
+                                    camera_homography).reshape(np.shape(points))
+
+
+def test_project_points_one_keypoint_set():
+    rng = np.random.default_rng(0)
+    drawing_key_points = make_drawing_key_points(rng)
+    camera_homography = make_camera_homography(rng)
+    court_key_points = to_image(drawing_key_points, camera_homography).reshape(-1)
+
+    mini_court_points = rng.uniform(0, 300, (40, 3, 2))
+    image_points = to_image(mini_court_points, camera_homography)
+    image_points[5, 1] = np.nan
+
+    projected = CourtProjector(drawing_key_points).project_points(image_points, court_key_points)
+    assert projected.shape == image_points.shape
+    assert np.isnan(projected[5, 1]).all()
+    finite = np.isfinite(image_points).all(axis=-1)
+    np.testing.assert_allclose(projected[finite], mini_court_points[finite], atol=1e-3)
+
+
+def test_project_points_per_frame_keypoints():
+    # Every frame has its own camera, as when optical flow moves the keypoints a little
+    rng = np.random.default_rng(1)
+    drawing_key_points = make_drawing_key_points(rng)
+    number_of_frames = 60
+    camera_homographies = [make_camera_homography(rng) for _ in range(number_of_frames)]
+    # Some frames repeat the keypoints of the frame before, as between flow updates
+    for frame_num in range(1, number_of_frames, 4):
+        camera_homographies[frame_num] = camera_homographies[frame_num - 1]
+    court_key_points = np.stack([to_image(drawing_key_points, camera_homography).reshape(-1)
+                                 for camera_homography in camera_homographies])
+
+    mini_court_points = rng.uniform(0, 300, (number_of_frames, 3, 2))
+    image_points = np.stack([to_image(frame_points, camera_homography)
+                             for frame_points, camera_homography in zip(mini_court_points, camera_homographies)])
+    missing = rng.random((number_of_frames, 3)) < 0.1
+    image_points[missing] = np.nan
+
+    court_projector = CourtProjector(drawing_key_points)
+    projected = court_projector.project_points(image_points, court_key_points)
+    assert np.isnan(projected[missing]).all()
+    np.testing.assert_allclose(projected[~missing], mini_court_points[~missing], atol=1e-3)
+
+    # One fit per distinct keypoint set
+    assert len(court_projector.homographies) == len(np.unique(court_key_points, axis=0))
@@ -0,0 +1,121 @@
+"""
+find_ball_hit_frames, BallTracker.get_ball_shot_frames and ShotDetector against a copy
+of the original per-frame iloc loop, on random ball trajectories with gaps and plateaus.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trackers import BallTracker, ShotDetector, find_ball_hit_frames
+
+NUMBER_OF_TRAJECTORIES = 300
+
+
+def get_ball_shot_frames_loop(ball_positions):
+    """BallTracker.get_ball_shot_frames before vectorization"""
+    ball_positions = [x.get(1,[]) for x in ball_positions]
+    # convert the list into pandas dataframe
+    df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
+
+    df_ball_positions['ball_hit'] = 0
+
+    df_ball_positions['mid_y'] = (df_ball_positions['y1'] + df_ball_positions['y2'])/2
+    df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
+    df_ball_positions['delta_y'] = df_ball_positions['mid_y_rolling_mean'].diff()
+    minimum_change_frames_for_hit = 25
+    for i in range(1,len(df_ball_positions)- int(minimum_change_frames_for_hit*1.2) ):
+        negative_position_change = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[i+1] <0
+        positive_position_change = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[i+1] >0
+
+        if negative_position_change or positive_position_change:
+            change_count = 0
+            for change_frame in range(i+1, i+int(minimum_change_frames_for_hit*1.2)+1):
+                negative_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[change_frame] <0
+                positive_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[change_frame] >0
+
+                if negative_position_change and negative_position_change_following_frame:
+                    change_count+=1
+                elif positive_position_change and positive_position_change_following_frame:
+                    change_count+=1
+
+            if change_count>minimum_change_frames_for_hit-1:
+                df_ball_positions.loc[i, 'ball_hit'] = 1
+
+    frame_nums_with_ball_hits = df_ball_positions[df_ball_positions['ball_hit']==1].index.tolist()
+
+    return frame_nums_with_ball_hits
+
+
+def get_delta_y(ball_positions):
+    """delta_y of the rolling mean of mid_y, computed the way get_ball_shot_frames does"""
+    mid_y = pd.Series([(bbox[1] + bbox[3])/2 if bbox else np.nan for bbox in (x.get(1) for x in ball_positions)])
+    return mid_y.rolling(window=5, min_periods=1, center=False).mean().diff().to_numpy()
+
+
+def make_ball_positions(rng):
+    """
+    Ball going up and down in segments of random length and speed, with plateaus
+    (the ball does not move), gaps (no detection) and jitter. Coordinates are
+    multiples of 0.25, so float32 storage and rolling sums are exact.
+    """
+    ball_positions = []
+    number_of_frames = rng.integers(60, 400)
+    y = rng.uniform(200, 800)
+    while len(ball_positions) < number_of_frames:
+        segment = rng.choice(['move', 'plateau', 'gap'], p=[0.7, 0.15, 0.15])
+        length = int(rng.integers(1, 50))
+        velocity = rng.uniform(-15, 15)
+        for _ in range(length):
+            if segment == 'gap':
+                ball_positions.append({})
+                continue
+            if segment == 'move':
+                y += velocity + rng.normal(0, 2)
+            y1 = round(y * 4) / 4
+            x1 = round(rng.uniform(0, 1900) * 4) / 4
+            ball_positions.append({1: [x1, y1, x1 + 10.0, y1 + 10.0]})
+    return ball_positions
+
+
+@pytest.fixture(scope='module')
+def trajectories():
+    rng = np.random.default_rng(5)
+    trajectories = [make_ball_positions(rng) for _ in range(NUMBER_OF_TRAJECTORIES)]
+    return [(ball_positions, get_ball_shot_frames_loop(ball_positions)) for ball_positions in trajectories]
+
+
+def test_trajectories_have_hits(trajectories):
+    # Guard against a generator that never triggers the check being tested
+    assert sum(len(expected) > 0 for _, expected in trajectories) > NUMBER_OF_TRAJECTORIES // 2
+
+
+def test_find_ball_hit_frames_matches_loop(trajectories):
+    for ball_positions, expected in trajectories:
+        assert find_ball_hit_frames(get_delta_y(ball_positions)) == expected
+
+
+def test_get_ball_shot_frames_matches_loop(trajectories):
+    # get_ball_shot_frames does not use the model
+    ball_tracker = BallTracker.__new__(BallTracker)
+    for ball_positions, expected in trajectories:
+        assert ball_tracker.get_ball_shot_frames(ball_positions) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 16, 57])
+def test_shot_detector_matches_loop(trajectories, chunk_size):
+    for ball_positions, expected in trajectories:
+        shot_detector = ShotDetector()
+        shot_frames = []
+        for start in range(0, len(ball_positions), chunk_size):
+            for ball_dict in ball_positions[start:start + chunk_size]:
+                shot_frames.extend(shot_detector.update(ball_dict.get(1)))
+        assert shot_frames == expected
+
+
+def test_find_ball_hit_frames_short_input():
+    assert find_ball_hit_frames(np.zeros(31)) == []
+    assert find_ball_hit_frames(np.array([])) == []
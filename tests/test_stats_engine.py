@@ -0,0 +1,69 @@
+"""
+StatsEngine shooter choice: the player closest to the ball at the shot frame, where a
+missing player position never wins over a detected one.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import constants
+from stats import StatsEngine
+
+FPS = 24
+MINI_COURT_WIDTH = 250
+SHOT_FRAMES = [0, 24]
+
+
+def make_positions(player_1_position, player_2_position):
+    """Ball at (100, 100) on the shot frame and 50 px further on the next one, players still"""
+    player_positions = np.zeros((25, 2, 2))
+    player_positions[:, 0] = player_1_position
+    player_positions[:, 1] = player_2_position
+    ball_positions = np.zeros((25, 2))
+    ball_positions[0] = [100, 100]
+    ball_positions[24] = [100, 150]
+    return player_positions, ball_positions
+
+
+def get_last_frame_stats(player_positions, ball_positions):
+    stats_engine = StatsEngine(FPS, MINI_COURT_WIDTH)
+    stats_engine.add_shots(SHOT_FRAMES, player_positions, ball_positions)
+    return stats_engine.get_frame_stats(25).iloc[-1]
+
+
+def test_closest_player_hits():
+    stats = get_last_frame_stats(*make_positions([100, 400], [100, 120]))
+    assert stats['player_1_number_of_shots'] == 0
+    assert stats['player_2_number_of_shots'] == 1
+    assert stats['player_2_last_shot_speed'] > 0
+
+
+def test_tie_goes_to_player_1():
+    stats = get_last_frame_stats(*make_positions([100, 80], [100, 120]))
+    assert stats['player_1_number_of_shots'] == 1
+    assert stats['player_2_number_of_shots'] == 0
+
+
+def test_missing_player_1_does_not_hit():
+    # Player 1 was not detected on the shot frame, player 2 was
+    stats = get_last_frame_stats(*make_positions([np.nan, np.nan], [100, 400]))
+    assert stats['player_1_number_of_shots'] == 0
+    assert stats['player_2_number_of_shots'] == 1
+    assert stats['player_2_number_of_shot_speed_samples'] == 1
+    np.testing.assert_allclose(stats['player_2_last_shot_speed'], 50 * constants.DOUBLE_LINE_WIDTH / MINI_COURT_WIDTH * 3.6)
+    # The missing player's speed cannot be measured
+    assert stats['player_1_number_of_speed_samples'] == 0
+
+
+def test_missing_player_2_does_not_hit():
+    stats = get_last_frame_stats(*make_positions([100, 400], [np.nan, np.nan]))
+    assert stats['player_1_number_of_shots'] == 1
+    assert stats['player_2_number_of_shots'] == 0
+
+
+def test_both_players_missing_defaults_to_player_1():
+    stats = get_last_frame_stats(*make_positions([np.nan, np.nan], [np.nan, np.nan]))
+    assert stats['player_1_number_of_shots'] == 1
+    assert stats['player_2_number_of_shots'] == 0
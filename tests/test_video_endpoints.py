@@ -0,0 +1,96 @@
+"""
+Output video routes through the Flask test client: byte ranges, ETag revalidation,
+If-Range, immutable Cache-Control and handing the file to nginx with X-Accel-Redirect.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VIDEO_NAME = 'match_analyzed.mp4'
+VIDEO_BYTES = bytes(range(256)) * 40
+
+
+@pytest.fixture(scope='module')
+def backend_app(tmp_path_factory):
+    # The app opens its database and the runner lock on import, keep both out of the repo
+    state_dir = tmp_path_factory.mktemp('backend')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{state_dir / 'test.db'}")
+    os.environ.setdefault('ANALYSIS_RUNNER_LOCK_PATH', str(state_dir / 'job_runner.lock'))
+    import backend.app as backend_app
+    backend_app.job_queue.stop()
+    return backend_app
+
+
+@pytest.fixture
+def client(backend_app, tmp_path, monkeypatch):
+    (tmp_path / VIDEO_NAME).write_bytes(VIDEO_BYTES)
+    (tmp_path / 'match_analyzed_tracks.parquet').write_bytes(b'PAR1')
+    monkeypatch.setitem(backend_app.app.config, 'OUTPUT_FOLDER', str(tmp_path))
+    monkeypatch.setattr(backend_app, 'OUTPUT_FILE_OFFLOAD', '')
+    return backend_app.app.test_client()
+
+
+@pytest.mark.parametrize('route', ['/api/video/', '/outputs/'])
+def test_range_request(client, route):
+    response = client.get(route + VIDEO_NAME, headers={'Range': 'bytes=1000-1999'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 1000-1999/{len(VIDEO_BYTES)}'
+    assert response.headers['Content-Length'] == '1000'
+    assert response.data == VIDEO_BYTES[1000:2000]
+
+
+def test_open_ended_range_request(client):
+    response = client.get('/api/video/' + VIDEO_NAME, headers={'Range': 'bytes=10000-'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10000-{len(VIDEO_BYTES) - 1}/{len(VIDEO_BYTES)}'
+    assert response.data == VIDEO_BYTES[10000:]
+
+
+def test_if_none_match(client):
+    etag = client.get('/api/video/' + VIDEO_NAME).headers['ETag']
+    response = client.get('/api/video/' + VIDEO_NAME, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_if_range(client):
+    etag = client.get('/api/video/' + VIDEO_NAME).headers['ETag']
+
+    response = client.get('/api/video/' + VIDEO_NAME, headers={'Range': 'bytes=0-99', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == VIDEO_BYTES[:100]
+
+    # A stale validator means the client's partial copy is from another file: send all of it
+    response = client.get('/api/video/' + VIDEO_NAME, headers={'Range': 'bytes=0-99', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert 'Content-Range' not in response.headers
+    assert response.data == VIDEO_BYTES
+
+
+def test_cache_control(client):
+    response = client.get('/outputs/' + VIDEO_NAME)
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    cache_control = response.cache_control
+    assert cache_control.public
+    assert cache_control.immutable
+    assert cache_control.max_age == 365 * 24 * 3600
+
+
+def test_x_accel_redirect(backend_app, client, monkeypatch):
+    monkeypatch.setattr(backend_app, 'OUTPUT_FILE_OFFLOAD', 'x-accel-redirect')
+    monkeypatch.setattr(backend_app, 'OUTPUT_ACCEL_REDIRECT_PREFIX', '/protected-outputs/')
+    response = client.get('/api/video/' + VIDEO_NAME, headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == '/protected-outputs/' + VIDEO_NAME
+    assert response.cache_control.immutable
+
+
+@pytest.mark.parametrize('filename', ['match_analyzed_tracks.parquet', 'missing_analyzed.mp4', '..%2Fsecret.mp4'])
+def test_not_served(client, filename):
+    assert client.get('/api/video/' + filename).status_code == 404
+    assert client.get('/outputs/' + filename).status_code == 404
@@ -0,0 +1,126 @@
+"""
+A model worker that dies takes the ProcessPoolExecutor down with it: the pool must start
+new workers for the next job, and the job queue must put the interrupted job back.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+import types
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from flask import Flask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import worker_pool
+from backend.worker_pool import AnalysisWorkerPool
+from backend.job_queue import JobQueue, JobInterruptedError
+from backend.models import db, Analysis, AnalysisJob
+
+
+def analyze_video_stub(input_path, output_path, **kwargs):
+    if input_path.endswith('kill.mp4'):
+        # What the kernel OOM killer does to a worker
+        os.kill(os.getpid(), getattr(signal, 'SIGKILL', signal.SIGTERM))
+    return output_path
+
+
+def init_stub_worker(config, progress_queue):
+    """Worker without models, whose main only returns the output path or kills the process"""
+    worker_pool._worker_config = config
+    worker_pool._progress_queue = progress_queue
+    worker_pool._worker_models = {}
+    sys.modules['main'] = types.SimpleNamespace(main=analyze_video_stub)
+
+
+class StubWorkerPool(AnalysisWorkerPool):
+    def _create_executor(self):
+        self.executor_kwargs['initializer'] = init_stub_worker
+        return super()._create_executor()
+
+
+def test_pool_recovers_from_killed_worker():
+    pool = StubWorkerPool(num_workers=1)
+    try:
+        assert pool.submit('first.mp4', 'first_analyzed.mp4').result(timeout=60).endswith('first_analyzed.mp4')
+        broken_executor = pool.executor
+
+        with pytest.raises(BrokenProcessPool):
+            pool.submit('kill.mp4', 'kill_analyzed.mp4').result(timeout=60)
+
+        assert pool.submit('next.mp4', 'next_analyzed.mp4').result(timeout=60).endswith('next_analyzed.mp4')
+        assert pool.executor is not broken_executor
+    finally:
+        pool.shutdown()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def add_job(app, analysis_id):
+    with app.app_context():
+        db.session.add(Analysis(id=analysis_id, input_filename=f'{analysis_id}.mp4', status='queued'))
+        JobQueue(app, None).enqueue(analysis_id, None, f'{analysis_id}.mp4', f'{analysis_id}_analyzed.mp4')
+        db.session.commit()
+
+
+def run_queue(app, run_job, until, max_attempts=3):
+    job_queue = JobQueue(app, run_job, max_attempts=max_attempts, poll_interval_seconds=0.05)
+    job_queue.start()
+    try:
+        deadline = time.monotonic() + 30
+        while not until() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        job_queue.stop()
+        for thread in job_queue.threads:
+            thread.join(timeout=5)
+
+
+def test_interrupted_job_is_requeued(app):
+    add_job(app, 'a1')
+    runs = []
+    done = threading.Event()
+
+    def run_job(analysis_id, input_path, output_path, user_id, input_sha256=None):
+        runs.append(analysis_id)
+        if len(runs) == 1:
+            raise JobInterruptedError('its analysis worker died')
+        with app.app_context():
+            db.session.get(Analysis, analysis_id).update_status('completed', progress=100)
+        done.set()
+
+    run_queue(app, run_job, done.is_set)
+    assert runs == ['a1', 'a1']
+    with app.app_context():
+        assert db.session.get(Analysis, 'a1').status == 'completed'
+        assert db.session.get(AnalysisJob, 'a1') is None
+
+
+def test_interrupted_job_fails_after_max_attempts(app):
+    add_job(app, 'a2')
+    runs = []
+
+    def run_job(analysis_id, input_path, output_path, user_id, input_sha256=None):
+        runs.append(analysis_id)
+        raise JobInterruptedError('its analysis worker died')
+
+    def job_gone():
+        with app.app_context():
+            return db.session.get(AnalysisJob, 'a2') is None
+
+    run_queue(app, run_job, job_gone, max_attempts=2)
+    assert runs == ['a2', 'a2']
+    with app.app_context():
+        analysis = db.session.get(Analysis, 'a2')
+        assert analysis.status == 'failed'
+        assert analysis.error_message == 'Processing was interrupted too many times'
@@ -1,2 +1,7 @@
 from .player_tracker import PlayerTracker
-from .ball_tracker import BallTracker
\ No newline at end of file
+from .keyframe_player_tracker import KeyframePlayerTracker
+from .ball_tracker import BallTracker
+from .roi_ball_tracker import RoiBallTracker
+from .tracks import Tracks
+from .ball_kalman_filter import BallKalmanFilter
+from .shot_detector import ShotDetector, find_ball_hit_frames
\ No newline at end of file
@@ -0,0 +1,208 @@
+import numpy as np
+from .tracks import Tracks
+
+# Constant acceleration model with a time step of one frame; the state of each axis is
+# (position, velocity, acceleration) and x and y share one covariance matrix, since both
+# axes have the same model, noise and measurements
+TRANSITION = np.array([[1.0, 1.0, 0.5],
+                       [0.0, 1.0, 1.0],
+                       [0.0, 0.0, 1.0]])
+# Discrete white jerk noise for a unit jerk variance
+JERK_NOISE = np.array([[1/20, 1/8, 1/6],
+                       [1/8, 1/3, 1/2],
+                       [1/6, 1/2, 1.0]])
+
+
+class _Step:
+    """Filtered state of one frame, kept while the frame is inside the smoothing lag"""
+    __slots__ = ('frame_num', 'state', 'predicted_state', 'gain', 'size', 'measured')
+
+    def __init__(self, frame_num, state, predicted_state, size, measured):
+        self.frame_num = frame_num
+        self.state = state
+        self.predicted_state = predicted_state
+        # Rauch-Tung-Striebel gain to the next frame, set once that frame is predicted
+        self.gain = None
+        self.size = size
+        self.measured = measured
+
+
+class BallKalmanFilter:
+    """
+    Online ball tracker replacing interpolate_ball_positions + smooth_ball_positions.
+    Feed one ball bbox (or None) per frame with update(); it gates outlier detections,
+    fills gaps and smooths in one pass. Frames are emitted, as (frame_num, bbox or None),
+    once at least lag later frames have arrived, refined by a fixed-lag Rauch-Tung-Striebel
+    smoother over those frames. The smoother runs once per lag frames for a block of
+    frames, so work per frame is O(1) and frames come out lag to 2 * lag frames late.
+
+    - Detections whose Mahalanobis distance to the prediction exceeds gate_threshold are
+      dropped. max_rejected rejected detections in a row that are consistent with each
+      other (at most max_speed_px apart per frame) restart the track on them, which is
+      what happens when a shot or bounce reverses the ball.
+    - A track is only output once a second detection confirmed it, so a lone false
+      detection after a gap does not show up.
+    - Gaps are filled when a detection arrives again within max_gap_frames and lag;
+      longer gaps end the track and their frames stay None.
+    """
+    def __init__(self, measurement_std=2.0, jerk_std=1.0, initial_velocity_std=30.0,
+                 initial_acceleration_std=5.0, gate_threshold=16.0, max_rejected=2,
+                 max_speed_px=80.0, max_gap_frames=10, lag=10):
+        self.measurement_variance = measurement_std ** 2
+        self.process_noise = JERK_NOISE * jerk_std ** 2
+        self.initial_covariance = np.diag([self.measurement_variance,
+                                           initial_velocity_std ** 2,
+                                           initial_acceleration_std ** 2])
+        # Squared Mahalanobis distance; 16 keeps 99.97% of detections of a 2D Gaussian
+        self.gate_threshold = gate_threshold
+        self.max_rejected = max_rejected
+        self.max_speed_px = max_speed_px
+        self.max_gap_frames = max_gap_frames
+        self.lag = lag
+
+        self.frame_num = -1
+        self.steps = []
+        self.state = None
+        self.covariance = None
+        self.size = None
+        self.gap = 0
+        self.start_frame = -1
+        self.last_accepted_frame = -1
+        # Detections since the first rejection in a row, replayed when the track restarts
+        self.rejected = 0
+        self.replay = []
+
+    def update(self, bbox):
+        """Add the detection of the next frame; returns the frames that are now final"""
+        self.frame_num += 1
+        emitted = []
+        self._process(self.frame_num, bbox if bbox is not None and len(bbox) == 4 else None, emitted)
+        if self.steps and self.steps[0].frame_num <= self.frame_num - 2 * self.lag:
+            self._emit(self.frame_num - self.lag, emitted)
+        return emitted
+
+    def flush(self):
+        """Emit every remaining frame at the end of the video"""
+        emitted = []
+        self._emit(self.frame_num, emitted)
+        return emitted
+
+    def filter_tracks(self, ball_tracks, track_id=1):
+        """Filter one track of a Tracks object; returns a new Tracks with only that track"""
+        filtered_tracks = Tracks.empty(len(ball_tracks), [track_id])
+        boxes = ball_tracks.get_track(track_id).tolist()
+        valid = ball_tracks.valid[:, ball_tracks.track_ids.index(track_id)].tolist()
+        emitted = []
+        for bbox, is_valid in zip(boxes, valid):
+            emitted.extend(self.update(bbox if is_valid else None))
+        emitted.extend(self.flush())
+
+        for frame_num, bbox in emitted:
+            if bbox is not None:
+                filtered_tracks.boxes[frame_num, 0] = bbox
+                filtered_tracks.valid[frame_num, 0] = True
+        return filtered_tracks
+
+    def _start(self, frame_num, bbox):
+        x1, y1, x2, y2 = bbox
+        self.state = np.array([[(x1 + x2) / 2, (y1 + y2) / 2], [0.0, 0.0], [0.0, 0.0]])
+        self.covariance = self.initial_covariance.copy()
+        self.size = (x2 - x1, y2 - y1)
+        self.gap = 0
+        self.start_frame = frame_num
+        self.last_accepted_frame = frame_num
+        self.steps.append(_Step(frame_num, self.state, self.state, self.size, True))
+
+    def _end_track(self, emitted):
+        self._emit(self.frame_num, emitted)
+        self.state = None
+        self.rejected = 0
+        self.replay = []
+
+    def _process(self, frame_num, bbox, emitted):
+        if self.state is None:
+            if bbox is None:
+                emitted.append((frame_num, None))
+            else:
+                self._start(frame_num, bbox)
+            return
+
+        predicted_state = TRANSITION @ self.state
+        predicted_covariance = TRANSITION @ self.covariance @ TRANSITION.T + self.process_noise
+        self.steps[-1].gain = self.covariance @ TRANSITION.T @ np.linalg.inv(predicted_covariance)
+
+        accepted = False
+        if bbox is not None:
+            x1, y1, x2, y2 = bbox
+            innovation = np.array([(x1 + x2) / 2, (y1 + y2) / 2]) - predicted_state[0]
+            # Only the position is measured, so the innovation variance is a scalar
+            innovation_variance = predicted_covariance[0, 0] + self.measurement_variance
+            accepted = innovation @ innovation / innovation_variance <= self.gate_threshold
+
+        if accepted:
+            kalman_gain = predicted_covariance[:, 0] / innovation_variance
+            self.state = predicted_state + kalman_gain[:, None] * innovation
+            self.covariance = predicted_covariance - kalman_gain[:, None] * predicted_covariance[0]
+            self.size = (x2 - x1, y2 - y1)
+            self.gap = 0
+            self.last_accepted_frame = frame_num
+            self.rejected = 0
+            self.replay = []
+        else:
+            self.state = predicted_state
+            self.covariance = predicted_covariance
+            self.gap += 1
+            if bbox is not None:
+                if self.rejected and not self._is_consistent(self.replay, frame_num, bbox):
+                    # An outlier does not start a new track with the next one
+                    self.rejected = 0
+                    self.replay = []
+                self.rejected += 1
+            if self.rejected:
+                self.replay.append((frame_num, bbox))
+        self.steps.append(_Step(frame_num, self.state, predicted_state, self.size, accepted))
+
+        if self.rejected >= self.max_rejected:
+            # The ball changed course: end the track before the first rejected frame and
+            # start a new one from it. Frames already emitted (lag < max_gap_frames) stay as they were
+            replay = [(replay_frame_num, replay_bbox) for replay_frame_num, replay_bbox in self.replay
+                      if replay_frame_num >= self.steps[0].frame_num]
+            if replay:
+                self.steps = [step for step in self.steps if step.frame_num < replay[0][0]]
+            self._end_track(emitted)
+            for replay_frame_num, replay_bbox in replay:
+                self._process(replay_frame_num, replay_bbox, emitted)
+        elif self.gap > self.max_gap_frames:
+            self._end_track(emitted)
+
+    def _is_consistent(self, replay, frame_num, bbox):
+        """Whether bbox is within max_speed_px per frame of the last rejected detection"""
+        last_frame_num, last_bbox = next((replay_frame_num, replay_bbox) for replay_frame_num, replay_bbox in reversed(replay)
+                                         if replay_bbox is not None)
+        dx = (bbox[0] + bbox[2] - last_bbox[0] - last_bbox[2]) / 2
+        dy = (bbox[1] + bbox[3] - last_bbox[1] - last_bbox[3]) / 2
+        return (dx * dx + dy * dy) ** 0.5 <= self.max_speed_px * (frame_num - last_frame_num)
+
+    def _emit(self, last_frame_num, emitted):
+        """Smooth the kept frames backwards from the newest one and emit those up to last_frame_num"""
+        if not self.steps:
+            return
+        smoothed_states = [self.steps[-1].state]
+        for step, next_step in zip(reversed(self.steps[:-1]), reversed(self.steps[1:])):
+            smoothed_states.append(step.state + step.gain @ (smoothed_states[-1] - next_step.predicted_state))
+        smoothed_states.reverse()
+
+        number_of_steps = 0
+        for step, smoothed_state in zip(self.steps, smoothed_states):
+            if step.frame_num > last_frame_num:
+                break
+            number_of_steps += 1
+            # Frames without a detection are only filled once the ball was found again after them
+            unconfirmed = self.last_accepted_frame == self.start_frame
+            if unconfirmed or (not step.measured and step.frame_num > self.last_accepted_frame):
+                emitted.append((step.frame_num, None))
+                continue
+            cx, cy = smoothed_state[0].tolist()
+            width, height = step.size
+            emitted.append((step.frame_num, [cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2]))
+        del self.steps[:number_of_steps]
@@ -1,38 +1,56 @@
-from ultralytics import YOLO 
 import cv2
 import pickle
 import pandas as pd
+import numpy as np
 import math
+from .tracks import Tracks
+from .shot_detector import find_ball_hit_frames
+from .ball_kalman_filter import BallKalmanFilter
 
 class BallTracker:
-    def __init__(self,model_path):
+    def __init__(self,model_path, cache=None, conf=0.15, imgsz=640):
+        # ultralytics is imported here, so trackers (Tracks, ShotDetector, ...) can be
+        # imported by drawing and statistics code without the YOLO stack
+        from ultralytics import YOLO
+        self.model_path = model_path
         self.model = YOLO(model_path)
+        self.inference_params = {'conf': conf, 'imgsz': imgsz}
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, config, cache=None):
+        return cls(config.ball_model_path, cache=cache, conf=config.ball_conf, imgsz=config.ball_imgsz)
+
+    def _to_ball_tracks(self, ball_positions):
+        if isinstance(ball_positions, Tracks):
+            return ball_positions
+        return Tracks.from_detections(ball_positions, track_ids=[1])
 
     def smooth_ball_positions(self, ball_positions, max_jump_px=200, alpha=0.4):
-        """Smooth ball positions and remove outlier jumps"""
-        smoothed = []
+        """
+        Smooth ball positions and remove outlier jumps.
+        Accepts Tracks or a list of dicts and returns the same representation.
+        """
+        ball_tracks = self._to_ball_tracks(ball_positions)
+        smoothed_tracks = Tracks.empty(len(ball_tracks), ball_tracks.track_ids)
+        smoothed_boxes = smoothed_tracks.get_track(1)
+        smoothed_valid = smoothed_tracks.valid[:, 0]
+
         prev_center = None
         prev_bbox = None
         consecutive_missing = 0
         max_consecutive_missing = 2
         
-        for det in ball_positions:
-            if not det or 1 not in det:
+        # Plain Python floats are much faster than NumPy scalars in this sequential loop
+        boxes = ball_tracks.get_track(1).tolist()
+        valid = ball_tracks.valid[:, 0].tolist()
+        for frame_num, (bbox, is_valid) in enumerate(zip(boxes, valid)):
+            if not is_valid:
                 consecutive_missing += 1
                 if consecutive_missing <= max_consecutive_missing and prev_bbox is not None:
                     # Keep using previous bbox for very short gaps
-                    smoothed.append({1: prev_bbox})
-                else:
-                    smoothed.append(det)
-                continue
-            
-            bbox = det[1]
-            if not bbox or len(bbox) != 4:
-                consecutive_missing += 1
-                if consecutive_missing <= max_consecutive_missing and prev_bbox is not None:
-                    smoothed.append({1: prev_bbox})
-                else:
-                    smoothed.append(det)
+                    smoothed_boxes[frame_num] = prev_bbox
+                    smoothed_valid[frame_num] = True
                 continue
             
             consecutive_missing = 0
@@ -47,12 +65,9 @@ class BallTracker:
                 
                 if dist > max_jump_px:
                     # Skip extreme outlier, use previous bbox
-                    if prev_bbox is not None:
-                        smoothed.append({1: prev_bbox})
-                        continue
-                    else:
-                        smoothed.append({})
-                        continue
+                    smoothed_boxes[frame_num] = prev_bbox
+                    smoothed_valid[frame_num] = True
+                    continue
                 
                 # Gentle EMA smoothing - let ball move naturally
                 cx = alpha * cx + (1 - alpha) * prev_center[0]
@@ -64,57 +79,64 @@ class BallTracker:
             
             prev_center = (cx, cy)
             prev_bbox = bbox
-            smoothed.append({1: bbox})
+            smoothed_boxes[frame_num] = bbox
+            smoothed_valid[frame_num] = True
         
-        return smoothed
+        if isinstance(ball_positions, Tracks):
+            return smoothed_tracks
+        return smoothed_tracks.to_detections()
+
+    def filter_ball_positions(self, ball_positions, **filter_params):
+        """
+        Gate outliers, fill short gaps and smooth with BallKalmanFilter in one pass.
+        Accepts Tracks or a list of dicts and returns the same representation; frames of
+        long gaps stay missing.
+        """
+        ball_tracks = BallKalmanFilter(**filter_params).filter_tracks(self._to_ball_tracks(ball_positions))
+
+        if isinstance(ball_positions, Tracks):
+            return ball_tracks
+        return ball_tracks.to_detections()
 
     def interpolate_ball_positions(self, ball_positions):
-        ball_positions = [x.get(1,[]) for x in ball_positions]
-        # convert the list into pandas dataframe
-        df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
-
-        # interpolate the missing values
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill()
-
-        ball_positions = [{1:x} for x in df_ball_positions.to_numpy().tolist()]
-
-        return ball_positions
-
-    def get_ball_shot_frames(self,ball_positions):
-        ball_positions = [x.get(1,[]) for x in ball_positions]
-        # convert the list into pandas dataframe
+        """
+        Fill missing ball positions by linear interpolation on the track array.
+        Accepts Tracks or a list of dicts and returns the same representation.
+        """
+        ball_tracks = self._to_ball_tracks(ball_positions).interpolate()
+
+        if isinstance(ball_positions, Tracks):
+            return ball_tracks
+        return ball_tracks.to_detections()
+
+    def get_ball_shot_frames(self,ball_positions, minimum_change_frames_for_hit=25, lookahead_frames=None, rolling_window=5):
+        ball_positions = self._to_ball_tracks(ball_positions).get_track(1).astype(np.float64)
+        # convert the array into pandas dataframe
         df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
 
-        df_ball_positions['ball_hit'] = 0
-
         df_ball_positions['mid_y'] = (df_ball_positions['y1'] + df_ball_positions['y2'])/2
-        df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
+        df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=rolling_window, min_periods=1, center=False).mean()
         df_ball_positions['delta_y'] = df_ball_positions['mid_y_rolling_mean'].diff()
-        minimum_change_frames_for_hit = 25
-        for i in range(1,len(df_ball_positions)- int(minimum_change_frames_for_hit*1.2) ):
-            negative_position_change = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[i+1] <0
-            positive_position_change = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[i+1] >0
-
-            if negative_position_change or positive_position_change:
-                change_count = 0 
-                for change_frame in range(i+1, i+int(minimum_change_frames_for_hit*1.2)+1):
-                    negative_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[change_frame] <0
-                    positive_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[change_frame] >0
-
-                    if negative_position_change and negative_position_change_following_frame:
-                        change_count+=1
-                    elif positive_position_change and positive_position_change_following_frame:
-                        change_count+=1
-            
-                if change_count>minimum_change_frames_for_hit-1:
-                    df_ball_positions.loc[i, 'ball_hit'] = 1
 
-        frame_nums_with_ball_hits = df_ball_positions[df_ball_positions['ball_hit']==1].index.tolist()
+        frame_nums_with_ball_hits = find_ball_hit_frames(df_ball_positions['delta_y'].to_numpy(),
+                                                         minimum_change_frames_for_hit,
+                                                         lookahead_frames)
 
         return frame_nums_with_ball_hits
 
-    def detect_frames(self,frames, read_from_stub=False, stub_path=None):
+    def get_cache_key(self, video_hash):
+        return self.cache.make_key('ball_detections', video_hash, self.model_path, self.inference_params)
+
+    def load_cached_detections(self, video_hash):
+        if self.cache is None:
+            return None
+        return self.cache.load_detections(self.get_cache_key(video_hash))
+
+    def save_cached_detections(self, video_hash, ball_detections):
+        if self.cache is not None:
+            self.cache.save_detections(self.get_cache_key(video_hash), ball_detections)
+
+    def detect_frames(self,frames, read_from_stub=False, stub_path=None, batch_size=1, video_hash=None, progress_callback=None):
         ball_detections = []
 
         if read_from_stub and stub_path is not None:
@@ -122,19 +144,45 @@ class BallTracker:
                 ball_detections = pickle.load(f)
             return ball_detections
 
+        # frames is the whole video identified by video_hash, so the cache can answer for it
+        if video_hash is not None:
+            cached_detections = self.load_cached_detections(video_hash)
+            if cached_detections is not None:
+                return cached_detections
+
+        # Send batch_size frames per model call; frames may be any iterable
+        # progress_callback(stage, current, total) runs after every batch, total is None for generators
+        total = len(frames) if hasattr(frames, '__len__') else None
+        batch = []
         for frame in frames:
-            player_dict = self.detect_frame(frame)
-            ball_detections.append(player_dict)
+            batch.append(frame)
+            if len(batch) == batch_size:
+                ball_detections.extend(self.detect_batch(batch))
+                batch = []
+                if progress_callback is not None:
+                    progress_callback('ball_detection', len(ball_detections), total)
+        if batch:
+            ball_detections.extend(self.detect_batch(batch))
+            if progress_callback is not None:
+                progress_callback('ball_detection', len(ball_detections), total)
         
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
                 pickle.dump(ball_detections, f)
+
+        if video_hash is not None:
+            self.save_cached_detections(video_hash, ball_detections)
         
         return ball_detections
 
     def detect_frame(self,frame):
-        results = self.model.predict(frame,conf=0.15)[0]
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        results = self.model.predict(frames, **self.inference_params)
+        return [self._get_ball_dict(result) for result in results]
 
+    def _get_ball_dict(self, results):
         ball_dict = {}
         for box in results.boxes:
             result = box.xyxy.tolist()[0]
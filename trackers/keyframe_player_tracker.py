@@ -0,0 +1,215 @@
+import cv2
+import numpy as np
+
+
+class KeyframePlayerTracker:
+    """
+    Runs the PlayerTracker detector only on keyframes and carries the player boxes to
+    the frames in between with sparse optical flow. The keyframe interval adapts:
+    it grows while flow-propagated boxes match the next detection and players move
+    little, and falls back to min_interval when boxes drift, tracks are lost or the
+    detector's confidence drops. detect_frames returns the same {track_id: bbox}
+    dicts as PlayerTracker, so choose_and_filter_players works unchanged.
+    """
+    def __init__(self, player_tracker, min_interval=1, max_interval=8, max_drift_px=12.0,
+                 max_motion_px=48.0, min_confidence=0.5, flow_scale=0.5, min_tracked_ratio=0.5,
+                 max_back_error_px=1.0):
+        self.player_tracker = player_tracker
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # Largest acceptable distance between a propagated box and the next detection
+        self.max_drift_px = max_drift_px
+        # Largest distance boxes are carried by flow before the detector runs again
+        self.max_motion_px = max_motion_px
+        self.min_confidence = min_confidence
+        self.flow_scale = flow_scale
+        self.min_tracked_ratio = min_tracked_ratio
+        # Forward-backward flow error, in flow_scale pixels, above which a point counts as lost
+        self.max_back_error_px = max_back_error_px
+
+        self.reset_propagation()
+
+    @property
+    def cache(self):
+        return self.player_tracker.cache
+
+    @cache.setter
+    def cache(self, cache):
+        self.player_tracker.cache = cache
+
+    @property
+    def model_path(self):
+        return self.player_tracker.model_path
+
+    def __getattr__(self, name):
+        # choose_and_filter_players, draw_bboxes, ... come from the wrapped tracker
+        if name == 'player_tracker':
+            raise AttributeError(name)
+        return getattr(self.player_tracker, name)
+
+    def get_params(self):
+        return {
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'max_drift_px': self.max_drift_px,
+            'max_motion_px': self.max_motion_px,
+            'min_confidence': self.min_confidence,
+            'flow_scale': self.flow_scale,
+            'min_tracked_ratio': self.min_tracked_ratio,
+            'max_back_error_px': self.max_back_error_px,
+        }
+
+    def get_cache_key(self, video_hash):
+        params = dict(self.player_tracker.inference_params, keyframes=self.get_params())
+        return self.cache.make_key('player_detections', video_hash, self.model_path, params)
+
+    def load_cached_detections(self, video_hash):
+        if self.cache is None:
+            return None
+        return self.cache.load_detections(self.get_cache_key(video_hash))
+
+    def save_cached_detections(self, video_hash, player_detections):
+        if self.cache is not None:
+            self.cache.save_detections(self.get_cache_key(video_hash), player_detections)
+
+    def reset_propagation(self):
+        self.player_dict = None
+        self.player_ids = []
+        self.previous_gray = None
+        self.interval = self.min_interval
+        self.frames_since_keyframe = 0
+        # Distance moved since the last keyframe, in full resolution pixels
+        self.motion_since_keyframe = 0.0
+        self.keyframes = 0
+        self.frames = 0
+
+    def reset(self):
+        """Start a new video"""
+        self.player_tracker.reset()
+        self.reset_propagation()
+
+    def _get_flow_gray(self, frame):
+        small_frame = cv2.resize(frame, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+
+    def _get_box_points(self, bbox):
+        """4x4 grid over the upper body, where the texture moves with the box"""
+        x1, y1, x2, y2 = bbox
+        xs = np.linspace(x1 + 0.25 * (x2 - x1), x2 - 0.25 * (x2 - x1), 4)
+        ys = np.linspace(y1 + 0.15 * (y2 - y1), y1 + 0.6 * (y2 - y1), 4)
+        return np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+
+    def _propagate(self, previous_gray, gray):
+        """
+        Move every box by the median flow of its points. Returns the moved player dict
+        and the largest displacement of the players' boxes, or None when too many boxes
+        were lost.
+        """
+        track_ids = list(self.player_dict)
+        if not track_ids:
+            return {}, 0.0
+        points = np.concatenate([self._get_box_points(self.player_dict[track_id]) for track_id in track_ids])
+        points = (points * self.flow_scale).astype(np.float32).reshape(-1, 1, 2)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, points, None,
+                                                          winSize=(21, 21), maxLevel=3)
+        if next_points is None:
+            return None
+        # Forward-backward check: points that do not flow back to where they started
+        # are mismatches, e.g. after a camera cut
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, previous_gray, next_points, None,
+                                                               winSize=(21, 21), maxLevel=3)
+        back_error = np.linalg.norm((back_points - points).reshape(-1, 2), axis=1)
+        tracked = ((status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (back_error < self.max_back_error_px))
+        tracked = tracked.reshape(len(track_ids), -1)
+        displacements = (next_points - points).reshape(len(track_ids), -1, 2) / self.flow_scale
+
+        player_dict = {}
+        max_displacement = 0.0
+        for track_id, box_displacements, box_tracked in zip(track_ids, displacements, tracked):
+            # A box whose points were mostly lost is dropped, like a missed detection
+            if box_tracked.mean() < self.min_tracked_ratio:
+                continue
+            dx, dy = np.median(box_displacements[box_tracked], axis=0).tolist()
+            x1, y1, x2, y2 = self.player_dict[track_id]
+            player_dict[track_id] = [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+            if track_id in self.player_ids:
+                max_displacement = max(max_displacement, (dx * dx + dy * dy) ** 0.5)
+
+        if len(player_dict) < self.min_tracked_ratio * len(track_ids):
+            return None
+        return player_dict, max_displacement
+
+    def _get_drift(self, propagated_dict, detected_dict, track_ids):
+        """Largest center distance between propagated and detected boxes of track_ids"""
+        drift = 0.0
+        for track_id in track_ids:
+            if track_id not in propagated_dict or track_id not in detected_dict:
+                continue
+            bbox, detected_bbox = propagated_dict[track_id], detected_dict[track_id]
+            dx = (bbox[0] + bbox[2] - detected_bbox[0] - detected_bbox[2]) / 2
+            dy = (bbox[1] + bbox[3] - detected_bbox[1] - detected_bbox[3]) / 2
+            drift = max(drift, (dx * dx + dy * dy) ** 0.5)
+        return drift
+
+    def _update_interval(self, propagated_dict, detected_dict, confidences):
+        # The two most confident detections stand in for the players: spectators and
+        # ball kids come and go, and should not decide the interval
+        player_ids = sorted(confidences, key=confidences.get, reverse=True)[:2]
+        previous_player_ids, self.player_ids = self.player_ids, player_ids
+
+        if propagated_dict is None:
+            # First keyframe, or flow lost the players
+            self.interval = self.min_interval
+            return
+
+        lost_players = any(track_id not in detected_dict for track_id in previous_player_ids)
+        low_confidence = any(confidences[track_id] < self.min_confidence for track_id in player_ids)
+        drift = self._get_drift(propagated_dict, detected_dict, previous_player_ids)
+
+        if lost_players or low_confidence or drift > self.max_drift_px:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval + 1, self.max_interval)
+
+        # Fast motion shortens the interval: boxes should not travel more than
+        # max_motion_px on flow alone
+        if self.frames_since_keyframe > 0 and self.motion_since_keyframe > 0:
+            motion_per_frame = self.motion_since_keyframe / self.frames_since_keyframe
+            self.interval = max(self.min_interval, min(self.interval, int(self.max_motion_px / motion_per_frame)))
+
+    def detect_frame(self, frame):
+        gray = self._get_flow_gray(frame)
+
+        propagated = None
+        if self.player_dict is not None and self.previous_gray is not None:
+            propagated = self._propagate(self.previous_gray, gray)
+
+        if propagated is not None and self.frames_since_keyframe + 1 < self.interval:
+            player_dict, displacement = propagated
+            self.frames_since_keyframe += 1
+            self.motion_since_keyframe += displacement
+        else:
+            if propagated is not None:
+                # Count the motion up to this keyframe before the interval is recomputed
+                self.frames_since_keyframe += 1
+                self.motion_since_keyframe += propagated[1]
+            player_dict, confidences = self.player_tracker.detect_batch_with_confidences([frame])[0]
+            self._update_interval(None if propagated is None else propagated[0], player_dict, confidences)
+            self.frames_since_keyframe = 0
+            self.motion_since_keyframe = 0.0
+            self.keyframes += 1
+
+        self.player_dict = player_dict
+        self.previous_gray = gray
+        self.frames += 1
+        return {track_id: list(bbox) for track_id, bbox in player_dict.items()}
+
+    def detect_frames(self, frames, batch_size=1, progress_callback=None):
+        """Player dicts for the next frames; batch_size is ignored since keyframes are chosen one by one"""
+        total = len(frames) if hasattr(frames, '__len__') else None
+        player_detections = []
+        for frame in frames:
+            player_detections.append(self.detect_frame(frame))
+        if progress_callback is not None:
+            progress_callback('player_detection', len(player_detections), total)
+        return player_detections
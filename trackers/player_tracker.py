@@ -1,4 +1,3 @@
-from ultralytics import YOLO 
 import cv2
 import pickle
 import sys
@@ -7,8 +6,24 @@ sys.path.append('../')
 from utils import measure_distance, get_center_of_bbox
 
 class PlayerTracker:
-    def __init__(self,model_path):
+    def __init__(self,model_path, cache=None, imgsz=640):
+        # ultralytics is imported here, so trackers (Tracks, ShotDetector, ...) can be
+        # imported by drawing and statistics code without the YOLO stack
+        from ultralytics import YOLO
+        self.model_path = model_path
         self.model = YOLO(model_path)
+        self.inference_params = {'imgsz': imgsz}
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, config, cache=None):
+        return cls(config.player_model_path, cache=cache, imgsz=config.player_imgsz)
+
+    def reset(self):
+        """Start a new video: drop the ByteTrack state that model.track(persist=True) keeps between calls"""
+        predictor = getattr(self.model, 'predictor', None)
+        for tracker in getattr(predictor, 'trackers', None) or []:
+            tracker.reset()
 
     def _get_court_roi(self, court_keypoints, pad_ratio=0.05):
         """Get court ROI from keypoints with padding"""
@@ -32,19 +47,26 @@ class PlayerTracker:
         return x >= x1 and x <= x2 and y >= y1 and y <= y2
 
     def choose_and_filter_players(self, court_keypoints, player_detections):
-        """Filter and consistently remap players to ID 1 (bottom) and 2 (top)"""
-        roi = self._get_court_roi(court_keypoints, pad_ratio=0.05)
+        """
+        Filter and consistently remap players to ID 1 (bottom) and 2 (top).
+        court_keypoints is one keypoint set, or an (n_frames, 28) array with one set per frame.
+        """
         min_area = 2000  # Minimum bbox area to filter out small detections
-        
-        # Get court center Y for better filtering
-        pts = np.array(court_keypoints).reshape(-1, 2)
-        court_center_y = pts[:, 1].mean()
-        court_height = pts[:, 1].max() - pts[:, 1].min()
+
+        # Court ROI, center Y and height of every frame
+        pts = np.asarray(court_keypoints, dtype=np.float64).reshape(-1, 14, 2)
+        if len(pts) == 1:
+            pts = np.broadcast_to(pts, (len(player_detections), 14, 2))
+        min_xy, max_xy = pts.min(axis=1), pts.max(axis=1)
+        pad_xy = (max_xy - min_xy) * 0.05
+        rois = np.concatenate([min_xy - pad_xy, max_xy + pad_xy], axis=1).tolist()
+        court_center_ys = pts[:, :, 1].mean(axis=1).tolist()
+        court_heights = (max_xy[:, 1] - min_xy[:, 1]).tolist()
         
         filtered_detections = []
         last_valid = None
         
-        for player_dict in player_detections:
+        for player_dict, roi, court_center_y, court_height in zip(player_detections, rois, court_center_ys, court_heights):
             # Filter by ROI, area, and position
             valid_players = []
             for track_id, bbox in player_dict.items():
@@ -107,7 +129,19 @@ class PlayerTracker:
         return chosen_players
 
 
-    def detect_frames(self,frames, read_from_stub=False, stub_path=None):
+    def get_cache_key(self, video_hash):
+        return self.cache.make_key('player_detections', video_hash, self.model_path, self.inference_params)
+
+    def load_cached_detections(self, video_hash):
+        if self.cache is None:
+            return None
+        return self.cache.load_detections(self.get_cache_key(video_hash))
+
+    def save_cached_detections(self, video_hash, player_detections):
+        if self.cache is not None:
+            self.cache.save_detections(self.get_cache_key(video_hash), player_detections)
+
+    def detect_frames(self,frames, read_from_stub=False, stub_path=None, batch_size=1, video_hash=None, progress_callback=None):
         player_detections = []
 
         if read_from_stub and stub_path is not None:
@@ -115,18 +149,61 @@ class PlayerTracker:
                 player_detections = pickle.load(f)
             return player_detections
 
+        # frames is the whole video identified by video_hash, so the cache can answer for it
+        if video_hash is not None:
+            cached_detections = self.load_cached_detections(video_hash)
+            if cached_detections is not None:
+                return cached_detections
+
+        # Send batch_size frames per model call; frames may be any iterable
+        # progress_callback(stage, current, total) runs after every batch, total is None for generators
+        total = len(frames) if hasattr(frames, '__len__') else None
+        batch = []
         for frame in frames:
-            player_dict = self.detect_frame(frame)
-            player_detections.append(player_dict)
+            batch.append(frame)
+            if len(batch) == batch_size:
+                player_detections.extend(self.detect_batch(batch))
+                batch = []
+                if progress_callback is not None:
+                    progress_callback('player_detection', len(player_detections), total)
+        if batch:
+            player_detections.extend(self.detect_batch(batch))
+            if progress_callback is not None:
+                progress_callback('player_detection', len(player_detections), total)
         
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
                 pickle.dump(player_detections, f)
+
+        if video_hash is not None:
+            self.save_cached_detections(video_hash, player_detections)
         
         return player_detections
 
     def detect_frame(self,frame):
-        results = self.model.track(frame, persist=True)[0]
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        # ByteTrack updates its single persisted tracker once per result, in frame order,
+        # so the track IDs are the same as when tracking frame by frame
+        results = self.model.track(frames, persist=True, **self.inference_params)
+        return [self._get_player_dict(result) for result in results]
+
+    def detect_batch_with_confidences(self, frames):
+        """Like detect_batch, plus a {track_id: confidence} dict per frame"""
+        results = self.model.track(frames, persist=True, **self.inference_params)
+        return [(self._get_player_dict(result), self._get_player_confidences(result)) for result in results]
+
+    def _get_player_confidences(self, results):
+        id_name_dict = results.names
+
+        confidences = {}
+        for box in results.boxes:
+            if id_name_dict[box.cls.tolist()[0]] == "person":
+                confidences[int(box.id.tolist()[0])] = box.conf.tolist()[0]
+        return confidences
+
+    def _get_player_dict(self, results):
         id_name_dict = results.names
 
         player_dict = {}
@@ -0,0 +1,133 @@
+class RoiBallTracker:
+    """
+    Runs the BallTracker model on a small crop around the predicted ball position
+    instead of the whole frame. The crop is passed at native resolution, so the ball
+    keeps all its pixels while the model sees a fraction of the image. The position is
+    predicted from the last two detections at constant velocity. After a miss the crop
+    doubles, and after max_misses misses in a row (or every full_scan_interval frames)
+    the whole frame is scanned as before. detect_frames returns the same {1: bbox}
+    dicts as BallTracker.
+    """
+    def __init__(self, ball_tracker, roi_size=256, max_misses=2, full_scan_interval=48):
+        self.ball_tracker = ball_tracker
+        # Side of the square crop, a multiple of the model stride
+        self.roi_size = roi_size
+        self.max_misses = max_misses
+        # Scan the full frame at least this often, so a false positive cannot hold the
+        # search away from the real ball; 0 disables it
+        self.full_scan_interval = full_scan_interval
+
+        self.reset()
+
+    @property
+    def cache(self):
+        return self.ball_tracker.cache
+
+    @cache.setter
+    def cache(self, cache):
+        self.ball_tracker.cache = cache
+
+    @property
+    def model_path(self):
+        return self.ball_tracker.model_path
+
+    def __getattr__(self, name):
+        # interpolate_ball_positions, get_ball_shot_frames, ... come from the wrapped tracker
+        if name == 'ball_tracker':
+            raise AttributeError(name)
+        return getattr(self.ball_tracker, name)
+
+    def get_params(self):
+        return {
+            'roi_size': self.roi_size,
+            'max_misses': self.max_misses,
+            'full_scan_interval': self.full_scan_interval,
+        }
+
+    def get_cache_key(self, video_hash):
+        params = dict(self.ball_tracker.inference_params, roi_search=self.get_params())
+        return self.cache.make_key('ball_detections', video_hash, self.model_path, params)
+
+    def load_cached_detections(self, video_hash):
+        if self.cache is None:
+            return None
+        return self.cache.load_detections(self.get_cache_key(video_hash))
+
+    def save_cached_detections(self, video_hash, ball_detections):
+        if self.cache is not None:
+            self.cache.save_detections(self.get_cache_key(video_hash), ball_detections)
+
+    def reset(self):
+        """Start a new video"""
+        # (frame_num, center) of the last two detections
+        self.detections = []
+        self.misses = 0
+        self.frames_since_full_scan = 0
+        self.frame_num = 0
+        self.full_scans = 0
+        self.roi_scans = 0
+
+    def _predict_center(self):
+        """Constant velocity prediction of the ball center in the current frame"""
+        last_frame_num, (x, y) = self.detections[-1]
+        frames_ahead = self.frame_num - last_frame_num
+        if len(self.detections) < 2:
+            return x, y
+        previous_frame_num, (previous_x, previous_y) = self.detections[-2]
+        frames_between = last_frame_num - previous_frame_num
+        return (x + (x - previous_x) / frames_between * frames_ahead,
+                y + (y - previous_y) / frames_between * frames_ahead)
+
+    def _get_roi(self, frame_shape, center, roi_size):
+        """Square crop of roi_size around center, shifted to lie inside the frame"""
+        height, width = frame_shape[:2]
+        x1 = int(min(max(center[0] - roi_size / 2, 0), width - roi_size))
+        y1 = int(min(max(center[1] - roi_size / 2, 0), height - roi_size))
+        return x1, y1, x1 + roi_size, y1 + roi_size
+
+    def _detect_roi(self, frame, roi):
+        x1, y1, x2, y2 = roi
+        crop = frame[y1:y2, x1:x2]
+        params = dict(self.ball_tracker.inference_params, imgsz=x2 - x1)
+        results = self.ball_tracker.model.predict([crop], **params)
+        ball_dict = self.ball_tracker._get_ball_dict(results[0])
+        return {track_id: [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]
+                for track_id, (bx1, by1, bx2, by2) in ball_dict.items()}
+
+    def _use_full_frame(self, frame_shape, roi_size):
+        if not self.detections or self.misses >= self.max_misses:
+            return True
+        if self.full_scan_interval and self.frames_since_full_scan >= self.full_scan_interval:
+            return True
+        # A crop as large as the frame saves nothing
+        return roi_size > min(frame_shape[:2])
+
+    def detect_frame(self, frame):
+        roi_size = self.roi_size * 2 ** self.misses
+        if self._use_full_frame(frame.shape, roi_size):
+            ball_dict = self.ball_tracker.detect_frame(frame)
+            self.frames_since_full_scan = 0
+            self.full_scans += 1
+        else:
+            ball_dict = self._detect_roi(frame, self._get_roi(frame.shape, self._predict_center(), roi_size))
+            self.frames_since_full_scan += 1
+            self.roi_scans += 1
+
+        if 1 in ball_dict:
+            x1, y1, x2, y2 = ball_dict[1]
+            self.detections = self.detections[-1:] + [(self.frame_num, ((x1 + x2) / 2, (y1 + y2) / 2))]
+            self.misses = 0
+        else:
+            self.misses += 1
+        self.frame_num += 1
+        return ball_dict
+
+    def detect_frames(self, frames, batch_size=1, progress_callback=None):
+        """Ball dicts for the next frames; batch_size is ignored since each crop depends on the previous frame"""
+        total = len(frames) if hasattr(frames, '__len__') else None
+        ball_detections = []
+        for frame in frames:
+            ball_detections.append(self.detect_frame(frame))
+        if progress_callback is not None:
+            progress_callback('ball_detection', len(ball_detections), total)
+        return ball_detections
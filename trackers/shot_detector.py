@@ -0,0 +1,89 @@
+from collections import deque
+import math
+import numpy as np
+
+
+def find_ball_hit_frames(delta_y, minimum_change_frames_for_hit=25, lookahead_frames=None):
+    """
+    Vectorized hit detection over the per-frame change of the ball's vertical position.
+    A frame i is a hit when delta_y changes sign between i and i+1 and at least
+    minimum_change_frames_for_hit of the following lookahead_frames frames keep the new sign.
+    """
+    if lookahead_frames is None:
+        lookahead_frames = int(minimum_change_frames_for_hit*1.2)
+    delta_y = np.asarray(delta_y, dtype=np.float64)
+    number_of_frames = len(delta_y)
+    if number_of_frames - lookahead_frames <= 1:
+        return []
+
+    # NaN compares False in both masks, like the scalar comparisons it replaces
+    moving_down = delta_y < 0
+    moving_up = delta_y > 0
+    down_counts = np.concatenate(([0], np.cumsum(moving_down)))
+    up_counts = np.concatenate(([0], np.cumsum(moving_up)))
+
+    frame_nums = np.arange(1, number_of_frames - lookahead_frames)
+    negative_position_change = moving_up[frame_nums] & moving_down[frame_nums+1]
+    positive_position_change = moving_down[frame_nums] & moving_up[frame_nums+1]
+
+    # Number of frames in [i+1, i+lookahead_frames] that keep the new direction
+    down_in_window = down_counts[frame_nums+lookahead_frames+1] - down_counts[frame_nums+1]
+    up_in_window = up_counts[frame_nums+lookahead_frames+1] - up_counts[frame_nums+1]
+
+    ball_hit = ((negative_position_change & (down_in_window >= minimum_change_frames_for_hit)) |
+                (positive_position_change & (up_in_window >= minimum_change_frames_for_hit)))
+    return frame_nums[ball_hit].tolist()
+
+
+class ShotDetector:
+    """
+    Streaming counterpart of find_ball_hit_frames.
+    Feed one ball bbox (or None) per frame with update(); a hit at frame i is emitted
+    once frame i+lookahead_frames has arrived. Work per frame is O(1).
+    """
+    def __init__(self, minimum_change_frames_for_hit=25, lookahead_frames=None, rolling_window=5):
+        if lookahead_frames is None:
+            lookahead_frames = int(minimum_change_frames_for_hit*1.2)
+        self.minimum_change_frames_for_hit = minimum_change_frames_for_hit
+        self.lookahead_frames = lookahead_frames
+        self.rolling_window = rolling_window
+
+        self.frame_num = -1
+        self.mid_ys = deque(maxlen=rolling_window)
+        self.previous_rolling_mean = math.nan
+        # delta_y of frames [frame_num - lookahead_frames, frame_num] and their sign counts
+        self.delta_ys = deque()
+        self.down_count = 0
+        self.up_count = 0
+
+    def update(self, bbox):
+        self.frame_num += 1
+
+        # Rolling mean of mid_y that skips missing values, like pandas rolling(min_periods=1)
+        mid_y = (bbox[1] + bbox[3])/2 if bbox is not None and len(bbox) == 4 else math.nan
+        self.mid_ys.append(mid_y)
+        present = [y for y in self.mid_ys if not math.isnan(y)]
+        rolling_mean = sum(present)/len(present) if present else math.nan
+        delta_y = rolling_mean - self.previous_rolling_mean
+        self.previous_rolling_mean = rolling_mean
+
+        self.delta_ys.append(delta_y)
+        self.down_count += delta_y < 0
+        self.up_count += delta_y > 0
+        if len(self.delta_ys) > self.lookahead_frames + 1:
+            removed = self.delta_ys.popleft()
+            self.down_count -= removed < 0
+            self.up_count -= removed > 0
+
+        candidate_frame = self.frame_num - self.lookahead_frames
+        if len(self.delta_ys) < self.lookahead_frames + 1 or candidate_frame < 1:
+            return []
+
+        candidate, following = self.delta_ys[0], self.delta_ys[1]
+        down_in_window = self.down_count - (candidate < 0)
+        up_in_window = self.up_count - (candidate > 0)
+        if candidate > 0 and following < 0 and down_in_window >= self.minimum_change_frames_for_hit:
+            return [candidate_frame]
+        if candidate < 0 and following > 0 and up_in_window >= self.minimum_change_frames_for_hit:
+            return [candidate_frame]
+        return []
@@ -0,0 +1,80 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_centers_of_bboxes, get_foot_positions, get_heights_of_bboxes
+
+class Tracks:
+    """
+    Columnar container for per-frame boxes of a fixed set of track ids.
+    boxes has shape (n_frames, n_ids, 4), float32 unless another dtype is asked for, and valid has shape (n_frames, n_ids);
+    invalid boxes are NaN so vectorized math propagates "missing" without branching.
+    """
+    def __init__(self, boxes, valid, track_ids):
+        self.boxes = boxes
+        self.valid = valid
+        self.track_ids = list(track_ids)
+
+    @classmethod
+    def empty(cls, number_of_frames, track_ids, dtype=np.float32):
+        boxes = np.full((number_of_frames, len(track_ids), 4), np.nan, dtype=dtype)
+        valid = np.zeros((number_of_frames, len(track_ids)), dtype=bool)
+        return cls(boxes, valid, track_ids)
+
+    @classmethod
+    def from_detections(cls, detections, track_ids=None, dtype=np.float32):
+        """Build from the list of {track_id: [x1, y1, x2, y2]} dicts produced by the trackers"""
+        if track_ids is None:
+            track_ids = sorted({track_id for detection_dict in detections for track_id in detection_dict})
+        tracks = cls.empty(len(detections), track_ids, dtype)
+        id_index = {track_id: index for index, track_id in enumerate(tracks.track_ids)}
+
+        for frame_num, detection_dict in enumerate(detections):
+            for track_id, bbox in detection_dict.items():
+                if track_id in id_index and bbox is not None and len(bbox) == 4:
+                    tracks.boxes[frame_num, id_index[track_id]] = bbox
+                    tracks.valid[frame_num, id_index[track_id]] = True
+        return tracks
+
+    def to_detections(self, start=0, end=None):
+        """Convert frames [start, end) back to the list of dicts format"""
+        detections = []
+        for boxes, valid in zip(self.boxes[start:end].tolist(), self.valid[start:end].tolist()):
+            detections.append({track_id: bbox for track_id, bbox, is_valid in zip(self.track_ids, boxes, valid) if is_valid})
+        return detections
+
+    def __len__(self):
+        return self.boxes.shape[0]
+
+    def copy(self):
+        return Tracks(self.boxes.copy(), self.valid.copy(), self.track_ids)
+
+    def get_track(self, track_id):
+        """(n_frames, 4) view of one track"""
+        return self.boxes[:, self.track_ids.index(track_id)]
+
+    def centers(self):
+        return get_centers_of_bboxes(self.boxes)
+
+    def foot_positions(self):
+        return get_foot_positions(self.boxes)
+
+    def heights(self):
+        return get_heights_of_bboxes(self.boxes)
+
+    def interpolate(self):
+        """
+        Linearly interpolate missing boxes of every track, holding the first and last
+        detection at the ends. Same result as pandas interpolate() followed by bfill().
+        """
+        interpolated = self.copy()
+        frame_nums = np.arange(len(self))
+        for id_index in range(len(self.track_ids)):
+            valid = self.valid[:, id_index]
+            if not valid.any() or valid.all():
+                continue
+            for coordinate in range(4):
+                interpolated.boxes[:, id_index, coordinate] = np.interp(frame_nums,
+                                                                        frame_nums[valid],
+                                                                        self.boxes[valid, id_index, coordinate].astype(np.float64))
+            interpolated.valid[:, id_index] = True
+        return interpolated
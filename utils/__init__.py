@@ -1,4 +1,9 @@
-from .video_utils import read_video, save_video
+from .video_utils import read_video, read_video_chunks, read_first_frame, get_video_frame_count, get_video_fps, open_video_writer, abort_video_writer, save_video, FFmpegVideoWriter
 from .bbox_utils import get_center_of_bbox, measure_distance, get_foot_position,get_closest_keypoint_index,get_height_of_bbox,measure_xy_distance,get_center_of_bbox
+from .bbox_utils import get_centers_of_bboxes, get_foot_positions, get_heights_of_bboxes, measure_distances
 from .conversions import convert_pixel_distance_to_meters, convert_meters_to_pixel_distance
-from .player_stats_drawer_utils import draw_player_stats
\ No newline at end of file
+from .player_stats_drawer_utils import draw_player_stats
+from .frame_compositor import FrameCompositor
+from .pipeline import StagePipeline
+from .detection_cache import DetectionCache
+from .track_file import get_track_file_path, build_track_columns, save_track_file, TrackFile, to_json_values
@@ -1,3 +1,5 @@
+import numpy as np
+
 def get_center_of_bbox(bbox):
     x1, y1, x2, y2 = bbox
     center_x = int((x1 + x2) / 2)
@@ -29,4 +31,25 @@ def measure_xy_distance(p1,p2):
     return abs(p1[0]-p2[0]), abs(p1[1]-p2[1])
 
 def get_center_of_bbox(bbox):
-    return (int((bbox[0]+bbox[2])/2),int((bbox[1]+bbox[3])/2))
\ No newline at end of file
+    return (int((bbox[0]+bbox[2])/2),int((bbox[1]+bbox[3])/2))
+
+# Vectorized versions of the helpers above. They take arrays of shape (..., 4) for boxes
+# and (..., 2) for points, and keep NaN for missing boxes instead of raising.
+def get_centers_of_bboxes(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float64)
+    return np.trunc(np.stack([(bboxes[..., 0] + bboxes[..., 2]) / 2,
+                              (bboxes[..., 1] + bboxes[..., 3]) / 2], axis=-1))
+
+def get_foot_positions(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float64)
+    return np.stack([np.trunc((bboxes[..., 0] + bboxes[..., 2]) / 2),
+                     bboxes[..., 3]], axis=-1)
+
+def get_heights_of_bboxes(bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float64)
+    return bboxes[..., 3] - bboxes[..., 1]
+
+def measure_distances(p1, p2):
+    p1 = np.asarray(p1, dtype=np.float64)
+    p2 = np.asarray(p2, dtype=np.float64)
+    return ((p1[..., 0] - p2[..., 0])**2 + (p1[..., 1] - p2[..., 1])**2)**0.5
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import tempfile
+from importlib.metadata import version
+import numpy as np
+
+# Bumped when the layout of the stored arrays changes, so old entries are never read
+CACHE_FORMAT_VERSION = 2
+
+
+class DetectionCache:
+    """
+    Content-addressed store for detection results.
+    Entries are keyed by the video (or image) content, the model weights and the
+    inference parameters, stored as compressed .npz arrays and evicted least
+    recently used first once the cache grows past max_size_bytes.
+    """
+    _weights_hashes = {}
+
+    def __init__(self, cache_dir, max_size_bytes=2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_file(path, block_size=1024 * 1024):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_image(image):
+        digest = hashlib.sha256(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_official_weights_identity(model_path):
+        """
+        Official ultralytics weights (yolov8x.pt, ...) that are not on disk yet are
+        downloaded by the library, so their identity is the asset name and library version.
+        Any other missing weights file is an error, since its content cannot be known.
+        """
+        name = os.path.basename(model_path)
+        try:
+            from ultralytics.utils.downloads import GITHUB_ASSETS_NAMES
+        except ImportError:
+            GITHUB_ASSETS_NAMES = ()
+        if name not in GITHUB_ASSETS_NAMES:
+            raise FileNotFoundError(f"Model weights not found: {model_path}")
+        return f"{name}@ultralytics=={version('ultralytics')}"
+
+    def hash_weights(self, model_path):
+        if not os.path.isfile(model_path):
+            return self.get_official_weights_identity(model_path)
+        stat = os.stat(model_path)
+        memo_key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._weights_hashes:
+            self._weights_hashes[memo_key] = self.hash_file(model_path)
+        return self._weights_hashes[memo_key]
+
+    def make_key(self, kind, content_hash, model_path, params):
+        key_data = json.dumps({
+            'format': CACHE_FORMAT_VERSION,
+            'kind': kind,
+            'content': content_hash,
+            'weights': self.hash_weights(model_path),
+            'params': params,
+        }, sort_keys=True)
+        return hashlib.sha256(key_data.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load_arrays(self, key):
+        path = self._entry_path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return arrays
+
+    def _write_entry(self, key, arrays):
+        # Write to a temporary file and rename so concurrent jobs never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_arrays(self, key, **arrays):
+        self._write_entry(key, arrays)
+        self.evict()
+
+    def save_many_arrays(self, entries):
+        """Save {key: {name: array}} entries and evict once, since eviction lists the whole cache directory"""
+        for key, arrays in entries.items():
+            self._write_entry(key, arrays)
+        if entries:
+            self.evict()
+
+    def load_detections(self, key):
+        # Boxes are stored as float64, so a cache hit returns exactly the detected values
+        arrays = self.load_arrays(key)
+        if arrays is None:
+            return None
+
+        detections = [{} for _ in range(int(arrays['number_of_frames']))]
+        for frame_num, track_id, bbox in zip(arrays['frame_nums'].tolist(),
+                                             arrays['track_ids'].tolist(),
+                                             arrays['bboxes'].tolist()):
+            detections[frame_num][track_id] = bbox
+        return detections
+
+    def save_detections(self, key, detections):
+        frame_nums, track_ids, bboxes = [], [], []
+        for frame_num, detection_dict in enumerate(detections):
+            for track_id, bbox in detection_dict.items():
+                frame_nums.append(frame_num)
+                track_ids.append(track_id)
+                bboxes.append(bbox)
+
+        self.save_arrays(key,
+                         number_of_frames=np.array(len(detections)),
+                         frame_nums=np.array(frame_nums, dtype=np.int32),
+                         track_ids=np.array(track_ids, dtype=np.int32),
+                         bboxes=np.array(bboxes, dtype=np.float64).reshape(-1, 4))
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
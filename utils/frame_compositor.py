@@ -0,0 +1,116 @@
+import numpy as np
+import cv2
+
+PLAYER_STATS_COLUMNS = [
+    'player_1_last_shot_speed', 'player_2_last_shot_speed',
+    'player_1_last_player_speed', 'player_2_last_player_speed',
+    'player_1_average_shot_speed', 'player_2_average_shot_speed',
+    'player_1_average_player_speed', 'player_2_average_player_speed',
+]
+
+class FrameCompositor:
+    """
+    Draws every overlay of a frame in one pass: player and ball boxes, court keypoints,
+    the mini court, the player stats panel and the frame number. Only the panel and mini
+    court regions are alpha-blended, against preallocated buffers, so each frame is
+    touched in a few small regions only.
+    The output is the same as PlayerTracker.draw_bboxes, BallTracker.draw_bboxes,
+    CourtLineDetector.draw_keypoints_on_video, MiniCourt.draw_mini_court with its player
+    and ball points, and draw_player_stats run one after another.
+    """
+    def __init__(self, player_tracks, ball_tracks, court_keypoints, player_stats=None,
+                 mini_court=None, player_mini_court_positions=None, ball_mini_court_positions=None,
+                 mini_court_trail_length=0, panel_width=350, panel_height=230, panel_alpha=0.5):
+        self.player_tracks = player_tracks
+        self.ball_tracks = ball_tracks
+        # One keypoint set for every frame, or an (n_frames, 28) array with one set per frame
+        self.court_keypoints = np.asarray(court_keypoints)
+        # Stats as an (n_frames, 8) array instead of DataFrame rows
+        self.player_stats = None if player_stats is None else player_stats[PLAYER_STATS_COLUMNS].to_numpy()
+
+        # Mini court with (n_frames, n_players, 2) player and (n_frames, 2) ball positions
+        self.mini_court = mini_court
+        self.player_mini_court_positions = player_mini_court_positions
+        self.ball_mini_court_positions = ball_mini_court_positions
+        self.mini_court_trail_length = mini_court_trail_length
+
+        self.panel_width = panel_width
+        self.panel_height = panel_height
+        self.panel_alpha = panel_alpha
+        # Black panel of the clipped panel size, allocated on the first frame
+        self.panel_buffer = None
+
+    def draw_frames(self, frames, start_frame=0):
+        """Draw a chunk of frames in place; frames[0] is frame start_frame of the video"""
+        for i, frame in enumerate(frames):
+            self.draw_frame(frame, start_frame + i)
+        return frames
+
+    def draw_frame(self, frame, frame_num):
+        self._draw_boxes(frame, self.player_tracks, frame_num, "Player ID", (0, 0, 255))
+        self._draw_boxes(frame, self.ball_tracks, frame_num, "Ball ID", (0, 255, 255))
+
+        keypoints = self.court_keypoints[frame_num] if self.court_keypoints.ndim == 2 else self.court_keypoints
+        self._draw_keypoints(frame, keypoints)
+
+        if self.mini_court is not None:
+            self.mini_court.draw_frame(frame, frame_num, self.player_mini_court_positions,
+                                       self.ball_mini_court_positions, self.mini_court_trail_length)
+
+        if self.player_stats is not None:
+            self._draw_player_stats(frame, self.player_stats[frame_num])
+
+        cv2.putText(frame, f"Frame: {frame_num}",(10,30),cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return frame
+
+    def _draw_boxes(self, frame, tracks, frame_num, label, color):
+        boxes = tracks.boxes[frame_num].tolist()
+        valid = tracks.valid[frame_num]
+        for j, track_id in enumerate(tracks.track_ids):
+            if not valid[j]:
+                continue
+            x1, y1, x2, y2 = boxes[j]
+            cv2.putText(frame, f"{label}: {track_id}",(int(x1),int(y1 -10 )),cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+
+    def _draw_keypoints(self, frame, keypoints):
+        keypoints = keypoints.tolist()
+        for i in range(0, len(keypoints), 2):
+            x = int(keypoints[i])
+            y = int(keypoints[i+1])
+            cv2.putText(frame, str(i//2), (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+            cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
+
+    def _blend_panel(self, frame, start_x, start_y, end_x, end_y):
+        """Shade the panel rectangle (inclusive corners, clipped to the frame) in place"""
+        roi = frame[max(start_y, 0):min(end_y + 1, frame.shape[0]), max(start_x, 0):min(end_x + 1, frame.shape[1])]
+        if roi.size == 0:
+            return
+        if self.panel_buffer is None or self.panel_buffer.shape != roi.shape:
+            self.panel_buffer = np.zeros_like(roi)
+        cv2.addWeighted(self.panel_buffer, self.panel_alpha, roi, 1 - self.panel_alpha, 0, roi)
+
+    def _draw_player_stats(self, frame, stats):
+        (player_1_shot_speed, player_2_shot_speed,
+         player_1_speed, player_2_speed,
+         avg_player_1_shot_speed, avg_player_2_shot_speed,
+         avg_player_1_speed, avg_player_2_speed) = stats.tolist()
+
+        start_x = frame.shape[1]-400
+        start_y = frame.shape[0]-500
+        self._blend_panel(frame, start_x, start_y, start_x+self.panel_width, start_y+self.panel_height)
+
+        text = "     Player 1     Player 2"
+        cv2.putText(frame, text, (start_x+80, start_y+30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        rows = [
+            ("Shot Speed", player_1_shot_speed, player_2_shot_speed),
+            ("Player Speed", player_1_speed, player_2_speed),
+            ("avg. S. Speed", avg_player_1_shot_speed, avg_player_2_shot_speed),
+            ("avg. P. Speed", avg_player_1_speed, avg_player_2_speed),
+        ]
+        for row_num, (label, player_1_value, player_2_value) in enumerate(rows):
+            y = start_y + 80 + 40*row_num
+            cv2.putText(frame, label, (start_x+10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+            text = f"{player_1_value:.1f} km/h    {player_2_value:.1f} km/h"
+            cv2.putText(frame, text, (start_x+130, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
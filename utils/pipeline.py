@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+
+# Marks the end of the stream in every queue
+_END = object()
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        # Blocked on an empty input queue (starved) or a full output queue (backpressure)
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def get_utilization(self, wall_seconds):
+        return self.busy_seconds / wall_seconds if wall_seconds > 0 else 0.0
+
+class StagePipeline:
+    """
+    Runs a source and a chain of stages in their own threads, connected by bounded
+    queues so a slow stage holds back the ones before it. Decoding, drawing and
+    inference release the GIL in OpenCV/torch, so throughput approaches the slowest
+    stage instead of the sum of all stages.
+    source is (name, iterable); stages are (name, function) called once per item in
+    order, each returning the item for the next stage. At most
+    (number of stages + 1) * (queue_size + 1) items are alive at once.
+    """
+    def __init__(self, source, stages, queue_size=1):
+        self.source_name, self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(self.source_name)] + [StageStats(name) for name, _ in stages]
+        self.wall_seconds = 0.0
+        self.stopped = threading.Event()
+        self.errors = []
+
+    def _put(self, output_queue, item, stats):
+        start = time.perf_counter()
+        while not self.stopped.is_set():
+            try:
+                output_queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.blocked_seconds += time.perf_counter() - start
+
+    def _get(self, input_queue, stats):
+        start = time.perf_counter()
+        item = _END
+        while not self.stopped.is_set():
+            try:
+                item = input_queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        stats.starved_seconds += time.perf_counter() - start
+        return item
+
+    def _fail(self, error):
+        self.errors.append(error)
+        self.stopped.set()
+
+    def _run_source(self, output_queue, stats):
+        iterator = None
+        try:
+            iterator = iter(self.source)
+            while not self.stopped.is_set():
+                start = time.perf_counter()
+                item = next(iterator, _END)
+                stats.busy_seconds += time.perf_counter() - start
+                if item is _END:
+                    break
+                stats.items += 1
+                self._put(output_queue, item, stats)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Generators release their resources (e.g. VideoCapture) even when stopped early
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            self._put(output_queue, _END, stats)
+
+    def _run_stage(self, function, input_queue, output_queue, stats):
+        try:
+            while True:
+                item = self._get(input_queue, stats)
+                if item is _END:
+                    break
+                start = time.perf_counter()
+                item = function(item)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+                if output_queue is not None:
+                    self._put(output_queue, item, stats)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            if output_queue is not None:
+                self._put(output_queue, _END, stats)
+
+    def run(self):
+        """Process the whole source; re-raises the first error of any stage"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0], self.stats[0]),
+                                    name=f"pipeline-{self.source_name}", daemon=True)]
+        for i, (name, function) in enumerate(self.stages):
+            output_queue = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(target=self._run_stage,
+                                            args=(function, queues[i], output_queue, self.stats[i + 1]),
+                                            name=f"pipeline-{name}", daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[0]
+        return self.stats
+
+    def format_report(self):
+        """One line with the utilization of every stage; the busiest one is the bottleneck"""
+        stage_reports = [f"{stats.name} {100 * stats.get_utilization(self.wall_seconds):.0f}%" for stats in self.stats]
+        bottleneck = max(self.stats, key=lambda stats: stats.busy_seconds)
+        return f"{self.wall_seconds:.1f}s wall, busy: {', '.join(stage_reports)} (bottleneck: {bottleneck.name})"
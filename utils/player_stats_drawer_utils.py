@@ -1,9 +1,12 @@
 import numpy as np
 import cv2
 
-def draw_player_stats(output_video_frames,player_stats):
+def draw_player_stats(output_video_frames,player_stats, start_frame=0):
+    # output_video_frames may be a chunk of the video that starts at start_frame
+    player_stats = player_stats.iloc[start_frame:start_frame+len(output_video_frames)]
 
-    for index, row in player_stats.iterrows():
+    for frame_num, row in player_stats.iterrows():
+        index = frame_num - start_frame
         player_1_shot_speed = row['player_1_last_shot_speed']
         player_2_shot_speed = row['player_2_last_shot_speed']
         player_1_speed = row['player_1_last_player_speed']
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Schema metadata key of the JSON with fps, shot frames and the player summaries
+TRACK_FILE_METADATA_KEY = b'tennis_analysis'
+
+
+def get_track_file_path(output_video_path):
+    """Track file written next to the output video"""
+    return os.path.splitext(output_video_path)[0] + '_tracks.parquet'
+
+
+def build_track_columns(player_tracks, ball_tracks, player_mini_court_positions, ball_mini_court_positions,
+                        ball_shot_frames, frame_stats):
+    """
+    One column per value and one row per frame: player and ball boxes, mini court
+    positions, shot frames and the StatsEngine table. Missing values are NaN.
+    """
+    number_of_frames = len(player_tracks)
+    columns = {'frame_num': np.arange(number_of_frames, dtype=np.int32)}
+    for id_index, track_id in enumerate(player_tracks.track_ids):
+        for coordinate_index, coordinate in enumerate(('x1', 'y1', 'x2', 'y2')):
+            columns[f'player_{track_id}_{coordinate}'] = player_tracks.boxes[:, id_index, coordinate_index]
+    ball_boxes = ball_tracks.get_track(1)
+    for coordinate_index, coordinate in enumerate(('x1', 'y1', 'x2', 'y2')):
+        columns[f'ball_{coordinate}'] = ball_boxes[:, coordinate_index]
+
+    for id_index, track_id in enumerate(player_tracks.track_ids):
+        columns[f'player_{track_id}_mini_court_x'] = player_mini_court_positions[:, id_index, 0].astype(np.float32)
+        columns[f'player_{track_id}_mini_court_y'] = player_mini_court_positions[:, id_index, 1].astype(np.float32)
+    columns['ball_mini_court_x'] = ball_mini_court_positions[:, 0].astype(np.float32)
+    columns['ball_mini_court_y'] = ball_mini_court_positions[:, 1].astype(np.float32)
+
+    is_shot = np.zeros(number_of_frames, dtype=bool)
+    is_shot[[frame_num for frame_num in ball_shot_frames if frame_num < number_of_frames]] = True
+    columns['is_shot'] = is_shot
+
+    for column in frame_stats.columns:
+        if column != 'frame_num':
+            columns[column] = frame_stats[column].to_numpy()
+    return columns
+
+
+def save_track_file(path, columns, metadata=None, row_group_size=4096):
+    """
+    Write the columns as a zstd-compressed Parquet file. Row groups of row_group_size
+    frames let readers load a frame range without the rest of the file.
+    """
+    table = pa.table(columns)
+    if metadata is not None:
+        table = table.replace_schema_metadata({TRACK_FILE_METADATA_KEY: json.dumps(metadata).encode()})
+
+    # Write to a temporary file and rename so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, row_group_size=row_group_size, compression='zstd')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def to_json_values(values):
+    """List of a column with NaN as None, since JSON has no NaN"""
+    if values.dtype.kind != 'f':
+        return values.tolist()
+    json_values = values.astype(object)
+    json_values[np.isnan(values)] = None
+    return json_values.tolist()
+
+
+class TrackFile:
+    """
+    Memory-mapped reader of a track file. Opening only parses the footer; read() loads
+    the row groups that overlap the frame range, and only the requested columns.
+    close() releases the file and the mapping; use it as a context manager.
+    """
+    def __init__(self, path):
+        self.parquet_file = pq.ParquetFile(path, memory_map=True)
+        schema_metadata = self.parquet_file.schema_arrow.metadata or {}
+        self.metadata = json.loads(schema_metadata.get(TRACK_FILE_METADATA_KEY, b'{}'))
+        self.column_names = self.parquet_file.schema_arrow.names
+        self.number_of_frames = self.parquet_file.metadata.num_rows
+
+        row_group_sizes = [self.parquet_file.metadata.row_group(i).num_rows
+                           for i in range(self.parquet_file.num_row_groups)]
+        # First frame of every row group, plus the end of the last one
+        self.row_group_starts = np.concatenate([[0], np.cumsum(row_group_sizes)])
+
+    def read(self, start=0, end=None, columns=None):
+        """Columns of frames [start, end) as {name: ndarray}; all columns if columns is None"""
+        end = self.number_of_frames if end is None else min(end, self.number_of_frames)
+        start = max(start, 0)
+        columns = self.column_names if columns is None else list(columns)
+        unknown_columns = [column for column in columns if column not in self.column_names]
+        if unknown_columns:
+            raise KeyError(f"Unknown track columns: {', '.join(unknown_columns)}")
+        if start >= end:
+            return {column: np.zeros(0) for column in columns}
+
+        first_group = int(np.searchsorted(self.row_group_starts, start, side='right')) - 1
+        last_group = int(np.searchsorted(self.row_group_starts, end, side='left')) - 1
+        table = self.parquet_file.read_row_groups(list(range(first_group, last_group + 1)), columns=columns)
+        table = table.slice(int(start - self.row_group_starts[first_group]), end - start)
+        return {column: table.column(column).to_numpy() for column in columns}
+
+    def close(self):
+        self.parquet_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -1,4 +1,9 @@
 import cv2
+import numpy as np
+import os
+import shutil
+import subprocess
+import tempfile
 
 def read_video(video_path):
     cap = cv2.VideoCapture(video_path)
@@ -11,9 +16,154 @@ def read_video(video_path):
     cap.release()
     return frames
 
-def save_video(output_video_frames, output_video_path):
-    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
+def get_video_frame_count(video_path):
+    """Frame count from the container header; it can be 0 or approximate for some files"""
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(frame_count, 0)
+
+def read_video_chunks(video_path, chunk_size=32):
+    """Yield lists of at most chunk_size frames so the whole video never sits in memory"""
+    cap = cv2.VideoCapture(video_path)
+    chunk = []
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            chunk.append(frame)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        cap.release()
+
+def read_first_frame(video_path):
+    """First frame of the video; ValueError when none can be decoded"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    if not ret:
+        raise ValueError(f"Could not decode a frame from {video_path}")
+    return frame
+
+def get_video_fps(video_path, default_fps=24):
+    """Frame rate from the container header, default_fps when it is missing"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default_fps
+
+class FFmpegVideoWriter:
+    """
+    Streams raw BGR frames to one ffmpeg process that encodes browser-ready H.264
+    (yuv420p, moov atom at the front). Same write/release interface as cv2.VideoWriter.
+    """
+    def __init__(self, output_video_path, frame_size, fps=24, crf=23, preset='fast', ffmpeg_path='ffmpeg'):
+        self.output_video_path = output_video_path
+        self.frame_size = frame_size
+        width, height = frame_size
+        command = [
+            ffmpeg_path, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            '-an',
+            '-c:v', 'libx264', '-preset', preset, '-crf', str(crf),
+            # yuv420p needs even dimensions
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart',
+            output_video_path
+        ]
+        # stderr goes to a file, a full pipe would block ffmpeg
+        self.stderr_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self.stderr_file)
+
+    def isOpened(self):
+        return self.process.poll() is None
+
+    def write(self, frame):
+        if frame.shape[1] != self.frame_size[0] or frame.shape[0] != self.frame_size[1]:
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match writer size "
+                             f"{self.frame_size[0]}x{self.frame_size[1]}")
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            self._close_stdin()
+            self.process.wait()
+            raise RuntimeError(f"ffmpeg stopped while encoding {self.output_video_path}: {self._read_stderr()}")
+
+    def release(self):
+        if self.process.stdin.closed:
+            return
+        self._close_stdin()
+        return_code = self.process.wait()
+        stderr = self._read_stderr()
+        self.stderr_file.close()
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.output_video_path}: {stderr}")
+
+    def abort(self):
+        """Stop ffmpeg without finishing the file and delete the partial output"""
+        if self.process.poll() is None:
+            self.process.kill()
+        self._close_stdin()
+        self.process.wait()
+        if not self.stderr_file.closed:
+            self.stderr_file.close()
+        try:
+            os.remove(self.output_video_path)
+        except FileNotFoundError:
+            pass
+
+    def _close_stdin(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def _read_stderr(self):
+        self.stderr_file.seek(0)
+        return self.stderr_file.read().decode(errors='replace').strip()
+
+def open_video_writer(output_video_path, frame_size, fps=24):
+    """
+    Open a writer for frames of frame_size (width, height).
+    .mp4/.mov/.mkv outputs are encoded to H.264 in a single pass by ffmpeg; without
+    ffmpeg they fall back to OpenCV's mp4v. Other outputs (.avi) are written as MJPG.
+    """
+    extension = os.path.splitext(output_video_path)[1].lower()
+    if extension in ('.mp4', '.mov', '.mkv'):
+        ffmpeg_path = shutil.which('ffmpeg')
+        if ffmpeg_path is not None:
+            return FFmpegVideoWriter(output_video_path, frame_size, fps, ffmpeg_path=ffmpeg_path)
+        print("ffmpeg not found, writing mp4v instead of H.264")
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    else:
+        fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+    return cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+
+def abort_video_writer(video_writer, output_video_path):
+    """
+    Give up on an output after a failure: a truncated file would still play as a shorter
+    video, so it is deleted instead of being finished by release()
+    """
+    if isinstance(video_writer, FFmpegVideoWriter):
+        video_writer.abort()
+        return
+    video_writer.release()
+    try:
+        os.remove(output_video_path)
+    except FileNotFoundError:
+        pass
+
+def save_video(output_video_frames, output_video_path, fps=24):
+    out = open_video_writer(output_video_path, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]), fps)
     for frame in output_video_frames:
         out.write(frame)
-    out.release()
\ No newline at end of file
+    out.release()